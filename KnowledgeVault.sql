@@ -5,6 +5,9 @@ USE KnowledgeVault1;
 -- -------------------------
 -- 1) Core tables
 -- -------------------------
+-- FULLTEXT keys back the app's Search page (MATCH ... AGAINST in boolean mode).
+-- InnoDB skips words shorter than innodb_ft_min_token_size (default 3);
+-- lower it in my.cnf before loading this file to make short tags like 'AI' searchable.
 CREATE TABLE Users (
     user_id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(100),
@@ -25,6 +28,8 @@ CREATE TABLE Concepts (
     created_on DATE,
     category_id INT,
     user_id INT,
+    INDEX idx_concepts_title (title),
+    FULLTEXT KEY ft_concepts_title (title),
     FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON DELETE SET NULL,
     FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
@@ -35,6 +40,8 @@ CREATE TABLE Notes (
     entity_id INT,
     body TEXT,
     created_on DATE,
+    INDEX idx_notes_entity_created (entity_id, created_on),
+    FULLTEXT KEY ft_notes_body (body),
     FOREIGN KEY (entity_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
@@ -46,6 +53,9 @@ CREATE TABLE Tasks (
     due_on DATE,
     status VARCHAR(20),
     remind_on DATE,
+    INDEX idx_tasks_status_entity (status, entity_id),
+    INDEX idx_tasks_due_on (due_on),
+    FULLTEXT KEY ft_tasks_description (description),
     FOREIGN KEY (entity_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
@@ -53,7 +63,8 @@ CREATE TABLE Tasks (
 CREATE TABLE Tags (
     tag_id INT AUTO_INCREMENT PRIMARY KEY,
     tag VARCHAR(100),
-    role VARCHAR(50)
+    role VARCHAR(50),
+    FULLTEXT KEY ft_tags_tag (tag)
 ) ENGINE=InnoDB;
 
 -- Junction table for tags
@@ -61,16 +72,20 @@ CREATE TABLE Concept_Tags (
     id INT AUTO_INCREMENT PRIMARY KEY,
     entity_id INT,
     tag_id INT,
+    UNIQUE INDEX uq_concept_tags_entity_tag (entity_id, tag_id),
     FOREIGN KEY (entity_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE,
     FOREIGN KEY (tag_id) REFERENCES Tags(tag_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
--- Attachments with entity_id FK
+-- Attachments with entity_id FK; uploads live in a content-addressed store (blobstore.py)
 CREATE TABLE Attachments (
     attachment_id INT AUTO_INCREMENT PRIMARY KEY,
     entity_id INT,
     file_path VARCHAR(255),
+    file_name VARCHAR(255),
     file_type VARCHAR(50),
+    file_size BIGINT,
+    INDEX idx_attachments_file_path (file_path),
     FOREIGN KEY (entity_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
@@ -90,19 +105,65 @@ CREATE TABLE Links (
     src_concept_id INT,
     dst_concept_id INT,
     relation_type VARCHAR(100),
+    INDEX idx_links_dst_src (dst_concept_id, src_concept_id),
     FOREIGN KEY (src_concept_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE,
     FOREIGN KEY (dst_concept_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
--- Small trigger-log table so GUI can show trigger activity
+-- Small trigger-log table so GUI can show trigger activity.
+-- Partitioned by month so RotateTriggerLog can drop expired months whole;
+-- partitioning needs created_at in the primary key. The monthly partitions
+-- are split off p_future by RotateTriggerLog (called at the end of this file).
 CREATE TABLE Trigger_Log (
-    log_id INT AUTO_INCREMENT PRIMARY KEY,
+    log_id INT AUTO_INCREMENT,
+    log_table VARCHAR(64),
+    log_action VARCHAR(64),
+    log_info VARCHAR(255),
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (log_id, created_at),
+    INDEX idx_trigger_log_created (created_at, log_id)
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS (created_at) (
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Audit rows wait here instead of Trigger_Log while a session runs with
+-- @vault_audit_buffered = 1 (VAULT_AUDIT_MODE=buffered); FlushTriggerLog()
+-- moves them over in one batch. InnoDB, so a rolled-back write takes its
+-- audit rows with it, as it does in direct mode.
+CREATE TABLE Trigger_Log_Buffer (
+    buffer_id BIGINT AUTO_INCREMENT PRIMARY KEY,
     log_table VARCHAR(64),
     log_action VARCHAR(64),
     log_info VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
+-- Per-concept note and task counters, kept current by the Notes/Tasks triggers
+-- (same idea as Categories.concept_count) so dashboards never regroup the fact tables
+CREATE TABLE Concept_Stats (
+    entity_id INT PRIMARY KEY,
+    note_count INT NOT NULL DEFAULT 0,
+    task_count INT NOT NULL DEFAULT 0,
+    pending_count INT NOT NULL DEFAULT 0,
+    in_progress_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0,
+    INDEX idx_concept_stats_note_count (note_count),
+    FOREIGN KEY (entity_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- One change counter per table, bumped right after every write
+-- made through db.Store or vault_io, so the app, the API and other servers can
+-- tell which of their cached data another process changed
+CREATE TABLE Table_Versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT INTO Table_Versions (table_name) VALUES
+('Users'), ('Categories'), ('Concepts'), ('Notes'), ('Tasks'), ('Tags'),
+('Concept_Tags'), ('Attachments'), ('Collaborators'), ('Links');
+
 
 USE KnowledgeVault1;
 -- 2) Sample data (so GUI has something)
@@ -139,13 +200,28 @@ INSERT INTO Collaborators (user_id, concept_id, role) VALUES
 INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES
 (2,1,'related to');
 
--- 3) Triggers (3 triggers)
+-- 3) Triggers
 /* Trigger list:
    trg_after_task_update  -> logs updates; if status becomes Completed, auto-create a Note and log it
    trg_after_concept_insert -> increments category concept_count and logs
    trg_after_concept_delete -> decrements category concept_count and logs
+   trg_after_concept_update -> moves the count when a concept changes category, and logs
+   trg_concept_stats_*, trg_note_stats_*, trg_task_stats_* -> keep Concept_Stats counters current
+   The logging triggers write through LogTrigger(), which honours the buffered audit mode.
 */
 
+DROP PROCEDURE IF EXISTS LogTrigger;
+DELIMITER $$
+CREATE PROCEDURE LogTrigger(IN in_table VARCHAR(64), IN in_action VARCHAR(64), IN in_info VARCHAR(255))
+BEGIN
+    IF @vault_audit_buffered = 1 THEN
+        INSERT INTO Trigger_Log_Buffer (log_table, log_action, log_info) VALUES (in_table, in_action, in_info);
+    ELSE
+        INSERT INTO Trigger_Log (log_table, log_action, log_info) VALUES (in_table, in_action, in_info);
+    END IF;
+END $$
+DELIMITER ;
+
 DROP TRIGGER IF EXISTS trg_after_task_update;
 DELIMITER $$
 CREATE TRIGGER trg_after_task_update
@@ -153,8 +229,7 @@ AFTER UPDATE ON Tasks
 FOR EACH ROW
 BEGIN
     -- log every task update
-    INSERT INTO Trigger_Log (log_table, log_action, log_info)
-    VALUES ('Tasks', CONCAT('UPDATE status=', NEW.status), CONCAT('task_id=', NEW.task_id));
+    CALL LogTrigger('Tasks', CONCAT('UPDATE status=', NEW.status), CONCAT('task_id=', NEW.task_id));
 
     -- if moved to Completed, create a note (automation) and log it
     IF NEW.status = 'Completed' AND OLD.status <> 'Completed' THEN
@@ -162,8 +237,7 @@ BEGIN
         VALUES (NEW.entity_id,
                 CONCAT('Task \"', NEW.description, '\" completed on ', DATE_FORMAT(CURDATE(), '%Y-%m-%d')),
                 CURDATE());
-        INSERT INTO Trigger_Log (log_table, log_action, log_info)
-        VALUES ('Notes', 'AUTO_INSERT_FROM_TASK', CONCAT('task_id=', NEW.task_id, ';entity_id=', NEW.entity_id));
+        CALL LogTrigger('Notes', 'AUTO_INSERT_FROM_TASK', CONCAT('task_id=', NEW.task_id, ';entity_id=', NEW.entity_id));
     END IF;
 END $$
 DELIMITER ;
@@ -176,8 +250,7 @@ FOR EACH ROW
 BEGIN
     IF NEW.category_id IS NOT NULL THEN
         UPDATE Categories SET concept_count = IFNULL(concept_count,0) + 1 WHERE category_id = NEW.category_id;
-        INSERT INTO Trigger_Log (log_table, log_action, log_info)
-        VALUES ('Categories','INCREMENT_CONCEPT_COUNT', CONCAT('category_id=', NEW.category_id));
+        CALL LogTrigger('Categories','INCREMENT_CONCEPT_COUNT', CONCAT('category_id=', NEW.category_id));
     END IF;
 END $$
 DELIMITER ;
@@ -190,8 +263,100 @@ FOR EACH ROW
 BEGIN
     IF OLD.category_id IS NOT NULL THEN
         UPDATE Categories SET concept_count = GREATEST(IFNULL(concept_count,0)-1,0) WHERE category_id = OLD.category_id;
-        INSERT INTO Trigger_Log (log_table, log_action, log_info)
-        VALUES ('Categories','DECREMENT_CONCEPT_COUNT', CONCAT('category_id=', OLD.category_id));
+        CALL LogTrigger('Categories','DECREMENT_CONCEPT_COUNT', CONCAT('category_id=', OLD.category_id));
+    END IF;
+END $$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_after_concept_update;
+DELIMITER $$
+CREATE TRIGGER trg_after_concept_update
+AFTER UPDATE ON Concepts
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.category_id <=> OLD.category_id) THEN
+        UPDATE Categories SET concept_count = GREATEST(IFNULL(concept_count,0)-1,0) WHERE category_id = OLD.category_id;
+        UPDATE Categories SET concept_count = IFNULL(concept_count,0) + 1 WHERE category_id = NEW.category_id;
+        CALL LogTrigger('Categories','MOVE_CONCEPT',
+                        CONCAT('entity_id=', NEW.entity_id, ';category_id=', IFNULL(OLD.category_id, 'NULL'), '->', IFNULL(NEW.category_id, 'NULL')));
+    END IF;
+END $$
+DELIMITER ;
+
+-- Concept_Stats maintenance. Deleting a concept removes its row through the
+-- foreign key; the cascaded Notes/Tasks deletes do not need to touch it.
+DROP TRIGGER IF EXISTS trg_concept_stats_insert;
+CREATE TRIGGER trg_concept_stats_insert
+AFTER INSERT ON Concepts
+FOR EACH ROW
+    INSERT IGNORE INTO Concept_Stats (entity_id) VALUES (NEW.entity_id);
+
+DROP TRIGGER IF EXISTS trg_note_stats_insert;
+CREATE TRIGGER trg_note_stats_insert
+AFTER INSERT ON Notes
+FOR EACH ROW
+    UPDATE Concept_Stats SET note_count = note_count + 1 WHERE entity_id = NEW.entity_id;
+
+DROP TRIGGER IF EXISTS trg_note_stats_delete;
+CREATE TRIGGER trg_note_stats_delete
+AFTER DELETE ON Notes
+FOR EACH ROW
+    UPDATE Concept_Stats SET note_count = note_count - 1 WHERE entity_id = OLD.entity_id;
+
+DROP TRIGGER IF EXISTS trg_note_stats_update;
+DELIMITER $$
+CREATE TRIGGER trg_note_stats_update
+AFTER UPDATE ON Notes
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.entity_id <=> OLD.entity_id) THEN
+        UPDATE Concept_Stats SET note_count = note_count - 1 WHERE entity_id = OLD.entity_id;
+        UPDATE Concept_Stats SET note_count = note_count + 1 WHERE entity_id = NEW.entity_id;
+    END IF;
+END $$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_task_stats_insert;
+CREATE TRIGGER trg_task_stats_insert
+AFTER INSERT ON Tasks
+FOR EACH ROW
+    UPDATE Concept_Stats
+    SET task_count = task_count + 1,
+        pending_count = pending_count + IFNULL(NEW.status = 'Pending', 0),
+        in_progress_count = in_progress_count + IFNULL(NEW.status = 'In Progress', 0),
+        completed_count = completed_count + IFNULL(NEW.status = 'Completed', 0)
+    WHERE entity_id = NEW.entity_id;
+
+DROP TRIGGER IF EXISTS trg_task_stats_delete;
+CREATE TRIGGER trg_task_stats_delete
+AFTER DELETE ON Tasks
+FOR EACH ROW
+    UPDATE Concept_Stats
+    SET task_count = task_count - 1,
+        pending_count = pending_count - IFNULL(OLD.status = 'Pending', 0),
+        in_progress_count = in_progress_count - IFNULL(OLD.status = 'In Progress', 0),
+        completed_count = completed_count - IFNULL(OLD.status = 'Completed', 0)
+    WHERE entity_id = OLD.entity_id;
+
+DROP TRIGGER IF EXISTS trg_task_stats_update;
+DELIMITER $$
+CREATE TRIGGER trg_task_stats_update
+AFTER UPDATE ON Tasks
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.entity_id <=> OLD.entity_id AND NEW.status <=> OLD.status) THEN
+        UPDATE Concept_Stats
+        SET task_count = task_count - 1,
+            pending_count = pending_count - IFNULL(OLD.status = 'Pending', 0),
+            in_progress_count = in_progress_count - IFNULL(OLD.status = 'In Progress', 0),
+            completed_count = completed_count - IFNULL(OLD.status = 'Completed', 0)
+        WHERE entity_id = OLD.entity_id;
+        UPDATE Concept_Stats
+        SET task_count = task_count + 1,
+            pending_count = pending_count + IFNULL(NEW.status = 'Pending', 0),
+            in_progress_count = in_progress_count + IFNULL(NEW.status = 'In Progress', 0),
+            completed_count = completed_count + IFNULL(NEW.status = 'Completed', 0)
+        WHERE entity_id = NEW.entity_id;
     END IF;
 END $$
 DELIMITER ;
@@ -201,8 +366,15 @@ DELIMITER ;
    - GetConceptDetails(entity_id) : returns notes, tasks, tags for a concept (multiple result sets)
    - GetLinkedConcepts(entity_id) : returns outgoing links
    - MarkTaskCompleted(task_id) : marks a task completed (will fire task trigger)
+   - MarkTasksCompleted(task_ids) : same for a JSON array of task ids, in one statement
+   - MarkStatusCompleted(status) : same for every task with a status; returns the count
+   - RebuildConceptStats() : recounts Concept_Stats from Notes and Tasks
+   - VerifyConceptStats() : lists concepts whose Concept_Stats counters are off
+   - RotateTriggerLog(keep_months) : adds upcoming Trigger_Log partitions, drops expired ones
+   - FlushTriggerLog() : moves buffered audit rows into Trigger_Log
    - Function: DaysRemaining(task_id) -> int
    - View: Concept_Summary (counts) for GUI summary
+   - View: Concept_Stats_Recount (Concept_Stats computed from scratch)
 */
 
 DROP PROCEDURE IF EXISTS GetConceptDetails;
@@ -238,6 +410,30 @@ BEGIN
 END $$
 DELIMITER ;
 
+DROP PROCEDURE IF EXISTS MarkTasksCompleted;
+DELIMITER $$
+CREATE PROCEDURE MarkTasksCompleted(IN in_task_ids JSON)
+BEGIN
+    -- set-based counterpart of MarkTaskCompleted, e.g. CALL MarkTasksCompleted('[1, 2, 3]')
+    UPDATE Tasks t
+    JOIN JSON_TABLE(in_task_ids, '$[*]' COLUMNS (task_id INT PATH '$')) ids ON ids.task_id = t.task_id
+    SET t.status = 'Completed'
+    WHERE NOT (t.status <=> 'Completed');
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS MarkStatusCompleted;
+DELIMITER $$
+CREATE PROCEDURE MarkStatusCompleted(IN in_status VARCHAR(20))
+BEGIN
+    -- every task with a status, completed in one statement on the server,
+    -- e.g. CALL MarkStatusCompleted('In Progress'); returns the number changed
+    UPDATE Tasks SET status = 'Completed'
+    WHERE status = in_status AND status <> 'Completed';
+    SELECT ROW_COUNT() AS completed;
+END $$
+DELIMITER ;
+
 USE KnowledgeVault1;
 DROP PROCEDURE IF EXISTS CountNotesPerConcept;
 DELIMITER $$
@@ -264,7 +460,7 @@ BEGIN
 END $$
 DELIMITER ;
 
--- View summarizing concept counts for GUI
+-- View summarizing concept counts for GUI (counts come from Concept_Stats)
 CREATE OR REPLACE VIEW Concept_Summary AS
 SELECT
   c.entity_id,
@@ -273,13 +469,137 @@ SELECT
   c.created_on,
   cat.name AS category,
   u.name AS owner,
-  COALESCE(n.note_count,0) AS notes_count,
-  COALESCE(t.task_count,0) AS tasks_count
+  COALESCE(s.note_count,0) AS notes_count,
+  COALESCE(s.task_count,0) AS tasks_count
 FROM Concepts c
 LEFT JOIN Categories cat ON c.category_id = cat.category_id
 LEFT JOIN Users u ON c.user_id = u.user_id
+LEFT JOIN Concept_Stats s ON c.entity_id = s.entity_id;
+
+-- What Concept_Stats should hold, counted from the fact tables
+CREATE OR REPLACE VIEW Concept_Stats_Recount AS
+SELECT
+  c.entity_id,
+  COALESCE(n.note_count,0) AS note_count,
+  COALESCE(t.task_count,0) AS task_count,
+  COALESCE(t.pending_count,0) AS pending_count,
+  COALESCE(t.in_progress_count,0) AS in_progress_count,
+  COALESCE(t.completed_count,0) AS completed_count
+FROM Concepts c
 LEFT JOIN ( SELECT entity_id, COUNT(*) AS note_count FROM Notes GROUP BY entity_id ) n ON c.entity_id = n.entity_id
-LEFT JOIN ( SELECT entity_id, COUNT(*) AS task_count FROM Tasks GROUP BY entity_id ) t ON c.entity_id = t.entity_id;
+LEFT JOIN (
+  SELECT entity_id,
+         COUNT(*) AS task_count,
+         SUM(status = 'Pending') AS pending_count,
+         SUM(status = 'In Progress') AS in_progress_count,
+         SUM(status = 'Completed') AS completed_count
+  FROM Tasks GROUP BY entity_id
+) t ON c.entity_id = t.entity_id;
+
+DROP PROCEDURE IF EXISTS RebuildConceptStats;
+DELIMITER $$
+CREATE PROCEDURE RebuildConceptStats()
+BEGIN
+    DELETE FROM Concept_Stats;
+    INSERT INTO Concept_Stats (entity_id, note_count, task_count, pending_count, in_progress_count, completed_count)
+    SELECT entity_id, note_count, task_count, pending_count, in_progress_count, completed_count
+    FROM Concept_Stats_Recount;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS VerifyConceptStats;
+DELIMITER $$
+CREATE PROCEDURE VerifyConceptStats()
+BEGIN
+    SELECT r.entity_id,
+           s.note_count, r.note_count AS expected_note_count,
+           s.task_count, r.task_count AS expected_task_count,
+           s.pending_count, r.pending_count AS expected_pending_count,
+           s.in_progress_count, r.in_progress_count AS expected_in_progress_count,
+           s.completed_count, r.completed_count AS expected_completed_count
+    FROM Concept_Stats_Recount r
+    LEFT JOIN Concept_Stats s ON s.entity_id = r.entity_id
+    WHERE s.entity_id IS NULL
+       OR s.note_count <> r.note_count
+       OR s.task_count <> r.task_count
+       OR s.pending_count <> r.pending_count
+       OR s.in_progress_count <> r.in_progress_count
+       OR s.completed_count <> r.completed_count;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS RotateTriggerLog;
+DELIMITER $$
+CREATE PROCEDURE RotateTriggerLog(IN keep_months INT)
+BEGIN
+    DECLARE month_start DATE DEFAULT DATE_FORMAT(CURDATE(), '%Y-%m-01');
+    DECLARE expired TEXT;
+    -- make sure this month and next have their own partitions
+    WHILE month_start <= DATE_FORMAT(CURDATE() + INTERVAL 1 MONTH, '%Y-%m-01') DO
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Trigger_Log'
+              AND PARTITION_NAME = DATE_FORMAT(month_start, 'p%Y%m')
+        ) THEN
+            SET @ddl = CONCAT(
+                'ALTER TABLE Trigger_Log REORGANIZE PARTITION p_future INTO (',
+                'PARTITION ', DATE_FORMAT(month_start, 'p%Y%m'),
+                ' VALUES LESS THAN (''', month_start + INTERVAL 1 MONTH, '''), ',
+                'PARTITION p_future VALUES LESS THAN (MAXVALUE))'
+            );
+            PREPARE stmt FROM @ddl;
+            EXECUTE stmt;
+            DEALLOCATE PREPARE stmt;
+        END IF;
+        SET month_start = month_start + INTERVAL 1 MONTH;
+    END WHILE;
+    -- drop whole months that fell out of the retention window
+    SELECT GROUP_CONCAT(PARTITION_NAME) INTO expired
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Trigger_Log'
+      AND PARTITION_NAME REGEXP '^p[0-9]{6}$'
+      AND PARTITION_NAME < DATE_FORMAT(CURDATE() - INTERVAL keep_months MONTH, 'p%Y%m');
+    IF expired IS NOT NULL THEN
+        SET @ddl = CONCAT('ALTER TABLE Trigger_Log DROP PARTITION ', expired);
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END IF;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS FlushTriggerLog;
+DELIMITER $$
+CREATE PROCEDURE FlushTriggerLog()
+BEGIN
+    DECLARE last_id BIGINT;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        DO RELEASE_LOCK('vault_flush_trigger_log');
+        RESIGNAL;
+    END;
+    -- one flush at a time across the app and API processes; a second caller
+    -- returns at once and leaves the rows to the running one
+    IF GET_LOCK('vault_flush_trigger_log', 0) = 1 THEN
+        START TRANSACTION;
+        SELECT MAX(buffer_id) INTO last_id FROM Trigger_Log_Buffer;
+        IF last_id IS NOT NULL THEN
+            INSERT INTO Trigger_Log (log_table, log_action, log_info, created_at)
+            SELECT log_table, log_action, log_info, created_at
+            FROM Trigger_Log_Buffer WHERE buffer_id <= last_id ORDER BY buffer_id;
+            DELETE FROM Trigger_Log_Buffer WHERE buffer_id <= last_id;
+        END IF;
+        COMMIT;
+        DO RELEASE_LOCK('vault_flush_trigger_log');
+    END IF;
+END $$
+DELIMITER ;
+
+-- the sample data above was loaded before the triggers existed
+CALL RebuildConceptStats();
+-- create the current and next month's Trigger_Log partitions (keep 6 months)
+CALL RotateTriggerLog(6);
 
 -- 5) Example queries you can hook to GUI (join / nested / aggregate)
 
@@ -0,0 +1,363 @@
+-- Embedded (SQLite) version of KnowledgeVault.sql, used when VAULT_BACKEND=sqlite.
+-- The app creates the database file from this script on first start.
+-- Stored procedures and DaysRemaining are implemented in sqlite_backend.py,
+-- and FULLTEXT search uses the FTS5 table Search_Index.
+PRAGMA user_version = 1;  -- the last of sqlite_backend.MIGRATIONS this file includes
+
+-- -------------------------
+-- 1) Core tables
+-- -------------------------
+CREATE TABLE Users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100),
+    role VARCHAR(50)
+);
+
+CREATE TABLE Categories (
+    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100),
+    description TEXT,
+    concept_count INT DEFAULT 0
+);
+
+CREATE TABLE Concepts (
+    entity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type VARCHAR(50),
+    title VARCHAR(150),
+    created_on DATE,
+    category_id INT REFERENCES Categories(category_id) ON DELETE SET NULL,
+    user_id INT REFERENCES Users(user_id) ON DELETE SET NULL
+);
+CREATE INDEX idx_concepts_title ON Concepts (title);
+CREATE INDEX idx_concepts_category ON Concepts (category_id);
+CREATE INDEX idx_concepts_user ON Concepts (user_id);
+
+CREATE TABLE Notes (
+    note_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    body TEXT,
+    created_on DATE
+);
+CREATE INDEX idx_notes_entity_created ON Notes (entity_id, created_on);
+
+CREATE TABLE Tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    description TEXT,
+    due_on DATE,
+    status VARCHAR(20),
+    remind_on DATE
+);
+CREATE INDEX idx_tasks_entity ON Tasks (entity_id);
+CREATE INDEX idx_tasks_status_entity ON Tasks (status, entity_id);
+CREATE INDEX idx_tasks_due_on ON Tasks (due_on);
+
+CREATE TABLE Tags (
+    tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag VARCHAR(100),
+    role VARCHAR(50)
+);
+
+CREATE TABLE Concept_Tags (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    tag_id INT REFERENCES Tags(tag_id) ON DELETE CASCADE
+);
+CREATE UNIQUE INDEX uq_concept_tags_entity_tag ON Concept_Tags (entity_id, tag_id);
+CREATE INDEX idx_concept_tags_tag ON Concept_Tags (tag_id);
+
+CREATE TABLE Attachments (
+    attachment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    file_path VARCHAR(255),
+    file_name VARCHAR(255),
+    file_type VARCHAR(50),
+    file_size BIGINT
+);
+CREATE INDEX idx_attachments_entity ON Attachments (entity_id);
+CREATE INDEX idx_attachments_file_path ON Attachments (file_path);
+
+CREATE TABLE Collaborators (
+    collab_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES Users(user_id) ON DELETE CASCADE,
+    concept_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    role VARCHAR(50)
+);
+CREATE INDEX idx_collaborators_user ON Collaborators (user_id);
+CREATE INDEX idx_collaborators_concept ON Collaborators (concept_id);
+
+CREATE TABLE Links (
+    link_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    src_concept_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    dst_concept_id INT REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    relation_type VARCHAR(100)
+);
+CREATE INDEX idx_links_src ON Links (src_concept_id);
+CREATE INDEX idx_links_dst_src ON Links (dst_concept_id, src_concept_id);
+
+CREATE TABLE Trigger_Log (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_table VARCHAR(64),
+    log_action VARCHAR(64),
+    log_info VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_trigger_log_created ON Trigger_Log (created_at, log_id);
+
+-- Per-concept note and task counters, kept current by the Notes/Tasks triggers
+CREATE TABLE Concept_Stats (
+    entity_id INTEGER PRIMARY KEY REFERENCES Concepts(entity_id) ON DELETE CASCADE,
+    note_count INT NOT NULL DEFAULT 0,
+    task_count INT NOT NULL DEFAULT 0,
+    pending_count INT NOT NULL DEFAULT 0,
+    in_progress_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_concept_stats_note_count ON Concept_Stats (note_count);
+
+-- One change counter per table, bumped with every write made through db.Store
+-- or vault_io (older files get it from sqlite_backend.UPGRADES)
+CREATE TABLE Table_Versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO Table_Versions (table_name) VALUES
+('Users'), ('Categories'), ('Concepts'), ('Notes'), ('Tasks'), ('Tags'),
+('Concept_Tags'), ('Attachments'), ('Collaborators'), ('Links');
+
+-- Full-text index over titles, note bodies, task descriptions and tags
+CREATE VIRTUAL TABLE Search_Index USING fts5(
+    kind UNINDEXED,
+    item_id UNINDEXED,
+    entity_id UNINDEXED,
+    text
+);
+
+-- -------------------------
+-- 2) Triggers
+-- -------------------------
+-- The logging triggers insert into Audit_Log, which writes each row to
+-- Trigger_Log (the counterpart of the LogTrigger procedure in KnowledgeVault.sql;
+-- there is no buffered audit mode on SQLite).
+CREATE VIEW Audit_Log AS SELECT log_table, log_action, log_info FROM Trigger_Log;
+
+CREATE TRIGGER trg_audit_log_insert
+INSTEAD OF INSERT ON Audit_Log
+BEGIN
+    INSERT INTO Trigger_Log (log_table, log_action, log_info)
+    VALUES (NEW.log_table, NEW.log_action, NEW.log_info);
+END;
+
+CREATE TRIGGER trg_after_task_update
+AFTER UPDATE ON Tasks
+FOR EACH ROW
+BEGIN
+    INSERT INTO Audit_Log (log_table, log_action, log_info)
+    VALUES ('Tasks', 'UPDATE status=' || NEW.status, 'task_id=' || NEW.task_id);
+
+    INSERT INTO Notes (entity_id, body, created_on)
+    SELECT NEW.entity_id,
+           'Task "' || NEW.description || '" completed on ' || date('now', 'localtime'),
+           date('now', 'localtime')
+    WHERE NEW.status = 'Completed' AND OLD.status <> 'Completed';
+
+    INSERT INTO Audit_Log (log_table, log_action, log_info)
+    SELECT 'Notes', 'AUTO_INSERT_FROM_TASK', 'task_id=' || NEW.task_id || ';entity_id=' || NEW.entity_id
+    WHERE NEW.status = 'Completed' AND OLD.status <> 'Completed';
+END;
+
+CREATE TRIGGER trg_after_concept_insert
+AFTER INSERT ON Concepts
+FOR EACH ROW WHEN NEW.category_id IS NOT NULL
+BEGIN
+    UPDATE Categories SET concept_count = IFNULL(concept_count, 0) + 1 WHERE category_id = NEW.category_id;
+    INSERT INTO Audit_Log (log_table, log_action, log_info)
+    VALUES ('Categories', 'INCREMENT_CONCEPT_COUNT', 'category_id=' || NEW.category_id);
+END;
+
+CREATE TRIGGER trg_after_concept_delete
+AFTER DELETE ON Concepts
+FOR EACH ROW WHEN OLD.category_id IS NOT NULL
+BEGIN
+    UPDATE Categories SET concept_count = MAX(IFNULL(concept_count, 0) - 1, 0) WHERE category_id = OLD.category_id;
+    INSERT INTO Audit_Log (log_table, log_action, log_info)
+    VALUES ('Categories', 'DECREMENT_CONCEPT_COUNT', 'category_id=' || OLD.category_id);
+END;
+
+CREATE TRIGGER trg_after_concept_update
+AFTER UPDATE OF category_id ON Concepts
+FOR EACH ROW WHEN NEW.category_id IS NOT OLD.category_id
+BEGIN
+    UPDATE Categories SET concept_count = MAX(IFNULL(concept_count, 0) - 1, 0) WHERE category_id = OLD.category_id;
+    UPDATE Categories SET concept_count = IFNULL(concept_count, 0) + 1 WHERE category_id = NEW.category_id;
+    INSERT INTO Audit_Log (log_table, log_action, log_info)
+    VALUES ('Categories', 'MOVE_CONCEPT',
+            'entity_id=' || NEW.entity_id || ';category_id=' || IFNULL(OLD.category_id, 'NULL') || '->' || IFNULL(NEW.category_id, 'NULL'));
+END;
+
+-- keep Concept_Stats in step with Notes and Tasks
+CREATE TRIGGER trg_concept_stats_insert AFTER INSERT ON Concepts BEGIN
+    INSERT OR IGNORE INTO Concept_Stats (entity_id) VALUES (NEW.entity_id);
+END;
+CREATE TRIGGER trg_note_stats_insert AFTER INSERT ON Notes BEGIN
+    UPDATE Concept_Stats SET note_count = note_count + 1 WHERE entity_id = NEW.entity_id;
+END;
+CREATE TRIGGER trg_note_stats_delete AFTER DELETE ON Notes BEGIN
+    UPDATE Concept_Stats SET note_count = note_count - 1 WHERE entity_id = OLD.entity_id;
+END;
+CREATE TRIGGER trg_note_stats_update AFTER UPDATE OF entity_id ON Notes
+WHEN NEW.entity_id IS NOT OLD.entity_id
+BEGIN
+    UPDATE Concept_Stats SET note_count = note_count - 1 WHERE entity_id = OLD.entity_id;
+    UPDATE Concept_Stats SET note_count = note_count + 1 WHERE entity_id = NEW.entity_id;
+END;
+CREATE TRIGGER trg_task_stats_insert AFTER INSERT ON Tasks BEGIN
+    UPDATE Concept_Stats
+    SET task_count = task_count + 1,
+        pending_count = pending_count + IFNULL(NEW.status = 'Pending', 0),
+        in_progress_count = in_progress_count + IFNULL(NEW.status = 'In Progress', 0),
+        completed_count = completed_count + IFNULL(NEW.status = 'Completed', 0)
+    WHERE entity_id = NEW.entity_id;
+END;
+CREATE TRIGGER trg_task_stats_delete AFTER DELETE ON Tasks BEGIN
+    UPDATE Concept_Stats
+    SET task_count = task_count - 1,
+        pending_count = pending_count - IFNULL(OLD.status = 'Pending', 0),
+        in_progress_count = in_progress_count - IFNULL(OLD.status = 'In Progress', 0),
+        completed_count = completed_count - IFNULL(OLD.status = 'Completed', 0)
+    WHERE entity_id = OLD.entity_id;
+END;
+CREATE TRIGGER trg_task_stats_update AFTER UPDATE OF entity_id, status ON Tasks
+WHEN NEW.entity_id IS NOT OLD.entity_id OR NEW.status IS NOT OLD.status
+BEGIN
+    UPDATE Concept_Stats
+    SET task_count = task_count - 1,
+        pending_count = pending_count - IFNULL(OLD.status = 'Pending', 0),
+        in_progress_count = in_progress_count - IFNULL(OLD.status = 'In Progress', 0),
+        completed_count = completed_count - IFNULL(OLD.status = 'Completed', 0)
+    WHERE entity_id = OLD.entity_id;
+    UPDATE Concept_Stats
+    SET task_count = task_count + 1,
+        pending_count = pending_count + IFNULL(NEW.status = 'Pending', 0),
+        in_progress_count = in_progress_count + IFNULL(NEW.status = 'In Progress', 0),
+        completed_count = completed_count + IFNULL(NEW.status = 'Completed', 0)
+    WHERE entity_id = NEW.entity_id;
+END;
+
+-- keep Search_Index in step with the searchable columns; each row's rowid is
+-- item_id * 4 + kind (Concept 0, Note 1, Task 2, Tag 3), so the updates and
+-- deletes find it by rowid instead of scanning the UNINDEXED columns
+CREATE TRIGGER trg_search_concept_insert AFTER INSERT ON Concepts BEGIN
+    INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+    VALUES (NEW.entity_id * 4, 'Concept', NEW.entity_id, NEW.entity_id, NEW.title);
+END;
+CREATE TRIGGER trg_search_concept_update AFTER UPDATE OF title ON Concepts BEGIN
+    UPDATE Search_Index SET text = NEW.title WHERE rowid = NEW.entity_id * 4;
+END;
+CREATE TRIGGER trg_search_concept_delete AFTER DELETE ON Concepts BEGIN
+    DELETE FROM Search_Index WHERE rowid = OLD.entity_id * 4;
+END;
+CREATE TRIGGER trg_search_note_insert AFTER INSERT ON Notes BEGIN
+    INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+    VALUES (NEW.note_id * 4 + 1, 'Note', NEW.note_id, NEW.entity_id, NEW.body);
+END;
+CREATE TRIGGER trg_search_note_update AFTER UPDATE OF body ON Notes BEGIN
+    UPDATE Search_Index SET text = NEW.body WHERE rowid = NEW.note_id * 4 + 1;
+END;
+CREATE TRIGGER trg_search_note_delete AFTER DELETE ON Notes BEGIN
+    DELETE FROM Search_Index WHERE rowid = OLD.note_id * 4 + 1;
+END;
+CREATE TRIGGER trg_search_task_insert AFTER INSERT ON Tasks BEGIN
+    INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+    VALUES (NEW.task_id * 4 + 2, 'Task', NEW.task_id, NEW.entity_id, NEW.description);
+END;
+CREATE TRIGGER trg_search_task_update AFTER UPDATE OF description ON Tasks BEGIN
+    UPDATE Search_Index SET text = NEW.description WHERE rowid = NEW.task_id * 4 + 2;
+END;
+CREATE TRIGGER trg_search_task_delete AFTER DELETE ON Tasks BEGIN
+    DELETE FROM Search_Index WHERE rowid = OLD.task_id * 4 + 2;
+END;
+CREATE TRIGGER trg_search_tag_insert AFTER INSERT ON Tags BEGIN
+    INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+    VALUES (NEW.tag_id * 4 + 3, 'Tag', NEW.tag_id, NULL, NEW.tag);
+END;
+CREATE TRIGGER trg_search_tag_update AFTER UPDATE OF tag ON Tags BEGIN
+    UPDATE Search_Index SET text = NEW.tag WHERE rowid = NEW.tag_id * 4 + 3;
+END;
+CREATE TRIGGER trg_search_tag_delete AFTER DELETE ON Tags BEGIN
+    DELETE FROM Search_Index WHERE rowid = OLD.tag_id * 4 + 3;
+END;
+
+-- -------------------------
+-- 3) Views
+-- -------------------------
+CREATE VIEW Concept_Summary AS
+SELECT
+  c.entity_id,
+  c.title,
+  c.type,
+  c.created_on,
+  cat.name AS category,
+  u.name AS owner,
+  COALESCE(s.note_count, 0) AS notes_count,
+  COALESCE(s.task_count, 0) AS tasks_count
+FROM Concepts c
+LEFT JOIN Categories cat ON c.category_id = cat.category_id
+LEFT JOIN Users u ON c.user_id = u.user_id
+LEFT JOIN Concept_Stats s ON c.entity_id = s.entity_id;
+
+-- What Concept_Stats should hold, counted from the fact tables
+CREATE VIEW Concept_Stats_Recount AS
+SELECT
+  c.entity_id,
+  COALESCE(n.note_count, 0) AS note_count,
+  COALESCE(t.task_count, 0) AS task_count,
+  COALESCE(t.pending_count, 0) AS pending_count,
+  COALESCE(t.in_progress_count, 0) AS in_progress_count,
+  COALESCE(t.completed_count, 0) AS completed_count
+FROM Concepts c
+LEFT JOIN ( SELECT entity_id, COUNT(*) AS note_count FROM Notes GROUP BY entity_id ) n ON c.entity_id = n.entity_id
+LEFT JOIN (
+  SELECT entity_id,
+         COUNT(*) AS task_count,
+         SUM(status = 'Pending') AS pending_count,
+         SUM(status = 'In Progress') AS in_progress_count,
+         SUM(status = 'Completed') AS completed_count
+  FROM Tasks GROUP BY entity_id
+) t ON c.entity_id = t.entity_id;
+
+-- SAMPLE DATA (same as KnowledgeVault.sql; everything below this marker is
+-- skipped when VAULT_SQLITE_SAMPLE_DATA=0)
+-- -------------------------
+INSERT INTO Users (name, role) VALUES
+('Alice','Student'), ('Dhanya','Student'), ('Ananya','Researcher'), ('Ravi','Professor');
+
+INSERT INTO Categories (name, description) VALUES
+('Research Topics','Papers and ideas'), ('Projects','Course projects');
+
+INSERT INTO Concepts (type, title, created_on, category_id, user_id) VALUES
+('Idea','Federated Learning','2025-09-10', 1, 1),
+('Paper','Membership inference attacks','2025-09-12', 1, 2),
+('Project','Anonymization of Medical Data','2025-09-15', 2, 3);
+
+INSERT INTO Notes (entity_id, body, created_on) VALUES
+(1, 'Initial idea notes for Federated Learning', '2025-09-11');
+
+INSERT INTO Tasks (entity_id, description, due_on, status, remind_on) VALUES
+(1, 'Write FL report', '2025-09-20', 'Pending', '2025-09-18'),
+(2, 'Reproduce MIA experiment', '2025-09-25', 'Pending', '2025-09-20');
+
+INSERT INTO Tags (tag, role) VALUES
+('AI','Primary'), ('Privacy','Topic'), ('Security','Topic');
+
+INSERT INTO Concept_Tags (entity_id, tag_id) VALUES
+(1,1),(2,2);
+
+INSERT INTO Attachments (entity_id, file_path, file_type) VALUES
+(1,'/files/fl_notes.pdf','application/pdf');
+
+INSERT INTO Collaborators (user_id, concept_id, role) VALUES
+(1,1,'Owner'), (2,2,'Contributor');
+
+INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES
+(2,1,'related to');
@@ -0,0 +1,437 @@
+"""
+Headless JSON API over the vault for scripts, sync jobs and editor plugins.
+
+    python api.py [--host 127.0.0.1] [--port 8600]
+
+It uses the same data layer as the app (db.Store over a connection pool, on
+either backend) and answers requests on one asyncio event loop, with the
+database calls on a thread pool the size of the connection pool.
+
+    GET    /<resource>?after=<cursor>&limit=<n>&<column>=<value>  list, keyset-paginated, with ETag
+    GET    /<resource>/<id>
+    POST   /<resource>                 one object, or a list of objects inserted in one transaction
+    PATCH  /<resource>/<id>
+    DELETE /<resource>/<id>
+    DELETE /<resource>?ids=1,2,3       bulk delete
+    GET    /concepts/<id>/details      GetConceptDetails
+    GET    /concepts/<id>/linked       GetLinkedConcepts
+    GET    /export/<resource>          every row as streamed NDJSON
+    POST   /batch                      {"requests": [{"method": ..., "path": ..., "body": ...}, ...]}
+
+Resources: concepts, notes, tasks, links, tags, collaborators. Set
+VAULT_API_TOKEN to require "Authorization: Bearer <token>" on every request.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import parse_qsl, urlsplit
+
+import db
+from vault_io import COLUMNS
+
+log = logging.getLogger(__name__)
+
+API_POOL_SIZE = db.pool_size("VAULT_API_POOL_SIZE", 10)
+API_TOKEN = os.environ.get("VAULT_API_TOKEN")
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("VAULT_AUDIT_FLUSH_INTERVAL", "5"))
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_BATCH = 100
+MAX_BODY = 10 * 1024 * 1024
+EXPORT_BATCH = 1000
+
+# resource -> (table, primary key); the columns come from vault_io.COLUMNS
+RESOURCES = {
+    "concepts": ("Concepts", "entity_id"),
+    "notes": ("Notes", "note_id"),
+    "tasks": ("Tasks", "task_id"),
+    "links": ("Links", "link_id"),
+    "tags": ("Tags", "tag_id"),
+    "collaborators": ("Collaborators", "collab_id"),
+}
+
+# filled in on insert when the client leaves them out, as the app does with CURDATE()
+DEFAULTS = {"created_on": date.today}
+
+PROCEDURE_ROUTES = {
+    "details": ("GetConceptDetails", ["notes", "tasks", "tags"]),
+    "linked": ("GetLinkedConcepts", ["links"]),
+}
+
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+           401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response:
+    def __init__(self, status, payload=None, headers=None, etag=False):
+        self.status = status
+        self.payload = payload
+        self.headers = dict(headers or {})
+        self.body = b"" if payload is None else encode(payload)
+        if etag:
+            self.headers["ETag"] = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+
+class Stream:
+    """
+    A response whose body is produced batch by batch (chunked encoding).
+    """
+    def __init__(self, batches, content_type="application/x-ndjson"):
+        self.status = 200
+        self.batches = batches
+        self.headers = {"Content-Type": content_type}
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(payload):
+    return json.dumps(payload, default=_json_default, separators=(",", ":")).encode()
+
+
+class VaultApi:
+    """
+    Routes requests to db.Store calls. Handlers are plain functions run on
+    the thread pool; only the HTTP framing runs on the event loop.
+    """
+    def __init__(self, store, executor):
+        self.store = store
+        self.executor = executor
+
+    # Resource helpers
+    def _resource(self, name):
+        if name not in RESOURCES:
+            raise ApiError(404, f"Unknown resource '{name}'")
+        table, key = RESOURCES[name]
+        return table, key, COLUMNS[table]
+
+    def _fields(self, table, key, obj):
+        if not isinstance(obj, dict) or not obj:
+            raise ApiError(400, "Expected a JSON object with at least one field")
+        unknown = set(obj) - set(COLUMNS[table]) | ({key} & set(obj))
+        if unknown:
+            raise ApiError(400, f"Unknown or read-only fields: {', '.join(sorted(unknown))}")
+        return obj
+
+    def _id(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(400, f"Invalid id '{value}'")
+
+    # Handlers
+    def list(self, name, query):
+        table, key, columns = self._resource(name)
+        try:
+            after = int(query.pop("after", 0))
+            limit = min(int(query.pop("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            raise ApiError(400, "'after' and 'limit' must be integers")
+        if limit < 1:
+            raise ApiError(400, "'limit' must be at least 1")
+        unknown = set(query) - set(columns)
+        if unknown:
+            raise ApiError(400, f"Unknown filters: {', '.join(sorted(unknown))}")
+        conditions = [f"{key} > %s"] + [f"{column} = %s" for column in query]
+        rows = self.store.query(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(conditions)} ORDER BY {key} LIMIT %s",
+            (after, *query.values(), limit + 1),
+            fetch=True
+        )
+        next_cursor = str(rows[limit - 1][key]) if len(rows) > limit else None
+        return Response(200, {"items": rows[:limit], "next": next_cursor}, etag=True)
+
+    def get(self, name, item_id):
+        table, key, columns = self._resource(name)
+        rows = self.store.query(f"SELECT {', '.join(columns)} FROM {table} WHERE {key} = %s",
+                                (self._id(item_id),), fetch=True)
+        if not rows:
+            raise ApiError(404, f"No {name} with id {item_id}")
+        return Response(200, rows[0], etag=True)
+
+    def create(self, name, payload):
+        table, key, columns = self._resource(name)
+        objs = payload if isinstance(payload, list) else [payload]
+        if not objs:
+            raise ApiError(400, "Nothing to insert")
+        objs = [self._fields(table, key, obj) for obj in objs]
+        for obj in objs:
+            for column, default in DEFAULTS.items():
+                if column in columns and column not in obj:
+                    obj[column] = default()
+        fields = list(objs[0])
+        if any(set(obj) != set(fields) for obj in objs):
+            raise ApiError(400, "Every object in a batch must have the same fields")
+        query = f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join(['%s'] * len(fields))})"
+        ids = self.store.insert_rows(query, [tuple(obj[f] for f in fields) for obj in objs])
+        return Response(201, {"ids": ids} if isinstance(payload, list) else {key: ids[0]})
+
+    def update(self, name, item_id, payload):
+        table, key, _ = self._resource(name)
+        fields = self._fields(table, key, payload)
+        self.store.query(
+            f"UPDATE {table} SET {', '.join(f'{f} = %s' for f in fields)} WHERE {key} = %s",
+            (*fields.values(), self._id(item_id))
+        )
+        return self.get(name, item_id)
+
+    def delete(self, name, item_ids):
+        table, key, _ = self._resource(name)
+        deleted = self.store.bulk(f"DELETE FROM {table} WHERE {key} IN ({{ids}})", [self._id(i) for i in item_ids])
+        if len(item_ids) == 1 and not deleted:
+            raise ApiError(404, f"No {name} with id {item_ids[0]}")
+        return Response(200, {"deleted": deleted})
+
+    def procedure(self, item_id, route):
+        name, labels = PROCEDURE_ROUTES[route]
+        results = self.store.call(name, [self._id(item_id)])
+        return Response(200, dict(zip(labels, results)), etag=True)
+
+    def export(self, name):
+        table, key, columns = self._resource(name)
+        query = f"SELECT {', '.join(columns)} FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s"
+
+        def batches():
+            after = 0
+            while True:
+                rows = self.store.query(query, (after, EXPORT_BATCH), fetch=True)
+                if not rows:
+                    return
+                after = rows[-1][key]
+                yield b"".join(encode(row) + b"\n" for row in rows)
+        return Stream(batches())
+
+    # Routing
+    def route(self, method, path, query, payload):
+        """
+        Runs one request on the calling (pool) thread and returns a Response
+        or a Stream.
+        """
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return Response(200, {"status": "ok", "backend": db.BACKEND})
+        if len(parts) == 2 and parts[0] == "export" and method == "GET":
+            return self.export(parts[1])
+        if parts == ["batch"] and method == "POST":
+            return self.batch(payload)
+        if len(parts) == 3 and parts[0] == "concepts" and parts[2] in PROCEDURE_ROUTES and method == "GET":
+            return self.procedure(parts[1], parts[2])
+        if len(parts) == 1:
+            if method == "GET":
+                return self.list(parts[0], query)
+            if method == "POST":
+                return self.create(parts[0], payload)
+            if method == "DELETE" and "ids" in query:
+                return self.delete(parts[0], [i for i in query["ids"].split(",") if i])
+        if len(parts) == 2:
+            if method == "GET":
+                return self.get(parts[0], parts[1])
+            if method == "PATCH":
+                return self.update(parts[0], parts[1], payload)
+            if method == "DELETE":
+                return self.delete(parts[0], [parts[1]])
+        if len(parts) in (1, 2, 3) and (parts[0] in RESOURCES or parts[0] in ("export", "batch", "health")):
+            raise ApiError(405, f"{method} is not supported on {path}")
+        raise ApiError(404, f"No route for {path}")
+
+    def handle(self, method, target, payload):
+        """
+        route() with errors turned into JSON error responses.
+        """
+        url = urlsplit(target)
+        try:
+            return self.route(method, url.path, dict(parse_qsl(url.query)), payload)
+        except ApiError as e:
+            return Response(e.status, {"error": str(e)})
+        except db.IntegrityError as e:
+            return Response(409, {"error": str(e)})
+        except Exception as e:
+            log.exception("%s %s failed", method, target)
+            return Response(500, {"error": str(e)})
+
+    def batch(self, payload):
+        """
+        Answers several requests in one round trip, in order. Each runs on
+        its own, so one failing does not undo the others.
+        """
+        requests = (payload or {}).get("requests") if isinstance(payload, dict) else None
+        if not isinstance(requests, list) or len(requests) > MAX_BATCH:
+            raise ApiError(400, f'Expected {{"requests": [...]}} with at most {MAX_BATCH} requests')
+        responses = []
+        for request in requests:
+            method = str(request.get("method", "GET")).upper()
+            path = str(request.get("path", ""))
+            if urlsplit(path).path.strip("/").split("/")[0] in ("batch", "export"):
+                responses.append({"status": 400, "body": {"error": "batch and export cannot be nested"}})
+                continue
+            response = self.handle(method, path, request.get("body"))
+            responses.append({"status": response.status, "body": response.payload})
+        return Response(200, {"responses": responses})
+
+
+# HTTP/1.1 framing on asyncio streams
+CONTENT_LENGTH = re.compile(r"[0-9]+")
+
+def _head(status, headers, keep_alive):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    headers.setdefault("Content-Type", "application/json")
+    headers["Connection"] = "keep-alive" if keep_alive else "close"
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+def _write_response(writer, status, response, body, keep_alive):
+    writer.write(_head(status, dict(response.headers, **{"Content-Length": str(len(body))}), keep_alive) + body)
+
+
+async def _write_stream(writer, api, response, keep_alive):
+    """
+    Sends a Stream with chunked encoding and returns False if it had to
+    abort the connection. The first batch is read before the status line,
+    so an export that fails at once still gets a 500. A later failure
+    resets the connection: a cleanly ended chunked body would look like a
+    complete export.
+    """
+    loop = asyncio.get_running_loop()
+    batches = iter(response.batches)
+    try:
+        chunk = await loop.run_in_executor(api.executor, next, batches, None)
+    except Exception as e:
+        log.exception("Export failed")
+        error = Response(500, {"error": str(e)})
+        _write_response(writer, error.status, error, error.body, keep_alive)
+        return True
+    headers = dict(response.headers, **{"Transfer-Encoding": "chunked"})
+    writer.write(_head(200, headers, keep_alive))
+    try:
+        while chunk is not None:
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()  # waits for a slow client instead of buffering the export
+            chunk = await loop.run_in_executor(api.executor, next, batches, None)
+    except ConnectionError:
+        raise
+    except Exception:
+        log.exception("Export failed after its first batch; resetting the connection")
+        writer.transport.abort()
+        return False
+    writer.write(b"0\r\n\r\n")
+    return True
+
+
+async def serve_connection(api, reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            try:
+                method, target, version = request_line.split(" ", 2)
+            except ValueError:
+                break
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            length = headers.get("content-length") or "0"
+            if not CONTENT_LENGTH.fullmatch(length):
+                # the end of the body, and so the next request, cannot be found: answer and close
+                keep_alive = False
+                response = Response(400, {"error": "Content-Length must be a non-negative integer"})
+            elif int(length) > MAX_BODY:
+                writer.write(_head(413, {"Content-Length": "0"}, False))
+                break
+            else:
+                body = await reader.readexactly(int(length)) if int(length) else b""
+                if API_TOKEN and not hmac.compare_digest(headers.get("authorization", ""), f"Bearer {API_TOKEN}"):
+                    response = Response(401, {"error": "Missing or invalid bearer token"})
+                else:
+                    try:
+                        payload = json.loads(body) if body else None
+                    except ValueError:
+                        response = Response(400, {"error": "Request body is not valid JSON"})
+                    else:
+                        response = await loop.run_in_executor(api.executor, api.handle, method.upper(), target, payload)
+
+            if isinstance(response, Stream):
+                if not await _write_stream(writer, api, response, keep_alive):
+                    break
+            else:
+                status, body = response.status, response.body
+                etag = response.headers.get("ETag")
+                if method.upper() == "GET" and etag and etag in headers.get("if-none-match", ""):
+                    status, body = 304, b""
+                _write_response(writer, status, response, body, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def flush_audit_forever(api):
+    """
+    Buffered audit mode: writes queued Trigger_Log rows every
+    AUDIT_FLUSH_INTERVAL seconds, like the app's maintenance thread.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(AUDIT_FLUSH_INTERVAL)
+        try:
+            await loop.run_in_executor(api.executor, api.store.call, "FlushTriggerLog", [], True)
+        except Exception:
+            log.exception("Audit flush failed")
+
+
+async def serve(host, port):
+    executor = ThreadPoolExecutor(max_workers=API_POOL_SIZE, thread_name_prefix="api")
+    api = VaultApi(db.Store(db.create_pool(API_POOL_SIZE)), executor)
+    server = await asyncio.start_server(lambda r, w: serve_connection(api, r, w), host, port, backlog=1024)
+    if db.AUDIT_BUFFERED:
+        asyncio.ensure_future(flush_audit_forever(api))
+    log.info("Vault API on http://%s:%s (%s: %s)", host, port, db.BACKEND, db.database_name())
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless JSON API over the vault.")
+    parser.add_argument("--host", default=os.environ.get("VAULT_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("VAULT_API_PORT", "8600")))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,113 +1,870 @@
 import streamlit as st
-import mysql.connector
 from datetime import date, datetime
-import base64, os
+import db
+import sqlite_backend
+import assets
+import blobstore
+import profiler
+from graph import ConceptGraph
+from graph_layout import force_layout, viewport_mask, collapse_clusters, top_nodes
+from similarity import SimilarityIndex
+import altair as alt
+import numpy as np
+import pandas as pd
+from collections import OrderedDict, defaultdict
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+import base64, json, logging, os, re, threading, time
 
-def set_right_bg(image_path):
+log = logging.getLogger(__name__)
+
+# Wallpaper
+STATIC_DIR = "static"  # served by Streamlit at app/static/ (server.enableStaticServing)
+WALLPAPER = os.environ.get("VAULT_WALLPAPER", os.path.join(STATIC_DIR, "books.jpg"))
+
+def _static_url(path):
     """
-    Sets a translucent wallpaper covering the entire background.
+    URL of a file under static/, or None when it lies outside.
+    """
+    relative = os.path.relpath(path, STATIC_DIR)
+    if relative.startswith(".."):
+        return None
+    return f"app/static/{relative.replace(os.sep, '/')}"
+
+@st.cache_resource
+def wallpaper_style(image_path):
+    """
+    Builds the wallpaper <style> block once per server process: resized
+    WebP/JPEG variants picked by screen width, fetched by URL instead of
+    being re-sent inline on every rerun. The variant file names carry the
+    image's digest, so a changed image never shows up under an old URL.
+    Without static file serving the smallest WebP is inlined instead.
     """
-    import base64
     if not os.path.exists(image_path):
-        st.warning(f"Image not found at: {image_path}")
-        return
-    with open(image_path, "rb") as f:
-        encoded_image = base64.b64encode(f.read()).decode()
-    st.markdown(
-        f"""
-        <style>
-        [data-testid="stAppViewContainer"] {{
-            background-image: url("data:image/jpg;base64,{encoded_image}");
+        return None
+    variants = assets.image_variants(image_path)
+    widths = sorted({width for width, _ in variants})
+    rules = []
+    if st.get_option("server.enableStaticServing") and all(_static_url(p) for p in variants.values()):
+        for i, width in enumerate(widths):
+            webp, jpg = _static_url(variants[(width, "webp")]), _static_url(variants[(width, "jpg")])
+            rule = (f'[data-testid="stAppViewContainer"] {{ background-image: url("{jpg}"); '
+                    f'background-image: image-set(url("{webp}") type("image/webp"), url("{jpg}") type("image/jpeg")); }}')
+            rules.append(rule if i == 0 else f"@media (min-width: {widths[i - 1] + 1}px) {{ {rule} }}")
+    else:
+        with open(variants[(widths[0], "webp")], "rb") as f:
+            encoded_image = base64.b64encode(f.read()).decode()
+        rules.append(f'[data-testid="stAppViewContainer"] {{ background-image: url("data:image/webp;base64,{encoded_image}"); }}')
+    return (
+        "<style>\n"
+        + "\n".join(rules)
+        + """
+        [data-testid="stAppViewContainer"] {
             background-attachment: fixed;
             background-repeat: no-repeat;
             background-position: center;
             background-size: cover;
-        }}
-        [data-testid="stAppViewContainer"]::before {{
+        }
+        [data-testid="stAppViewContainer"]::before {
             content: "";
             position: fixed;
             top: 0; left: 0; right: 0; bottom: 0;
             background: rgba(255, 255, 255, 0.10);
             pointer-events: none;
             z-index: 0;
-        }}
-        [data-testid="stAppViewContainer"] .main .block-container {{
+        }
+        [data-testid="stAppViewContainer"] .main .block-container {
             background: white;
             padding: 2rem;
             border-radius: 5px;
             position: relative;
             z-index: 1;
-        }}
-        [data-testid="stSidebar"] {{
+        }
+        [data-testid="stSidebar"] {
             background-color: rgba(255, 255, 255, 0.95) !important;
             z-index: 10;
-        }}
-        [data-testid="stHeader"] {{
+        }
+        [data-testid="stHeader"] {
             background: transparent !important;
             z-index: 11;
-        }}
+        }
         </style>
-        """,
-        unsafe_allow_html=True
+        """
     )
 
+def set_right_bg(image_path):
+    """
+    Sets a translucent wallpaper covering the entire background.
+    """
+    style = wallpaper_style(image_path)
+    if style is None:
+        st.warning(f"Image not found at: {image_path}")
+        return
+    st.markdown(style, unsafe_allow_html=True)
+
 # Database connection
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="KnowledgeVault1"
-    )
+POOL_SIZE = db.pool_size("VAULT_POOL_SIZE", 5)
+POOL_TIMEOUT = float(os.environ.get("VAULT_POOL_TIMEOUT", "10"))
+
+@st.cache_resource
+def get_connection_pool():
+    """
+    Creates one connection pool per server process, shared by all sessions.
+    """
+    return db.create_pool(POOL_SIZE)
+
+@st.cache_resource
+def get_store():
+    """
+    The shared query helpers (db.Store) over this process's pool; every
+    statement goes to the profiler and every write clears the result cache.
+    """
+    return db.Store(get_connection_pool(), POOL_TIMEOUT, on_query=record_query, on_write=invalidate_tables)
+
+# Query profiler: queries are recorded when metrics are exported or with
+# VAULT_PROFILER=1; only the latter shows the developer panel, which lists SQL
+METRICS_FILE = os.environ.get("VAULT_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("VAULT_METRICS_PORT", "0"))
+PROFILE_PANEL = os.environ.get("VAULT_PROFILER", "0") == "1"
+PROFILER_ENABLED = PROFILE_PANEL or bool(METRICS_FILE or METRICS_PORT)
+METRICS_WRITE_INTERVAL = float(os.environ.get("VAULT_METRICS_WRITE_INTERVAL", "15"))
+
+@st.cache_resource
+def get_profiler():
+    return profiler.Profiler()
+
+def record_query(query, params, started, rows=None, rowcount=0, cached=False):
+    if PROFILER_ENABLED:
+        get_profiler().record(query, params, time.perf_counter() - started, rows, rowcount, cached)
+
+@st.cache_resource
+def start_metrics_export():
+    """
+    Serves the metrics on VAULT_METRICS_PORT and/or rewrites VAULT_METRICS_FILE
+    every METRICS_WRITE_INTERVAL seconds, once per server process.
+    """
+    metrics = get_profiler()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, os.environ.get("VAULT_METRICS_HOST", "127.0.0.1"))
+    if METRICS_FILE:
+        def write_forever():
+            while True:
+                try:
+                    metrics.write_textfile(METRICS_FILE)
+                except OSError:
+                    log.exception("Writing metrics failed")
+                time.sleep(METRICS_WRITE_INTERVAL)
+        threading.Thread(target=write_forever, name="metrics-writer", daemon=True).start()
+    return metrics
+
+def start_rerun_profile(page):
+    """
+    Opens the profile of this script run. A run cut short by st.rerun() is
+    closed here, when the next one starts.
+    """
+    if not PROFILER_ENABLED:
+        return None
+    if "perf_session" not in st.session_state:
+        st.session_state.perf_session = profiler.SessionStats()
+    finish_rerun_profile(st.session_state.get("perf_rerun"))
+    st.session_state.perf_rerun = get_profiler().start_rerun(page)
+    return st.session_state.perf_rerun
+
+def finish_rerun_profile(rerun):
+    if rerun is None or rerun.finished is not None:
+        return
+    get_profiler().finish_rerun(rerun)
+    st.session_state.perf_session.add(rerun)
+
+def show_profile_panel(rerun):
+    """
+    Developer panel: this run's queries by section, N+1 patterns and
+    duplicates, the session's render times and the process-wide top statements.
+    """
+    session = st.session_state.perf_session
+    with st.expander("Query profile", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Render so far", f"{rerun.seconds * 1000:.0f} ms")
+        col2.metric("Queries", len(rerun.db_queries()), f"{len(rerun.queries) - len(rerun.db_queries())} cached",
+                    delta_color="off")
+        col3.metric("Database time", f"{rerun.db_seconds() * 1000:.1f} ms")
+        col4.metric("Session p95 render", f"{session.percentile(0.95) * 1000:.0f} ms",
+                    f"{session.reruns} runs", delta_color="off")
+        st.write("#### Slowest sections")
+        st.dataframe(rerun.slowest_sections(), use_container_width=True)
+        for item in rerun.n_plus_one():
+            st.warning(f"N+1: {item['times']} × `{item['statement']}` from {item['section']}")
+        duplicates = rerun.duplicates()
+        if duplicates:
+            st.write("#### Duplicate queries in this run")
+            st.dataframe(duplicates, use_container_width=True)
+        st.write("#### All queries in this run")
+        st.dataframe(
+            [{"section": q.section, "statement": q.fingerprint, "ms": round(q.seconds * 1000, 2),
+              "rows": q.rows, "bytes": q.bytes, "cached": q.cached} for q in rerun.queries],
+            use_container_width=True
+        )
+        st.write("#### Top statements since server start")
+        st.dataframe(get_profiler().top_statements(), use_container_width=True)
+        st.download_button("Prometheus metrics", get_profiler().to_prometheus(), file_name="vault.prom",
+                           mime="text/plain")
 
 # Helper Functions
 def run_query(query, params=None, fetch=False):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, params or ())
-    data = None
-    if fetch:
-        data = cursor.fetchall()
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return data
+    return get_store().query(query, params, fetch)
+
+def run_insert(query, params):
+    return get_store().insert(query, params)
+
+def run_bulk(query, ids, params=()):
+    """
+    Runs `query` over the ids, with `{ids}` as chunked IN lists, in one
+    transaction; see db.Store.bulk. Returns the number of rows changed.
+    """
+    return get_store().bulk(query, ids, params)
+
+def run_many(query, rows):
+    return get_store().many(query, rows)
+
+def call_procedure(name, args, commit=False):
+    return get_store().call(name, args, commit)
+
+# Query result cache
+QUERY_CACHE_TTL = float(os.environ.get("VAULT_QUERY_CACHE_TTL", "60"))
+QUERY_CACHE_SIZE = int(os.environ.get("VAULT_QUERY_CACHE_SIZE", "256"))
+
+# Tables a write can also change through ON DELETE rules and triggers
+WRITE_DEPENDENCIES = {
+    "Users": {"Users", "Concepts", "Collaborators"},
+    "Categories": {"Categories", "Concepts"},
+    "Concepts": {"Concepts", "Categories", "Notes", "Tasks", "Links", "Collaborators",
+                 "Concept_Tags", "Attachments", "Trigger_Log", "Concept_Stats"},
+    "Notes": {"Notes", "Concept_Stats"},
+    "Tasks": {"Tasks", "Notes", "Trigger_Log", "Concept_Stats"},
+    "Tags": {"Tags", "Concept_Tags"},
+}
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of SELECT results keyed on (SQL, params), with a
+    time-to-live and invalidation by table.
+    """
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, tables, rows)
+        self._generations = defaultdict(int)  # bumped on every write to a table
+        self._lock = threading.Lock()
+
+    def generations(self, tables):
+        with self._lock:
+            return {t: self._generations[t] for t in tables}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, tables, rows, generations):
+        with self._lock:
+            # a write landed while the query was running, so rows may be stale
+            if any(self._generations[t] != g for t, g in generations.items()):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, tables, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables):
+        with self._lock:
+            for t in tables:
+                self._generations[t] += 1
+            stale = [k for k, e in self._entries.items() if e[1] & tables]
+            for k in stale:
+                del self._entries[k]
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+def invalidate_tables(tables):
+    affected = set()
+    for t in tables:
+        affected |= WRITE_DEPENDENCIES.get(t, {t})
+    get_query_cache().invalidate(affected)
+    return affected
+
+def cached_query(query, params=None):
+    """
+    Runs a read-only query through the shared result cache. The returned rows
+    are shared between sessions and must not be modified.
+    """
+    cache = get_query_cache()
+    key = (query, tuple(params or ()))
+    started = time.perf_counter()
+    rows = cache.get(key)
+    if rows is not None:
+        record_query(query, params, started, rows, cached=True)
+    else:
+        tables = db.tables_in(query)
+        generations = cache.generations(tables)
+        rows = run_query(query, params, fetch=True)
+        cache.put(key, tables, rows, generations)
+    return rows
+
+# Concurrent page loading
+# leave a pooled connection free for writes and the background threads
+LOADER_WORKERS = int(os.environ.get("VAULT_LOADER_WORKERS", str(max(1, POOL_SIZE - 1))))
+
+# Read queries shared by the pages; PAGE_QUERIES declares which ones a page needs
+READ_QUERIES = {
+    "categories": "SELECT category_id, name FROM Categories",
+    "concepts": "SELECT entity_id, title FROM Concepts",
+    "users": "SELECT user_id, name FROM Users",
+    "tags": "SELECT tag_id, tag FROM Tags",
+    "links": """
+        SELECT l.link_id, c1.title AS source, c2.title AS destination, l.relation_type
+        FROM Links l
+        JOIN Concepts c1 ON l.src_concept_id = c1.entity_id
+        JOIN Concepts c2 ON l.dst_concept_id = c2.entity_id
+    """,
+    "collaborations": """
+        SELECT u.name AS user, c.title AS concept, co.role
+        FROM Collaborators co
+        JOIN Users u ON co.user_id = u.user_id
+        JOIN Concepts c ON co.concept_id = c.entity_id
+    """,
+    "tagged_concepts": """
+        SELECT c.title AS concept, t.tag
+        FROM Concept_Tags ct
+        JOIN Concepts c ON ct.entity_id = c.entity_id
+        JOIN Tags t ON ct.tag_id = t.tag_id
+    """,
+    "attachments": """
+        SELECT a.attachment_id, c.title AS concept, a.file_path, a.file_name, a.file_type, a.file_size
+        FROM Attachments a
+        JOIN Concepts c ON a.entity_id = c.entity_id
+    """,
+    "notes_per_concept": """
+        SELECT c.title, SUM(s.note_count) AS note_count
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        GROUP BY c.title;
+    """,
+    "pending_tasks": """
+        SELECT c.title, SUM(s.pending_count) AS pending_tasks
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        WHERE s.pending_count > 0
+        GROUP BY c.title;
+    """,
+    "avg_tasks": """
+        SELECT c.title, AVG(s.task_count > 0) AS avg_tasks
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        GROUP BY c.title;
+    """,
+    "concepts_with_notes": """
+        SELECT title FROM Concepts
+        WHERE entity_id IN (
+            SELECT entity_id FROM Concept_Stats WHERE note_count > 1
+        );
+    """,
+    "tasks_with_owners": """
+        SELECT t.description, t.status, c.title AS concept, u.name AS owner
+        FROM Tasks t
+        JOIN Concepts c ON t.entity_id = c.entity_id
+        JOIN Users u ON c.user_id = u.user_id;
+    """,
+}
+
+PAGE_QUERIES = {
+    "Add Concept": ["categories"],
+    "View Concepts": ["categories"],
+    "Link Concepts": ["concepts", "links"],
+    "Graph View": ["concepts"],
+    "Graph Explorer": ["concepts"],
+    "Collaborators": ["users", "concepts", "collaborations"],
+    "Tags": ["tags", "concepts", "tagged_concepts"],
+    "Attachments": ["concepts", "attachments"],
+    "Analytics": ["notes_per_concept", "pending_tasks"],
+    "Queries Showcase": ["avg_tasks", "concepts_with_notes", "tasks_with_owners"],
+}
+
+class InFlight:
+    """
+    Merges concurrent identical reads: a request for a (SQL, params) pair
+    that is already running, from this session or another, waits on the
+    running one instead of sending the query again.
+    """
+    def __init__(self, executor):
+        self.executor = executor
+        self._futures = {}
+        self._lock = threading.RLock()  # a done callback can run inside submit()
+
+    def submit(self, key, fn):
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self.executor.submit(fn)
+                self._futures[key] = future
+                future.add_done_callback(lambda f: self._discard(key, f))
+            return future
+
+    def _discard(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+@st.cache_resource
+def get_loader():
+    return InFlight(ThreadPoolExecutor(max_workers=LOADER_WORKERS, thread_name_prefix="page-loader"))
+
+def fetch_all(queries, cached=True):
+    """
+    Runs independent read queries concurrently on the loader pool and
+    returns {name: rows}, so a page waits for its slowest query rather than
+    the sum of them. `queries` maps names to SQL or (SQL, params).
+    """
+    loader = get_loader()
+    fn = cached_query if cached else lambda sql, params: run_query(sql, params, fetch=True)
+    futures = {}
+    for name, query in queries.items():
+        sql, params = query if isinstance(query, tuple) else (query, ())
+        key = (cached, sql, tuple(params))
+        futures[name] = loader.submit(key, profiler.in_caller_context(fn, sql, params))
+    return {name: future.result() for name, future in futures.items()}
+
+def prefetch_page(page):
+    """
+    Loads the page's declared reads into the result cache in parallel; the
+    page's own cached_query() calls are then cache hits. Reads made after a
+    write on the page still go to the database.
+    """
+    names = PAGE_QUERIES.get(page)
+    if names:
+        fetch_all({name: READ_QUERIES[name] for name in names})
+
+# Concept graph
+# in-memory indexes are rebuilt from the database this often, to pick up
+# writes that bypass the app (direct SQL, rows added by triggers)
+INDEX_TTL = float(os.environ.get("VAULT_INDEX_TTL", "3600"))
+
+@st.cache_resource(ttl=INDEX_TTL)
+def get_concept_graph():
+    """
+    Loads the Links table into an in-memory adjacency index per server
+    process; Create Link and concept deletes keep it current in between
+    rebuilds, fetching it before they write.
+    """
+    rows = fetch_all({
+        "concepts": "SELECT entity_id FROM Concepts",
+        "links": "SELECT src_concept_id, dst_concept_id, relation_type FROM Links",
+    }, cached=False)
+    concepts, links = rows["concepts"], rows["links"]
+    return ConceptGraph.from_rows(
+        (c['entity_id'] for c in concepts),
+        ((l['src_concept_id'], l['dst_concept_id'], l['relation_type']) for l in links)
+    )
+
+# Similar concepts
+TITLE_WEIGHT = 3  # a title word counts as much as three in the notes
+TAG_WEIGHT = 2
+SUGGESTION_COUNT = 5
+
+@st.cache_resource(ttl=INDEX_TTL)
+def get_similarity_index():
+    """
+    Builds the TF-IDF index over concept titles, notes and tags per server
+    process; Add Concept, Add Note, Tags and concept deletes keep it current
+    in between rebuilds. They fetch it before writing, so that a rebuild
+    which already read their row is not given it a second time.
+    """
+    rows = fetch_all({
+        "titles": "SELECT entity_id, title FROM Concepts",
+        "notes": "SELECT entity_id, body FROM Notes",
+        "tags": "SELECT ct.entity_id, t.tag FROM Concept_Tags ct JOIN Tags t ON ct.tag_id = t.tag_id",
+    }, cached=False)
+    return SimilarityIndex.from_rows(chain(
+        ((r['entity_id'], r['title'], TITLE_WEIGHT) for r in rows["titles"]),
+        ((r['entity_id'], r['body'], 1) for r in rows["notes"]),
+        ((r['entity_id'], r['tag'], TAG_WEIGHT) for r in rows["tags"]),
+    ))
+
+# Graph layout
+GRAPH_MAX_NODES = int(os.environ.get("VAULT_GRAPH_MAX_NODES", "1500"))
+GRAPH_MAX_EDGES = int(os.environ.get("VAULT_GRAPH_MAX_EDGES", "5000"))
+CLUSTER_ZOOM = 4  # below this zoom, crowded views collapse into clusters
+# tables behind the titles and the Category/Tag grouping of a layout
+LAYOUT_TABLES = {"Concepts", "Categories", "Tags", "Concept_Tags"}
+
+class LayoutSeed:
+    """
+    Positions (entity_id -> (x, y)) from the most recent layout, shared by
+    all sessions. Layouts computed at the same time each read a snapshot
+    and replace it whole, so one never sees the other half-written.
+    """
+    def __init__(self):
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def positions(self):
+        with self._lock:
+            return self._positions
+
+    def replace(self, positions):
+        with self._lock:
+            self._positions = positions
+
+@st.cache_resource
+def get_layout_seed():
+    return LayoutSeed()
+
+@st.cache_resource(max_entries=2)
+def get_graph_layout(serial, version, concept_count, generations):
+    """
+    Computes the force-directed layout for one version of the concept graph
+    (its serial and version) and of the titles, categories and tags it is
+    drawn with (their result-cache generations).
+    When most concepts were already placed, the previous layout is refined
+    with a few cool iterations instead of being recomputed from scratch.
+    """
+    rows = run_query("""
+        SELECT c.entity_id, c.title,
+               COALESCE(cat.name, 'Uncategorized') AS category,
+               COALESCE(MIN(t.tag), 'Untagged') AS tag
+        FROM Concepts c
+        LEFT JOIN Categories cat ON c.category_id = cat.category_id
+        LEFT JOIN Concept_Tags ct ON ct.entity_id = c.entity_id
+        LEFT JOIN Tags t ON ct.tag_id = t.tag_id
+        GROUP BY c.entity_id, c.title, cat.name
+        ORDER BY c.entity_id
+    """, fetch=True)
+    ids = [r['entity_id'] for r in rows]
+    index = {e: i for i, e in enumerate(ids)}
+    pairs = [(index[s], index[d]) for s, d in zip(*get_concept_graph().edge_list())
+             if s in index and d in index]
+    src = np.array([p[0] for p in pairs], dtype=np.int64)
+    dst = np.array([p[1] for p in pairs], dtype=np.int64)
+    seed = get_layout_seed().positions()
+    known = [i for i, e in enumerate(ids) if e in seed]
+    if len(known) > len(ids) // 2:
+        initial = np.random.default_rng(0).random((len(ids), 2))
+        initial[known] = [seed[ids[i]] for i in known]
+        pos = force_layout(len(ids), src, dst, iterations=10, initial=initial, temperature=0.02)
+    else:
+        pos = force_layout(len(ids), src, dst)
+    get_layout_seed().replace(dict(zip(ids, map(tuple, pos))))
+    return {
+        "pos": pos,
+        "src": src,
+        "dst": dst,
+        "titles": np.array([r['title'] for r in rows], dtype=object),
+        "Category": np.array([r['category'] for r in rows]),
+        "Tag": np.array([r['tag'] for r in rows]),
+        "degree": np.bincount(src, minlength=len(ids)) + np.bincount(dst, minlength=len(ids)),
+    }
+
+# Full-text search
+SEARCH_LIMIT = 50
+
+SEARCH_QUERY = """
+    SELECT 'Concept' AS kind, c.entity_id AS id, c.entity_id, c.title AS concept, c.title AS text,
+           MATCH(c.title) AGAINST (%s IN BOOLEAN MODE) AS score
+    FROM Concepts c
+    WHERE MATCH(c.title) AGAINST (%s IN BOOLEAN MODE)
+    UNION ALL
+    SELECT 'Note', n.note_id, n.entity_id, c.title, n.body,
+           MATCH(n.body) AGAINST (%s IN BOOLEAN MODE)
+    FROM Notes n
+    JOIN Concepts c ON n.entity_id = c.entity_id
+    WHERE MATCH(n.body) AGAINST (%s IN BOOLEAN MODE)
+    UNION ALL
+    SELECT 'Task', t.task_id, t.entity_id, c.title, t.description,
+           MATCH(t.description) AGAINST (%s IN BOOLEAN MODE)
+    FROM Tasks t
+    JOIN Concepts c ON t.entity_id = c.entity_id
+    WHERE MATCH(t.description) AGAINST (%s IN BOOLEAN MODE)
+    UNION ALL
+    SELECT 'Tag', tg.tag_id, c.entity_id, c.title, tg.tag,
+           MATCH(tg.tag) AGAINST (%s IN BOOLEAN MODE)
+    FROM Tags tg
+    JOIN Concept_Tags ct ON ct.tag_id = tg.tag_id
+    JOIN Concepts c ON ct.entity_id = c.entity_id
+    WHERE MATCH(tg.tag) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY score DESC
+    LIMIT %s
+"""
+
+def search_terms(text):
+    return re.findall(r"\w+", text.lower())
+
+def search_vault(text, limit=SEARCH_LIMIT):
+    """
+    Searches concept titles, note bodies, task descriptions and tags through
+    the FULLTEXT indexes (FTS5 on SQLite). Every word must match, and the
+    last one may be a prefix.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    if db.BACKEND == "sqlite":
+        expression = " ".join(f'"{t}"' for t in terms) + "*"
+        return cached_query(sqlite_backend.SEARCH_QUERY, (expression, limit))
+    expression = " ".join(f"+{t}" for t in terms) + "*"
+    return cached_query(SEARCH_QUERY, (expression,) * 8 + (limit,))
+
+def make_snippet(text, terms, width=160):
+    """
+    Cuts a window of `width` characters around the first matching term and
+    bolds the matches.
+    """
+    text = " ".join((text or "").split())
+    match = re.search(r"\b(" + "|".join(map(re.escape, terms)) + r")", text, re.IGNORECASE)
+    start = max(0, match.start() - width // 3) if match else 0
+    snippet = text[start:start + width]
+    snippet = re.sub(r"\b(" + "|".join(map(re.escape, terms)) + r")(\w*)", r"**\1\2**", snippet, flags=re.IGNORECASE)
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+# Attachment thumbnails
+THUMB_WIDTH = 80
+PREVIEW_WIDTH = 400
+PREVIEW_SIZE = 2 * PREVIEW_WIDTH  # sharp on high-density screens
+
+@st.cache_data(max_entries=10000, show_spinner=False)
+def cached_thumbnail(file_path, file_type):
+    """
+    Path of the attachment's thumbnail. Files without one are remembered
+    too, so a listing does no file checks after the first.
+    """
+    if not os.path.exists(file_path):
+        return None
+    return assets.thumbnail(file_path, file_type)
+
+# Attachment integrity check
+ATTACHMENT_SWEEP_INTERVAL = float(os.environ.get("VAULT_ATTACHMENT_SWEEP_INTERVAL", "600"))
+SWEEP_BATCH = 1000
+
+def sweep_missing_attachments():
+    """
+    Deletes Attachments rows whose file no longer exists, scanning the table
+    in keyset batches with one DELETE per batch. Returns the removed paths.
+    """
+    removed = []
+    after = 0
+    while True:
+        rows = run_query(
+            "SELECT attachment_id, file_path FROM Attachments WHERE attachment_id > %s ORDER BY attachment_id LIMIT %s",
+            (after, SWEEP_BATCH),
+            fetch=True
+        )
+        if not rows:
+            break
+        after = rows[-1]['attachment_id']
+        missing = [r for r in rows if not os.path.exists(r['file_path'])]
+        if missing:
+            placeholders = ", ".join(["%s"] * len(missing))
+            run_query(
+                f"DELETE FROM Attachments WHERE attachment_id IN ({placeholders})",
+                tuple(r['attachment_id'] for r in missing)
+            )
+            removed.extend(r['file_path'] for r in missing)
+    return removed
+
+@st.cache_resource
+def start_attachment_checker():
+    """
+    Starts one daemon thread per server process that runs the missing-file
+    sweep every ATTACHMENT_SWEEP_INTERVAL seconds, off the render path.
+    """
+    def check_forever():
+        while True:
+            try:
+                sweep_missing_attachments()
+            except Exception:
+                log.exception("Attachment check failed")
+            time.sleep(ATTACHMENT_SWEEP_INTERVAL)
+    thread = threading.Thread(target=check_forever, name="attachment-checker", daemon=True)
+    thread.start()
+    return thread
+
+# Trigger log retention and buffered audit flushing
+LOG_RETENTION_MONTHS = int(os.environ.get("VAULT_LOG_RETENTION_MONTHS", "6"))
+LOG_ROTATE_INTERVAL = float(os.environ.get("VAULT_LOG_ROTATE_INTERVAL", "3600"))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("VAULT_AUDIT_FLUSH_INTERVAL", "5"))
+
+@st.cache_resource
+def start_log_maintenance():
+    """
+    Starts one daemon thread per server process that rotates the Trigger_Log
+    partitions every LOG_ROTATE_INTERVAL seconds and, in buffered audit mode,
+    flushes Trigger_Log_Buffer every AUDIT_FLUSH_INTERVAL seconds.
+    """
+    def maintain_forever():
+        next_rotation = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_rotation:
+                    call_procedure("RotateTriggerLog", [LOG_RETENTION_MONTHS], commit=True)
+                    next_rotation = time.monotonic() + LOG_ROTATE_INTERVAL
+                if db.AUDIT_BUFFERED:
+                    call_procedure("FlushTriggerLog", [], commit=True)
+            except Exception:
+                log.exception("Trigger log maintenance failed")
+            time.sleep(AUDIT_FLUSH_INTERVAL if db.AUDIT_BUFFERED else LOG_ROTATE_INTERVAL)
+    thread = threading.Thread(target=maintain_forever, name="trigger-log-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+# Writes from other processes
+CHANGE_CHECK_INTERVAL = float(os.environ.get("VAULT_CHANGE_CHECK_INTERVAL", "5"))
+GRAPH_TABLES = {"Concepts", "Links"}
+SIMILARITY_TABLES = {"Concepts", "Notes", "Tags", "Concept_Tags"}
+
+def apply_external_changes():
+    """
+    Drops everything this process cached from tables that the JSON API,
+    an import or another app server wrote to since the last check. The
+    graph and the similar-concept index are rebuilt on their next use.
+    """
+    changed = get_store().changed_elsewhere()
+    if changed:
+        affected = invalidate_tables(changed)
+        if affected & GRAPH_TABLES:
+            get_concept_graph.clear()
+        if affected & SIMILARITY_TABLES:
+            get_similarity_index.clear()
+    return changed
+
+@st.cache_resource
+def start_change_checker():
+    """
+    Starts one daemon thread per server process that looks for writes from
+    other processes every CHANGE_CHECK_INTERVAL seconds.
+    """
+    def check_forever():
+        while True:
+            try:
+                apply_external_changes()
+            except Exception:
+                log.exception("Change check failed")
+            time.sleep(CHANGE_CHECK_INTERVAL)
+    thread = threading.Thread(target=check_forever, name="change-checker", daemon=True)
+    thread.start()
+    return thread
+
+def fetch_log_page(before, limit, log_table=None):
+    """
+    Fetches one page of the trigger log, newest first, with keyset
+    pagination on (created_at, log_id) so each page is an index range scan.
+    `before` is the (created_at, log_id) of the previous page's last row.
+    """
+    conditions, params = [], []
+    if before:
+        conditions.append("(created_at, log_id) < (%s, %s)")
+        params.extend(before)
+    if log_table:
+        conditions.append("log_table = %s")
+        params.append(log_table)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = run_query(
+        f"""SELECT log_id, log_table, log_action, log_info, created_at FROM Trigger_Log {where}
+            ORDER BY created_at DESC, log_id DESC LIMIT %s""",
+        tuple(params) + (limit + 1,),
+        fetch=True
+    )
+    return rows[:limit], len(rows) > limit
+
+# Pagination
+PAGE_SIZES = [10, 25, 50, 100]
+
+def fetch_page(table, key, after, limit):
+    """
+    Fetches the rows of one page using keyset pagination (key > after), plus
+    one extra row to tell whether a next page exists.
+    """
+    rows = run_query(
+        f"SELECT * FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s",
+        (after, limit + 1),
+        fetch=True
+    )
+    return rows[:limit], len(rows) > limit
+
+def _reset_pages(table):
+    st.session_state[f"cursors_{table}"] = [0]
+
+def _next_page(table, last_key):
+    st.session_state[f"cursors_{table}"].append(last_key)
+
+def _prev_page(table):
+    st.session_state[f"cursors_{table}"].pop()
+
+def paginate(table, key):
+    """
+    Renders the page-size, view-mode and Previous/Next controls for a table and
+    returns (rows on the current page, compact table mode on/off).
+    Each visited page's starting key is kept on a stack in session state.
+    """
+    if f"cursors_{table}" not in st.session_state:
+        _reset_pages(table)
+    cursors = st.session_state[f"cursors_{table}"]
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox(
+            "Rows per page", PAGE_SIZES, key=f"page_size_{table}",
+            on_change=_reset_pages, args=(table,)
+        )
+    with col2:
+        table_mode = st.toggle("Compact table view", key=f"table_mode_{table}")
+    rows, has_next = fetch_page(table, key, cursors[-1], page_size)
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        st.button("Previous", key=f"prev_{table}", disabled=len(cursors) == 1,
+                  on_click=_prev_page, args=(table,))
+    with col2:
+        st.button("Next", key=f"next_{table}", disabled=not has_next,
+                  on_click=_next_page, args=(table, rows[-1][key] if rows else 0))
+    with col3:
+        st.caption(f"Page {len(cursors)}")
+    return rows, table_mode
 
 # Streamlit Page Setup
 st.set_page_config(page_title="Personal Knowledge Vault", layout="wide")
 st.title("Personal Knowledge-Graph Vault")
 
+start_attachment_checker()
+start_log_maintenance()
+start_change_checker()
+start_metrics_export()
+
 if "active_page" not in st.session_state:
     st.session_state.active_page = "View Concepts"
 
 # Sidebar menu buttons
+PAGES = [
+    "View Concepts", "Add Concept", "Add Note", "View Notes", "Add Task", "View Tasks", "Search",
+    "Manage Users", "Procedures & Views", "Link Concepts", "Graph View", "Graph Explorer", "Collaborators", "Tags",
+    "Attachments", "Analytics", "Queries Showcase", "Activity Log",
+]
 st.sidebar.title("Menu")
-if st.sidebar.button("View Concepts"):
-    st.session_state.active_page = "View Concepts"
-if st.sidebar.button("Add Concept"):
-    st.session_state.active_page = "Add Concept"
-if st.sidebar.button("Add Note"):
-    st.session_state.active_page = "Add Note"
-if st.sidebar.button("View Notes"):
-    st.session_state.active_page = "View Notes"
-if st.sidebar.button("Add Task"):
-    st.session_state.active_page = "Add Task"
-if st.sidebar.button("View Tasks"):
-    st.session_state.active_page = "View Tasks"
-if st.sidebar.button("Manage Users"):
-    st.session_state.active_page = "Manage Users"
+for page in PAGES:
+    if st.sidebar.button(page):
+        st.session_state.active_page = page
 
 menu = st.session_state.active_page
+rerun_profile = start_rerun_profile(menu)
+prefetch_page(menu)
+if PROFILE_PANEL:
+    st.sidebar.toggle("Query profile", key="show_profile_panel")
 
-# BACKGROUND WALLPAPER SWITCHER
-if menu in ["View Concepts", "Add Concept"]:
-    set_right_bg("static/books.jpg")
-elif menu in ["Add Note", "View Notes"]:
-    set_right_bg("static/books.jpg")
-elif menu in ["Add Task", "View Tasks"]:
-    set_right_bg("static/books.jpg")
-else:
-    set_right_bg("static/books.jpg")
+# BACKGROUND WALLPAPER
+set_right_bg(WALLPAPER)
 
 
 # MANAGE USERS SECTION (with trigger demo)
@@ -127,7 +884,7 @@ if menu == "Add Concept":
     st.header("Add New Concept")
     ctype = st.text_input("Concept Type (e.g. Project, Idea, Paper)")
     title = st.text_input("Concept Title")
-    categories = run_query("SELECT category_id, name FROM Categories", fetch=True)
+    categories = cached_query(READ_QUERIES["categories"])
     category_map = {c['name']: c['category_id'] for c in categories} if categories else {}
     if category_map:
         category_name = st.selectbox("Select Category", list(category_map.keys()))
@@ -137,21 +894,57 @@ if menu == "Add Concept":
         category_id = None
     if st.button("Add Concept"):
         if ctype and title:
+            # fetched before the write: an index rebuilt after it already has the row
+            index = get_similarity_index()
             query = "INSERT INTO Concepts (type, title, created_on, category_id) VALUES (%s, %s, CURDATE(), %s)"
-            run_query(query, (ctype, title, category_id))
+            entity_id = run_insert(query, (ctype, title, category_id))
+            index.add_text(entity_id, title, TITLE_WEIGHT)
             st.success("Concept added successfully!")
         else:
             st.error("Please fill all required fields.")
 
 elif menu == "View Concepts":
     st.header("All Concepts")
-    data = run_query("SELECT * FROM Concepts", fetch=True)
+    data, table_mode = paginate("Concepts", "entity_id")
     if data:
+        with st.expander("Bulk actions"):
+            titles = {d['entity_id']: f"{d['entity_id']}: {d['title']}" for d in data}
+            selected = st.multiselect("Concepts on this page", list(titles), format_func=titles.get, key="bulk_concepts")
+            categories = cached_query(READ_QUERIES["categories"])
+            category_map = {c['name']: c['category_id'] for c in categories} if categories else {}
+            col1, col2 = st.columns(2)
+            with col1:
+                if category_map:
+                    target = st.selectbox("Move to category", list(category_map), key="bulk_category")
+                    if st.button("Move selected", disabled=not selected):
+                        moved = run_bulk(
+                            "UPDATE Concepts SET category_id = %s WHERE entity_id IN ({ids})",
+                            selected, (category_map[target],)
+                        )
+                        st.session_state.pop("bulk_concepts", None)
+                        st.success(f"Moved {moved} concepts to '{target}'.")
+                        st.rerun()  # the page above was fetched before the move
+            with col2:
+                confirm = st.checkbox("Also delete their notes, tasks and attachments", key="bulk_delete_confirm")
+                if st.button("Delete selected", disabled=not (selected and confirm)):
+                    graph, index = get_concept_graph(), get_similarity_index()
+                    deleted = run_bulk("DELETE FROM Concepts WHERE entity_id IN ({ids})", selected)
+                    graph.remove_concepts(selected)
+                    index.remove_concepts(selected)
+                    st.session_state.pop("bulk_concepts", None)
+                    st.warning(f"Deleted {deleted} concepts.")
+                    st.rerun()
+    if data and table_mode:
+        st.dataframe(data, hide_index=True)
+    elif data:
         for d in data:
             st.subheader(f"{d['title']} ({d['type']})")
             st.write(f"Created on: {d['created_on']}")
             if st.button(f"Delete Concept {d['entity_id']}", key=f"del_{d['entity_id']}"):
+                graph, index = get_concept_graph(), get_similarity_index()
                 run_query("DELETE FROM Concepts WHERE entity_id = %s", (d['entity_id'],))
+                graph.remove_concept(d['entity_id'])
+                index.remove_concepts([d['entity_id']])
                 st.warning(f"Concept '{d['title']}' deleted along with its notes, tasks, and attachments!")
                 st.rerun()
             st.markdown("---")
@@ -166,16 +959,20 @@ elif menu == "Add Note":
     body = st.text_area("Note Content")
     if st.button("Add Note"):
         if concept_id and body:
+            index = get_similarity_index()
             query = "INSERT INTO Notes (entity_id, body, created_on) VALUES (%s, %s, CURDATE())"
             run_query(query, (concept_id, body))
+            index.add_text(concept_id, body)
             st.success("Note added successfully!")
         else:
             st.error("Please fill all fields.")
 
 elif menu == "View Notes":
     st.header("All Notes")
-    notes = run_query("SELECT * FROM Notes", fetch=True)
-    if notes:
+    notes, table_mode = paginate("Notes", "note_id")
+    if notes and table_mode:
+        st.dataframe(notes, hide_index=True)
+    elif notes:
         for n in notes:
             st.subheader(f"Note ID: {n['note_id']}")
             st.write(f"Concept ID: {n['entity_id']}")
@@ -202,8 +999,39 @@ elif menu == "Add Task":
 
 elif menu == "View Tasks":
     st.header("All Tasks")
-    tasks = run_query("SELECT * FROM Tasks", fetch=True)
-    if tasks:
+    tasks, table_mode = paginate("Tasks", "task_id")
+    with st.expander("Bulk status change"):
+        statuses = ["Pending", "In Progress", "Completed"]
+        scope = st.radio("Apply to", ["Selected tasks on this page", "Every task with a status"],
+                         horizontal=True, key="bulk_task_scope")
+        if scope == "Selected tasks on this page":
+            labels = {t['task_id']: f"{t['task_id']}: {t['description']}" for t in tasks}
+            selected = st.multiselect("Tasks", list(labels), format_func=labels.get, key="bulk_tasks")
+            from_status = None
+        else:
+            from_status = st.selectbox("Current status", statuses, key="bulk_from_status")
+            selected = None
+        new_status = st.selectbox("New status", statuses, index=2, key="bulk_new_status")
+        if st.button("Apply to tasks", disabled=scope == "Selected tasks on this page" and not selected):
+            if new_status == "Completed" and from_status is not None:
+                # one UPDATE on the server, however many tasks have the status
+                results = call_procedure("MarkStatusCompleted", [from_status], commit=True)
+                st.success(f"Marked {results[-1][0]['completed']} '{from_status}' tasks as Completed.")
+            elif new_status == "Completed":
+                call_procedure("MarkTasksCompleted", [json.dumps(selected)], commit=True)
+                st.success(f"Marked {len(selected)} tasks as Completed.")
+            elif from_status is not None:
+                # one statement for every matching task, however many pages they span
+                run_query("UPDATE Tasks SET status = %s WHERE status = %s", (new_status, from_status))
+                st.success(f"Every '{from_status}' task is now '{new_status}'.")
+            else:
+                changed = run_bulk("UPDATE Tasks SET status = %s WHERE task_id IN ({ids})", selected, (new_status,))
+                st.success(f"Updated {changed} tasks to '{new_status}'.")
+            st.session_state.pop("bulk_tasks", None)
+            st.rerun()  # the page above was fetched before the change
+    if tasks and table_mode:
+        st.dataframe(tasks, hide_index=True)
+    elif tasks:
         for t in tasks:
             st.subheader(f"{t['description']}")
             st.write(f"Concept ID: {t['entity_id']}")
@@ -224,301 +1052,543 @@ elif menu == "View Tasks":
         st.warning("No tasks found.")
 
 
-# STORED PROCEDURES / FUNCTIONS / VIEWS (ONLY EXISTING ONES)
-st.header("Database Procedures & Views")
-
-proc_choice = st.selectbox(
-    "Choose an operation",
-    ["Select one", "GetConceptDetails", "GetLinkedConcepts", "MarkTaskCompleted", "DaysRemaining", "View: Concept_Summary"]
-)
-
-#  GetConceptDetails 
-if proc_choice == "GetConceptDetails":
-    concept_id = st.number_input("Enter Concept ID", min_value=1, step=1)
-    if st.button("Run GetConceptDetails"):
+# SEARCH (FULLTEXT indexes on titles, notes, tasks and tags)
+elif menu == "Search":
+    st.header("Search the Vault")
+    text = st.text_input("Search concepts, notes, tasks and tags")
+    mode = st.radio("Match", ["Keywords", "Similar concepts"], horizontal=True, key="search_mode")
+    if text and mode == "Similar concepts":
+        # TF-IDF over titles, notes and tags: ranks concepts by overall resemblance, not exact words
+        found = get_similarity_index().search(text, SEARCH_LIMIT)
+        titles = {c['entity_id']: c['title'] for c in cached_query(READ_QUERIES["concepts"])}
+        if found:
+            st.dataframe([
+                {"entity_id": entity_id, "concept": titles.get(entity_id), "similarity": round(score, 3)}
+                for entity_id, score in found
+            ], hide_index=True)
+        else:
+            st.info("No similar concepts found.")
+    elif text:
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.callproc("GetConceptDetails", [concept_id])
-            for result in cursor.stored_results():
-                rows = result.fetchall()
-                if rows:
-                    st.dataframe(rows)
-            cursor.close()
-            conn.close()
+            results = search_vault(text)
         except Exception as e:
             st.error(f"Error: {e}")
+            results = None
+        terms = search_terms(text)
+        if results:
+            st.caption(f"{len(results)} result(s)")
+            for r in results:
+                st.markdown(f"**{r['kind']}** · {r['concept']} (Concept ID: {r['entity_id']})")
+                st.markdown(make_snippet(r['text'], terms))
+                st.markdown("---")
+        elif results is not None:
+            st.info("No matches found.")
 
-# GetLinkedConcepts 
-elif proc_choice == "GetLinkedConcepts":
-    concept_id = st.number_input("Enter Concept ID", min_value=1, step=1, key="link_proc")
-    if st.button("Run GetLinkedConcepts"):
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.callproc("GetLinkedConcepts", [concept_id])
-            for result in cursor.stored_results():
-                rows = result.fetchall()
-                if rows:
-                    st.dataframe(rows)
+# STORED PROCEDURES / FUNCTIONS / VIEWS (ONLY EXISTING ONES)
+elif menu == "Procedures & Views":
+    st.header("Database Procedures & Views")
+    proc_choice = st.selectbox(
+        "Choose an operation",
+        ["Select one", "GetConceptDetails", "GetLinkedConcepts", "MarkTaskCompleted", "DaysRemaining", "View: Concept_Summary",
+         "Verify/Rebuild Concept_Stats"]
+    )
+
+    #  GetConceptDetails 
+    if proc_choice == "GetConceptDetails":
+        concept_id = st.number_input("Enter Concept ID", min_value=1, step=1)
+        if st.button("Run GetConceptDetails"):
+            try:
+                for rows in call_procedure("GetConceptDetails", [concept_id]):
+                    if rows:
+                        st.dataframe(rows)
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+    # GetLinkedConcepts 
+    elif proc_choice == "GetLinkedConcepts":
+        concept_id = st.number_input("Enter Concept ID", min_value=1, step=1, key="link_proc")
+        if st.button("Run GetLinkedConcepts"):
+            try:
+                for rows in call_procedure("GetLinkedConcepts", [concept_id]):
+                    if rows:
+                        st.dataframe(rows)
+                    else:
+                        st.info("No linked concepts found.")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+    #  MarkTaskCompleted
+    elif proc_choice == "MarkTaskCompleted":
+        task_id = st.number_input("Enter Task ID", min_value=1, step=1, key="task_proc")
+        if st.button("Run MarkTaskCompleted"):
+            try:
+                call_procedure("MarkTaskCompleted", [task_id], commit=True)
+                st.success(f"Task {task_id} marked as Completed (trigger auto-creates a note).")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+    # DaysRemaining (function)
+    elif proc_choice == "DaysRemaining":
+        task_id = st.number_input("Enter Task ID", min_value=1, step=1, key="days_func")
+        if st.button("Run DaysRemaining Function"):
+            try:
+                query = "SELECT DaysRemaining(%s) AS days_left"
+                data = run_query(query, (task_id,), fetch=True)
+                if data:
+                    st.info(f"Days Remaining for Task {task_id}: {data[0]['days_left']}")
                 else:
-                    st.info("No linked concepts found.")
-            cursor.close()
-            conn.close()
-        except Exception as e:
-            st.error(f"Error: {e}")
+                    st.warning("No result returned.")
+            except Exception as e:
+                st.error(f"Error: {e}")
 
-#  MarkTaskCompleted
-elif proc_choice == "MarkTaskCompleted":
-    task_id = st.number_input("Enter Task ID", min_value=1, step=1, key="task_proc")
-    if st.button("Run MarkTaskCompleted"):
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.callproc("MarkTaskCompleted", [task_id])
-            conn.commit()
-            st.success(f"Task {task_id} marked as Completed (trigger auto-creates a note).")
-            cursor.close()
-            conn.close()
-        except Exception as e:
-            st.error(f"Error: {e}")
+    #  View: Concept_Summary 
+    elif proc_choice == "View: Concept_Summary":
+        if st.button("Show Concept Summary"):
+            try:
+                data = cached_query("SELECT * FROM Concept_Summary")
+                st.dataframe(data)
+            except Exception as e:
+                st.error(f"Error: {e}")
 
-# DaysRemaining (function)
-elif proc_choice == "DaysRemaining":
-    task_id = st.number_input("Enter Task ID", min_value=1, step=1, key="days_func")
-    if st.button("Run DaysRemaining Function"):
-        try:
-            query = "SELECT DaysRemaining(%s) AS days_left"
-            data = run_query(query, (task_id,), fetch=True)
-            if data:
-                st.info(f"Days Remaining for Task {task_id}: {data[0]['days_left']}")
+    #  Concept_Stats maintenance
+    elif proc_choice == "Verify/Rebuild Concept_Stats":
+        st.caption("Concept_Stats holds the note and task counts the dashboards read; triggers keep it current.")
+        col1, col2 = st.columns(2)
+        if col1.button("Run VerifyConceptStats"):
+            try:
+                drift = call_procedure("VerifyConceptStats", [])[0]
+                if drift:
+                    st.warning(f"{len(drift)} concepts have out-of-date counts.")
+                    st.dataframe(drift)
+                else:
+                    st.success("Concept_Stats matches Notes and Tasks.")
+            except Exception as e:
+                st.error(f"Error: {e}")
+        if col2.button("Run RebuildConceptStats"):
+            try:
+                call_procedure("RebuildConceptStats", [], commit=True)
+                st.success("Concept_Stats recounted from Notes and Tasks.")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+# LINKING CONCEPTS SECTION
+elif menu == "Link Concepts":
+    st.header("Link Concepts")
+    concepts = cached_query(READ_QUERIES["concepts"])
+    if concepts:
+        concept_options = {c['title']: c['entity_id'] for c in concepts}
+        col1, col2 = st.columns(2)
+        with col1:
+            src = st.selectbox("Source Concept", list(concept_options.keys()))
+        with col2:
+            dst = st.selectbox("Destination Concept", list(concept_options.keys()))
+        relation_type = st.text_input("Relation Type (e.g., builds on, related to)")
+        if st.button("Create Link"):
+            if src == dst:
+                st.warning("You can’t link a concept to itself.")
             else:
-                st.warning("No result returned.")
-        except Exception as e:
-            st.error(f"Error: {e}")
+                # fetched before the write: a graph rebuilt after it already has the link
+                graph = get_concept_graph()
+                run_query(
+                    "INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES (%s, %s, %s)",
+                    (concept_options[src], concept_options[dst], relation_type),
+                    fetch=False
+                )
+                graph.add_link(concept_options[src], concept_options[dst], relation_type)
+                st.success(f"Linked '{src}' → '{dst}' as '{relation_type}'")
+        st.write("### Suggested Links")
+        titles = {c['entity_id']: c['title'] for c in concepts}
+        src_id = concept_options[src]
+        linked = get_concept_graph().k_hop(src_id, 1, direction="both")
+        suggestions = get_similarity_index().similar(src_id, SUGGESTION_COUNT, exclude=linked)
+        if suggestions:
+            st.caption(f"Concepts that share words and tags with '{src}' but are not linked to it yet.")
+            for entity_id, score in suggestions:
+                col1, col2 = st.columns([5, 1])
+                with col1:
+                    st.write(f"**{titles.get(entity_id, entity_id)}** · similarity {score:.2f}")
+                with col2:
+                    if st.button("Link", key=f"suggest_{src_id}_{entity_id}"):
+                        suggested_type = relation_type or "related to"
+                        graph = get_concept_graph()
+                        run_query(
+                            "INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES (%s, %s, %s)",
+                            (src_id, entity_id, suggested_type)
+                        )
+                        graph.add_link(src_id, entity_id, suggested_type)
+                        st.rerun()
+        else:
+            st.caption(f"No unlinked concepts resemble '{src}'.")
+        st.write("### Existing Links")
+        links = cached_query(READ_QUERIES["links"])
+        st.dataframe(links)
+    else:
+        st.info("Add some concepts first before creating links.")
 
-#  View: Concept_Summary 
-elif proc_choice == "View: Concept_Summary":
-    if st.button("Show Concept Summary"):
-        try:
-            data = run_query("SELECT * FROM Concept_Summary", fetch=True)
-            st.dataframe(data)
-        except Exception as e:
-            st.error(f"Error: {e}")
+# GRAPH VIEW (server-side layout, only the visible part is sent to the browser)
+elif menu == "Graph View":
+    st.header("Knowledge Graph")
+    concepts = cached_query(READ_QUERIES["concepts"])
+    if concepts:
+        with st.spinner("Computing layout..."):
+            graph = get_concept_graph()
+            generations = tuple(sorted(get_query_cache().generations(LAYOUT_TABLES).items()))
+            layout = get_graph_layout(graph.serial, graph.version, len(concepts), generations)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            group_by = st.radio("Group by", ["Category", "Tag"], horizontal=True)
+        with col2:
+            zoom = st.select_slider("Zoom", [1, 2, 4, 8, 16, 32, 64], value=1)
+        with col3:
+            center_x = st.slider("Pan horizontally", 0.0, 1.0, 0.5)
+        with col4:
+            center_y = st.slider("Pan vertically", 0.0, 1.0, 0.5)
+        pos, src, dst, groups = layout["pos"], layout["src"], layout["dst"], layout[group_by]
+        visible = viewport_mask(pos, (center_x, center_y), zoom)
+        if zoom < CLUSTER_ZOOM and visible.sum() > GRAPH_MAX_NODES:
+            names, centroids, sizes, (a, b, counts) = collapse_clusters(pos, groups, visible, src, dst)
+            nodes = pd.DataFrame({"x": centroids[:, 0], "y": centroids[:, 1], "label": names,
+                                  "size": sizes, "group": names})
+            edges = pd.DataFrame({"x": centroids[a, 0], "y": centroids[a, 1],
+                                  "x2": centroids[b, 0], "y2": centroids[b, 1], "links": counts})
+            st.caption(f"{visible.sum()} concepts in view, shown as {len(names)} {group_by.lower()} clusters. "
+                       f"Zoom in to see individual concepts.")
+        else:
+            shown = np.zeros(len(pos), dtype=bool)
+            shown[top_nodes(visible, layout["degree"], GRAPH_MAX_NODES)] = True
+            edge_idx = np.flatnonzero(shown[src] & shown[dst])[:GRAPH_MAX_EDGES]
+            idx = np.flatnonzero(shown)
+            nodes = pd.DataFrame({"x": pos[idx, 0], "y": pos[idx, 1], "label": layout["titles"][idx],
+                                  "size": layout["degree"][idx] + 1, "group": groups[idx]})
+            edges = pd.DataFrame({"x": pos[src[edge_idx], 0], "y": pos[src[edge_idx], 1],
+                                  "x2": pos[dst[edge_idx], 0], "y2": pos[dst[edge_idx], 1],
+                                  "links": np.ones(len(edge_idx), dtype=int)})
+            st.caption(f"Showing {len(idx)} of {visible.sum()} concepts in view.")
+        half = 0.5 / zoom
+        x_scale = alt.Scale(domain=[center_x - half, center_x + half])
+        y_scale = alt.Scale(domain=[center_y - half, center_y + half])
+        lines = alt.Chart(edges).mark_rule(opacity=0.25).encode(
+            x=alt.X("x:Q", scale=x_scale, axis=None), y=alt.Y("y:Q", scale=y_scale, axis=None),
+            x2="x2:Q", y2="y2:Q", strokeWidth=alt.StrokeWidth("links:Q", legend=None)
+        )
+        points = alt.Chart(nodes).mark_circle(opacity=0.8).encode(
+            x=alt.X("x:Q", scale=x_scale, axis=None), y=alt.Y("y:Q", scale=y_scale, axis=None),
+            size=alt.Size("size:Q", legend=None), color=alt.Color("group:N", legend=None),
+            tooltip=["label:N", "group:N", "size:Q"]
+        )
+        st.altair_chart(alt.layer(lines, points).properties(height=650), use_container_width=True)
+    else:
+        st.info("Add some concepts first.")
 
-# LINKING CONCEPTS SECTION
-st.subheader("Link Concepts")
-concepts = run_query("SELECT entity_id, title FROM Concepts", fetch=True)
-if concepts:
-    concept_options = {c['title']: c['entity_id'] for c in concepts}
-    col1, col2 = st.columns(2)
-    with col1:
-        src = st.selectbox("Source Concept", list(concept_options.keys()))
-    with col2:
-        dst = st.selectbox("Destination Concept", list(concept_options.keys()))
-    relation_type = st.text_input("Relation Type (e.g., builds on, related to)")
-    if st.button("Create Link"):
-        if src == dst:
-            st.warning("You can’t link a concept to itself.")
+# GRAPH EXPLORER (multi-hop queries over Links)
+elif menu == "Graph Explorer":
+    st.header("Graph Explorer")
+    concepts = cached_query(READ_QUERIES["concepts"])
+    if concepts:
+        graph = get_concept_graph()
+        titles = {c['entity_id']: c['title'] for c in concepts}
+        concept_options = {c['title']: c['entity_id'] for c in concepts}
+        relation_filter = st.multiselect("Relation types (all if none selected)", graph.relation_types())
+        mode = st.radio("Query", ["Neighbourhood", "Shortest Path", "Connected Components"], horizontal=True)
+        if mode == "Neighbourhood":
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                concept = st.selectbox("Concept", list(concept_options.keys()), key="graph_concept")
+            with col2:
+                hops = st.number_input("Hops", min_value=1, max_value=10, value=2)
+            with col3:
+                direction = st.selectbox("Direction", ["out", "in", "both"])
+            found = graph.k_hop(concept_options[concept], hops, relation_filter, direction)
+            if found:
+                st.dataframe([
+                    {"entity_id": e, "title": titles.get(e), "hops": d}
+                    for e, d in sorted(found.items(), key=lambda item: item[1])
+                ], hide_index=True)
+            else:
+                st.info("No linked concepts within reach.")
+        elif mode == "Shortest Path":
+            col1, col2 = st.columns(2)
+            with col1:
+                src = st.selectbox("From", list(concept_options.keys()), key="path_src")
+            with col2:
+                dst = st.selectbox("To", list(concept_options.keys()), key="path_dst")
+            directed = st.checkbox("Follow link direction", value=True)
+            path = graph.shortest_path(concept_options[src], concept_options[dst], relation_filter, directed)
+            if path:
+                st.write(" → ".join(titles.get(e, str(e)) for e in path))
+                st.caption(f"{len(path) - 1} hop(s)")
+            else:
+                st.info(f"No path from '{src}' to '{dst}'.")
         else:
+            components = graph.components(relation_filter)
+            st.write(f"{len(components)} connected components")
+            st.dataframe([
+                {
+                    "component": i + 1,
+                    "size": len(c),
+                    "concepts": ", ".join(titles.get(e, str(e)) for e in c[:10]) + (" …" if len(c) > 10 else ""),
+                }
+                for i, c in enumerate(components[:100])
+            ], hide_index=True)
+    else:
+        st.info("Add some concepts first.")
+
+# COLLABORATORS SECTION
+elif menu == "Collaborators":
+    st.header("Manage Collaborators")
+    users = cached_query(READ_QUERIES["users"])
+    concepts = cached_query(READ_QUERIES["concepts"])
+    if users and concepts:
+        user_options = {u['name']: u['user_id'] for u in users}
+        concept_options = {c['title']: c['entity_id'] for c in concepts}
+        col1, col2 = st.columns(2)
+        with col1:
+            user = st.selectbox("Select User", list(user_options.keys()))
+        with col2:
+            concept = st.selectbox("Assign to Concept", list(concept_options.keys()))
+        role = st.selectbox("Role", ["Contributor", "Editor", "Viewer"])
+        if st.button("Add Collaborator"):
             run_query(
-                "INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES (%s, %s, %s)",
-                (concept_options[src], concept_options[dst], relation_type),
+                "INSERT INTO Collaborators (user_id, concept_id, role) VALUES (%s, %s, %s)",
+                (user_options[user], concept_options[concept], role),
                 fetch=False
             )
-            st.success(f"Linked '{src}' → '{dst}' as '{relation_type}'")
-    st.write("### Existing Links")
-    links = run_query("""
-        SELECT l.link_id, c1.title AS source, c2.title AS destination, l.relation_type
-        FROM Links l
-        JOIN Concepts c1 ON l.src_concept_id = c1.entity_id
-        JOIN Concepts c2 ON l.dst_concept_id = c2.entity_id
-    """, fetch=True)
-    st.dataframe(links)
-else:
-    st.info("Add some concepts first before creating links.")
-
-# COLLABORATORS SECTION
-st.subheader("Manage Collaborators")
-users = run_query("SELECT user_id, name FROM Users", fetch=True)
-concepts = run_query("SELECT entity_id, title FROM Concepts", fetch=True)
-if users and concepts:
-    user_options = {u['name']: u['user_id'] for u in users}
-    concept_options = {c['title']: c['entity_id'] for c in concepts}
-    col1, col2 = st.columns(2)
-    with col1:
-        user = st.selectbox("Select User", list(user_options.keys()))
-    with col2:
-        concept = st.selectbox("Assign to Concept", list(concept_options.keys()))
-    role = st.selectbox("Role", ["Contributor", "Editor", "Viewer"])
-    if st.button("Add Collaborator"):
-        run_query(
-            "INSERT INTO Collaborators (user_id, concept_id, role) VALUES (%s, %s, %s)",
-            (user_options[user], concept_options[concept], role),
-            fetch=False
-        )
-        st.success(f"Added {user} as {role} to {concept}")
-    st.write("### Current Collaborations")
-    collabs = run_query("""
-        SELECT u.name AS user, c.title AS concept, co.role
-        FROM Collaborators co
-        JOIN Users u ON co.user_id = u.user_id
-        JOIN Concepts c ON co.concept_id = c.entity_id
-    """, fetch=True)
-    st.dataframe(collabs)
-else:
-    st.info("Add users and concepts first.")
+            st.success(f"Added {user} as {role} to {concept}")
+        st.write("### Current Collaborations")
+        collabs = cached_query(READ_QUERIES["collaborations"])
+        st.dataframe(collabs)
+    else:
+        st.info("Add users and concepts first.")
 
 # TAGGING SYSTEM
-st.subheader("🏷 Add Tags to Concepts")
-tags = run_query("SELECT tag_id, tag FROM Tags", fetch=True)
-concepts = run_query("SELECT entity_id, title FROM Concepts", fetch=True)
-if tags and concepts:
-    tag_options = {t['tag']: t['tag_id'] for t in tags}
-    concept_options = {c['title']: c['entity_id'] for c in concepts}
-    col1, col2 = st.columns(2)
-    with col1:
-        tag = st.selectbox("Select Tag", list(tag_options.keys()))
-    with col2:
-        concept = st.selectbox("Select Concept", list(concept_options.keys()))
-    if st.button("Assign Tag"):
-        run_query(
-            "INSERT INTO Concept_Tags (entity_id, tag_id) VALUES (%s, %s)",
-            (concept_options[concept], tag_options[tag]),
-            fetch=False
-        )
-        st.success(f"Added tag '{tag}' to concept '{concept}'")
-    st.write("### Tagged Concepts")
-    tagged = run_query("""
-        SELECT c.title AS concept, t.tag
-        FROM Concept_Tags ct
-        JOIN Concepts c ON ct.entity_id = c.entity_id
-        JOIN Tags t ON ct.tag_id = t.tag_id
-    """, fetch=True)
-    st.dataframe(tagged)
-else:
-    st.info("Add tags and concepts first.")
+elif menu == "Tags":
+    st.header("🏷 Add Tags to Concepts")
+    tags = cached_query(READ_QUERIES["tags"])
+    concepts = cached_query(READ_QUERIES["concepts"])
+    if tags and concepts:
+        tag_options = {t['tag']: t['tag_id'] for t in tags}
+        concept_options = {c['title']: c['entity_id'] for c in concepts}
+        col1, col2 = st.columns(2)
+        with col1:
+            tag = st.selectbox("Select Tag", list(tag_options.keys()))
+        with col2:
+            chosen = st.multiselect("Select Concepts", list(concept_options.keys()))
+        entity_ids = [concept_options[c] for c in chosen]
+        col1, col2, col3 = st.columns([1, 1, 4])
+        with col1:
+            if st.button("Assign Tag", disabled=not chosen):
+                index = get_similarity_index()
+                tagged_ids = {r['entity_id'] for r in run_query(
+                    "SELECT entity_id FROM Concept_Tags WHERE tag_id = %s", (tag_options[tag],), fetch=True)}
+                # the unique (entity_id, tag_id) index makes repeats no-ops
+                added = run_many(
+                    "INSERT IGNORE INTO Concept_Tags (entity_id, tag_id) VALUES (%s, %s)",
+                    [(entity_id, tag_options[tag]) for entity_id in entity_ids]
+                )
+                for entity_id in set(entity_ids) - tagged_ids:
+                    index.add_text(entity_id, tag, TAG_WEIGHT)
+                st.success(f"Added tag '{tag}' to {added} concepts ({len(chosen) - added} already had it).")
+        with col2:
+            if st.button("Remove Tag", disabled=not chosen):
+                index = get_similarity_index()
+                tagged_ids = {r['entity_id'] for r in run_query(
+                    "SELECT entity_id FROM Concept_Tags WHERE tag_id = %s", (tag_options[tag],), fetch=True)}
+                removed = run_bulk(
+                    "DELETE FROM Concept_Tags WHERE tag_id = %s AND entity_id IN ({ids})",
+                    entity_ids, (tag_options[tag],)
+                )
+                for entity_id in set(entity_ids) & tagged_ids:
+                    index.remove_text(entity_id, tag, TAG_WEIGHT)
+                st.success(f"Removed tag '{tag}' from {removed} concepts.")
+        st.write("### Tagged Concepts")
+        tagged = cached_query(READ_QUERIES["tagged_concepts"])
+        st.dataframe(tagged)
+    else:
+        st.info("Add tags and concepts first.")
 
 # ATTACHMENTS SECTION
-st.subheader("Attachments")
-concepts = run_query("SELECT entity_id, title FROM Concepts", fetch=True)
-
-if concepts:
-    concept_options = {c['title']: c['entity_id'] for c in concepts}
-    concept_name = st.selectbox("Select Concept", list(concept_options.keys()), key="attachment_concept")
-    uploaded_file = st.file_uploader("Upload a file (PDF, Image, etc.)", key="attachment_upload")
-    if uploaded_file and st.button("Upload Attachment", key="upload_btn"):
-        file_path = f"static/{uploaded_file.name}"
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        run_query(
-            "INSERT INTO Attachments (entity_id, file_path, file_type) VALUES (%s, %s, %s)",
-            (concept_options[concept_name], file_path, uploaded_file.type)
-        )
-        st.success(f"File '{uploaded_file.name}' uploaded for concept '{concept_name}'")
-    st.write("### Existing Attachments")
-    files = run_query("""
-        SELECT a.attachment_id, c.title AS concept, a.file_path, a.file_type
-        FROM Attachments a
-        JOIN Concepts c ON a.entity_id = c.entity_id
-    """, fetch=True)
-    deleted_any = False
-    for f in files:
-        if not os.path.exists(f['file_path']):
-            st.warning(f"Removed missing file record: {f['file_path']}")
-            run_query("DELETE FROM Attachments WHERE attachment_id = %s", (f['attachment_id'],))
-            deleted_any = True
-    if deleted_any:
-        st.rerun()  # only rerun if something was actually deleted
-    if files:
-        for f in files:
-            file_path = f['file_path']
-            concept = f['concept']
-            file_type = f['file_type']
-            attachment_id = f['attachment_id']
-
-            col1, col2 = st.columns([3, 1])  # side-by-side layout
-            with col1:
-                try:
-                    with open(file_path, "rb") as file:
-                        st.download_button(
-                            label=f"Download {os.path.basename(file_path)} for {concept}",
-                            data=file,
-                            file_name=os.path.basename(file_path),
-                            mime=file_type,
-                            key=f"download_{attachment_id}"
-                        )
-                except FileNotFoundError:
-                    st.error(f"File not found: {file_path}")
+elif menu == "Attachments":
+    st.header("Attachments")
+    concepts = cached_query(READ_QUERIES["concepts"])
 
-            with col2:
-                # Delete button
-                if st.button(" Delete", key=f"delete_{attachment_id}"):
+    if concepts:
+        concept_options = {c['title']: c['entity_id'] for c in concepts}
+        concept_name = st.selectbox("Select Concept", list(concept_options.keys()), key="attachment_concept")
+        uploaded_file = st.file_uploader("Upload a file (PDF, Image, etc.)", key="attachment_upload")
+        if uploaded_file and st.button("Upload Attachment", key="upload_btn"):
+            uploaded_file.seek(0)
+            digest, staged_path, file_size = blobstore.stage(uploaded_file)
+            try:
+                with get_store().transaction() as run:
+                    run(
+                        "INSERT INTO Attachments (entity_id, file_path, file_name, file_type, file_size) VALUES (%s, %s, %s, %s, %s)",
+                        (concept_options[concept_name], blobstore.blob_path(digest), uploaded_file.name,
+                         uploaded_file.type, file_size)
+                    )
+                    # placed while the new row is uncommitted: a Delete of the same content
+                    # waits for it in its unreferenced check instead of removing the file under it
+                    file_path = blobstore.place(digest, staged_path)
+            finally:
+                blobstore.discard(staged_path)
+            assets.thumbnail(file_path, uploaded_file.type)  # made now, so listing never opens the original
+            st.success(f"File '{uploaded_file.name}' uploaded for concept '{concept_name}'")
+        st.write("### Existing Attachments")
+        if st.button("Check for missing files now"):
+            removed = sweep_missing_attachments()
+            for path in removed:
+                st.warning(f"Removed missing file record: {path}")
+            if not removed:
+                st.info("All attachment files are present.")
+        files = cached_query(READ_QUERIES["attachments"])
+        public = sum(1 for f in files or () if _static_url(f['file_path']))
+        if public:
+            st.warning(f"{public} attachment(s) are stored under {STATIC_DIR}/ and can be downloaded by anyone "
+                       "through their URL. Run `python blobstore.py relocate` to move them into the private blob store.")
+        if files:
+            for f in files:
+                file_path = f['file_path']
+                file_name = f['file_name'] or os.path.basename(file_path)
+                file_type = f['file_type']
+                attachment_id = f['attachment_id']
+
+                col0, col1, col2, col3, col4 = st.columns([1, 4, 1, 1, 1])
+                with col0:
+                    thumb = cached_thumbnail(file_path, file_type)
+                    if thumb:
+                        st.image(thumb, width=THUMB_WIDTH)
+                with col1:
+                    st.write(f"**{file_name}** · {f['concept']} · {blobstore.format_size(f['file_size'])}")
+                with col2:
+                    # the file is only read once its download is requested, and only on that
+                    # run: the next rerun shows the Download button again instead of resending it
+                    if st.session_state.get("download_ready") == attachment_id:
+                        del st.session_state.download_ready
+                        try:
+                            st.download_button(
+                                label="Save",
+                                data=blobstore.read_blob(file_path),
+                                file_name=file_name,
+                                mime=file_type,
+                                key=f"download_{attachment_id}"
+                            )
+                        except FileNotFoundError:
+                            st.error("File not found")
+                    elif st.button("Download", key=f"prepare_{attachment_id}"):
+                        st.session_state.download_ready = attachment_id
+                        st.rerun()
+                with col3:
+                    if st.button("Preview", key=f"preview_{attachment_id}"):
+                        st.session_state.preview_id = None if st.session_state.get("preview_id") == attachment_id else attachment_id
+                        st.rerun()
+                with col4:
+                    # Delete button
+                    if st.button(" Delete", key=f"delete_{attachment_id}"):
+                        try:
+                            with get_store().transaction() as run:
+                                run("DELETE FROM Attachments WHERE attachment_id = %s", (attachment_id,))
+                                # identical uploads share one blob, so only remove it once unreferenced;
+                                # FOR UPDATE locks the file_path range until the file is gone, so an
+                                # upload of the same content cannot insert its row in between
+                                refs = run("SELECT COUNT(*) AS n FROM Attachments WHERE file_path = %s FOR UPDATE",
+                                           (file_path,), fetch=True)
+                                if refs[0]['n'] == 0 and os.path.exists(file_path):
+                                    assets.remove_thumbnails(file_path)
+                                    cached_thumbnail.clear()
+                                    os.remove(file_path)  # remove the actual file
+                            st.success(f"Deleted '{file_name}'")
+                            st.rerun()  # refresh after delete
+                        except Exception as e:
+                            st.error(f"Error deleting file: {e}")
+                if st.session_state.get("preview_id") == attachment_id:
                     try:
-                        if os.path.exists(file_path):
-                            os.remove(file_path)  # remove the actual file
-                        run_query("DELETE FROM Attachments WHERE attachment_id = %s", (attachment_id,))
-                        st.success(f"Deleted '{os.path.basename(file_path)}'")
-                        st.rerun()  # refresh after delete
-                    except Exception as e:
-                        st.error(f"Error deleting file: {e}")
+                        if not os.path.exists(file_path):
+                            raise FileNotFoundError(file_path)
+                        # images and PDFs are previewed from a scaled-down copy, not the original
+                        preview = assets.thumbnail(file_path, file_type, PREVIEW_SIZE)
+                        if preview:
+                            st.image(preview, width=PREVIEW_WIDTH)
+                        elif (file_type or "").startswith("text/") or file_type in ("application/json", "application/xml"):
+                            st.code(blobstore.preview(file_path).decode("utf-8", errors="replace"))
+                        else:
+                            st.info("No preview available for this file type.")
+                    except FileNotFoundError:
+                        st.error(f"File not found: {file_path}")
+        else:
+            st.info("No attachments found.")
     else:
-        st.info("No attachments found.")
-else:
-    st.info("Add some concepts first.")
+        st.info("Add some concepts first.")
 
 # ANALYTICS & REPORTS
-st.subheader("Analytics Dashboard")
-col1, col2 = st.columns(2)
-with col1:
-    st.write("### Number of Notes per Concept")
-    data = run_query("""
-        SELECT c.title, COUNT(n.note_id) AS note_count
-        FROM Concepts c
-        LEFT JOIN Notes n ON c.entity_id = n.entity_id
-        GROUP BY c.title;
-    """, fetch=True)
-    st.dataframe(data)
-with col2:
-    st.write("### Pending Tasks by Concept")
-    tasks = run_query("""
-        SELECT c.title, COUNT(t.task_id) AS pending_tasks
-        FROM Concepts c
-        LEFT JOIN Tasks t ON c.entity_id = t.entity_id
-        WHERE t.status = 'Pending'
-        GROUP BY c.title;
-    """, fetch=True)
-    st.dataframe(tasks)
+elif menu == "Analytics":
+    st.header("Analytics Dashboard")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("### Number of Notes per Concept")
+        data = cached_query(READ_QUERIES["notes_per_concept"])
+        st.dataframe(data)
+    with col2:
+        st.write("### Pending Tasks by Concept")
+        tasks = cached_query(READ_QUERIES["pending_tasks"])
+        st.dataframe(tasks)
 
-st.markdown("---")
-st.header("Queries Showcase")
+# QUERIES SHOWCASE
+elif menu == "Queries Showcase":
+    st.header("Queries Showcase")
 
-# Aggregate Query
-st.subheader("Aggregate Query: Average Tasks per Concept")
-avg_data = run_query("""
-    SELECT c.title, AVG(t.task_id IS NOT NULL) AS avg_tasks
-    FROM Concepts c
-    LEFT JOIN Tasks t ON c.entity_id = t.entity_id
-    GROUP BY c.title;
-""", fetch=True)
-st.dataframe(avg_data)
-
-# Nested Query
-st.subheader("Nested Query: Concepts with More Than 1 Note")
-nested = run_query("""
-    SELECT title FROM Concepts
-    WHERE entity_id IN (
-        SELECT entity_id FROM Notes GROUP BY entity_id HAVING COUNT(note_id) > 1
-    );
-""", fetch=True)
-st.dataframe(nested)
-
-# Join Query
-st.subheader("Join Query: Tasks with Concept and User Info")
-joined = run_query("""
-    SELECT t.description, t.status, c.title AS concept, u.name AS owner
-    FROM Tasks t
-    JOIN Concepts c ON t.entity_id = c.entity_id
-    JOIN Users u ON c.user_id = u.user_id;
-""", fetch=True)
-st.dataframe(joined)
+    # Aggregate Query
+    st.subheader("Aggregate Query: Average Tasks per Concept")
+    avg_data = cached_query(READ_QUERIES["avg_tasks"])
+    st.dataframe(avg_data)
+
+    # Nested Query
+    st.subheader("Nested Query: Concepts with More Than 1 Note")
+    nested = cached_query(READ_QUERIES["concepts_with_notes"])
+    st.dataframe(nested)
+
+    # Join Query
+    st.subheader("Join Query: Tasks with Concept and User Info")
+    joined = cached_query(READ_QUERIES["tasks_with_owners"])
+    st.dataframe(joined)
+
+# ACTIVITY LOG (Trigger_Log viewer)
+elif menu == "Activity Log":
+    st.header("Activity Log")
+    st.caption(
+        f"Rows written by the database triggers, newest first. Months older than "
+        f"{LOG_RETENTION_MONTHS} are dropped automatically."
+        + (" Buffered audit mode is on, so the latest rows can take a few seconds to appear." if db.AUDIT_BUFFERED else "")
+    )
+    if "cursors_Trigger_Log" not in st.session_state:
+        _reset_pages("Trigger_Log")
+    cursors = st.session_state["cursors_Trigger_Log"]
+    col1, col2 = st.columns(2)
+    with col1:
+        log_table = st.selectbox(
+            "Table", ["All", "Tasks", "Notes", "Categories"], key="log_table_filter",
+            on_change=_reset_pages, args=("Trigger_Log",)
+        )
+    with col2:
+        page_size = st.selectbox(
+            "Rows per page", PAGE_SIZES, key="page_size_Trigger_Log",
+            on_change=_reset_pages, args=("Trigger_Log",)
+        )
+    rows, has_next = fetch_log_page(cursors[-1], page_size, None if log_table == "All" else log_table)
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info("No trigger activity logged yet.")
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        st.button("Previous", key="prev_Trigger_Log", disabled=len(cursors) == 1,
+                  on_click=_prev_page, args=("Trigger_Log",))
+    with col2:
+        st.button("Next", key="next_Trigger_Log", disabled=not has_next, on_click=_next_page,
+                  args=("Trigger_Log", (rows[-1]['created_at'], rows[-1]['log_id']) if rows else 0))
+    with col3:
+        st.caption(f"Page {len(cursors)}")
+
+# QUERY PROFILE (developer panel, and the end of this run's profile)
+if rerun_profile is not None:
+    if PROFILE_PANEL and st.session_state.show_profile_panel:
+        show_profile_panel(rerun_profile)
+    finish_rerun_profile(rerun_profile)
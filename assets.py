@@ -0,0 +1,177 @@
+"""
+Derived image files: resized WebP/JPEG variants of the app's static images
+and thumbnails of attachments. Everything is generated once and cached on
+disk, named after the source content, so a file is never regenerated while
+its source is unchanged.
+
+    python assets.py                # pre-generates the wallpaper variants and every attachment thumbnail
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from PIL import Image, ImageOps
+
+import blobstore
+
+try:
+    import fitz  # PyMuPDF, optional: renders PDF thumbnails without poppler
+except ImportError:
+    fitz = None
+
+log = logging.getLogger(__name__)
+
+ASSET_DIR = os.environ.get("VAULT_ASSET_DIR", os.path.join("static", "assets"))
+THUMB_DIR = os.environ.get("VAULT_THUMB_DIR", os.path.join(blobstore.BLOB_ROOT, "thumbs"))
+WALLPAPER_WIDTHS = (1280, 1920, 2560)
+THUMB_SIZE = 160
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(blobstore.CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _save(image, path, fmt):
+    """
+    Writes through a temporary file so a half-written file is never served.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".asset-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if fmt == "webp":
+                image.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+            else:
+                image.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def image_variants(image_path, widths=WALLPAPER_WIDTHS, formats=("webp", "jpg")):
+    """
+    Returns {(width, format): path} of resized copies of a static image in
+    ASSET_DIR, creating the missing ones. Widths above the image's own are
+    replaced by one full-size copy; images are never scaled up.
+    """
+    digest = file_digest(image_path)[:12]
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    with Image.open(image_path) as source:  # reads the header only
+        rotated = source.getexif().get(0x0112, 1) in (5, 6, 7, 8)  # EXIF orientation: stored sideways
+        full_width = source.height if rotated else source.width
+    widths = sorted({min(width, full_width) for width in widths})
+    variants, source = {}, None
+    for width in widths:
+        for fmt in formats:
+            path = os.path.join(ASSET_DIR, f"{stem}-{width}w.{digest}.{fmt}")
+            if not os.path.exists(path):
+                if source is None:
+                    source = ImageOps.exif_transpose(Image.open(image_path))
+                image = source
+                if image.width > width:
+                    image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+                _save(image, path, fmt)
+            variants[(width, fmt)] = path
+    return variants
+
+
+def _pdf_first_page(path, size):
+    if fitz is not None:
+        with fitz.open(path) as doc:
+            page = doc[0]
+            zoom = size / max(page.rect.width, page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    if shutil.which("pdftoppm"):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "page")
+            subprocess.run(["pdftoppm", "-f", "1", "-l", "1", "-singlefile", "-scale-to", str(size), "-png",
+                            path, out], check=True, capture_output=True, timeout=30)
+            with Image.open(out + ".png") as image:
+                image.load()
+                return image
+    return None
+
+
+def thumbnail_path(file_path, size=THUMB_SIZE):
+    """
+    Where the thumbnail of an attachment goes. Blobs are named by their
+    digest already; other paths are keyed on path and modification time.
+    """
+    name = os.path.basename(file_path)
+    if len(name) != 64 or not all(c in "0123456789abcdef" for c in name):
+        stat = os.stat(file_path)
+        name = hashlib.sha256(f"{os.path.abspath(file_path)}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return os.path.join(THUMB_DIR, name[:2], f"{name}-{size}.webp")
+
+
+def thumbnail(file_path, file_type, size=THUMB_SIZE):
+    """
+    Returns the path of a cached WebP thumbnail for an image or PDF
+    attachment, creating it from the original on first use, or None for
+    other types and files that cannot be rendered.
+    """
+    file_type = file_type or ""
+    if not (file_type.startswith("image/") or file_type == "application/pdf"):
+        return None
+    try:
+        path = thumbnail_path(file_path, size)
+        if os.path.exists(path):
+            return path
+        if file_type == "application/pdf":
+            image = _pdf_first_page(file_path, size)
+            if image is None:
+                return None
+        else:
+            image = Image.open(file_path)
+            image.draft("RGB", (size, size))  # JPEGs decode straight at a reduced scale
+            image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        _save(image, path, "webp")
+        return path
+    except (OSError, ValueError, Image.DecompressionBombError, subprocess.SubprocessError) as e:
+        log.warning("No thumbnail for %s: %s", file_path, e)
+        return None
+
+
+def remove_thumbnails(file_path):
+    """
+    Deletes every cached thumbnail size of an attachment; call it before
+    the file itself is removed.
+    """
+    path = thumbnail_path(file_path)
+    directory, prefix = os.path.dirname(path), os.path.basename(path).rsplit("-", 1)[0] + "-"
+    if os.path.isdir(directory):
+        for entry in os.listdir(directory):
+            if entry.startswith(prefix):
+                os.remove(os.path.join(directory, entry))
+
+
+if __name__ == "__main__":
+    from db import get_db_connection
+
+    for image_path in sys.argv[1:] or [os.path.join("static", "books.jpg")]:
+        for (width, fmt), path in sorted(image_variants(image_path).items()):
+            print(f"{path} ({os.path.getsize(path)} bytes)")
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT file_path, file_type FROM Attachments")
+    made = sum(1 for row in cursor.fetchall() if os.path.exists(row['file_path'])
+               and thumbnail(row['file_path'], row['file_type']))
+    cursor.close()
+    conn.close()
+    print(f"{made} attachment thumbnails ready in {THUMB_DIR}")
@@ -0,0 +1,226 @@
+"""
+Repeatable latency benchmark for the queries the app issues.
+
+    python generate_vault.py --concepts 100k
+    python benchmark.py --out bench/100k.json
+    python benchmark.py --out bench/next.json --compare bench/100k.json
+
+Times every query app.py runs plus the GetConceptDetails, GetLinkedConcepts
+and DaysRemaining routines and the Concept_Summary view. Each benchmark is
+run --repeat times after --warmup untimed runs, with ids drawn from a seeded
+random stream. p50/p95 latency and rows per second go to a JSON file.
+--compare flags benchmarks whose p95 got more than --threshold slower.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import db
+import sqlite_backend
+from db import get_db_connection
+
+# (name, kind, statement, parameter factory); kind is "query" or "proc", or
+# "mysql"/"sqlite" for a query that only runs on that backend
+BENCHMARKS = [
+    ("Concept lookup list", "query", "SELECT entity_id, title FROM Concepts", None),
+    ("Category list", "query", "SELECT category_id, name FROM Categories", None),
+    ("User list", "query", "SELECT user_id, name FROM Users", None),
+    ("Tag list", "query", "SELECT tag_id, tag FROM Tags", None),
+    ("View Concepts page", "query",
+     "SELECT * FROM Concepts WHERE entity_id > %s ORDER BY entity_id LIMIT 26", lambda v, r: (r.randint(0, v["Concepts"]),)),
+    ("View Notes page", "query",
+     "SELECT * FROM Notes WHERE note_id > %s ORDER BY note_id LIMIT 26", lambda v, r: (r.randint(0, v["Notes"]),)),
+    ("View Tasks page", "query",
+     "SELECT * FROM Tasks WHERE task_id > %s ORDER BY task_id LIMIT 26", lambda v, r: (r.randint(0, v["Tasks"]),)),
+    ("Existing links", "query", """
+        SELECT l.link_id, c1.title AS source, c2.title AS destination, l.relation_type
+        FROM Links l
+        JOIN Concepts c1 ON l.src_concept_id = c1.entity_id
+        JOIN Concepts c2 ON l.dst_concept_id = c2.entity_id
+    """, None),
+    ("Current collaborations", "query", """
+        SELECT u.name AS user, c.title AS concept, co.role
+        FROM Collaborators co
+        JOIN Users u ON co.user_id = u.user_id
+        JOIN Concepts c ON co.concept_id = c.entity_id
+    """, None),
+    ("Tagged concepts", "query", """
+        SELECT c.title AS concept, t.tag
+        FROM Concept_Tags ct
+        JOIN Concepts c ON ct.entity_id = c.entity_id
+        JOIN Tags t ON ct.tag_id = t.tag_id
+    """, None),
+    ("Existing attachments", "query", """
+        SELECT a.attachment_id, c.title AS concept, a.file_path, a.file_name, a.file_type, a.file_size
+        FROM Attachments a
+        JOIN Concepts c ON a.entity_id = c.entity_id
+    """, None),
+    ("Notes per concept", "query", """
+        SELECT c.title, SUM(s.note_count) AS note_count
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        GROUP BY c.title
+    """, None),
+    ("Pending tasks by concept", "query", """
+        SELECT c.title, SUM(s.pending_count) AS pending_tasks
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        WHERE s.pending_count > 0
+        GROUP BY c.title
+    """, None),
+    ("Average tasks per concept", "query", """
+        SELECT c.title, AVG(s.task_count) AS avg_tasks
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        GROUP BY c.title
+    """, None),
+    ("Concepts with more than 1 note", "query", """
+        SELECT title FROM Concepts
+        WHERE entity_id IN (
+            SELECT entity_id FROM Concept_Stats WHERE note_count > 1
+        )
+    """, None),
+    ("Tasks with concept and user", "query", """
+        SELECT t.description, t.status, c.title AS concept, u.name AS owner
+        FROM Tasks t
+        JOIN Concepts c ON t.entity_id = c.entity_id
+        JOIN Users u ON c.user_id = u.user_id
+    """, None),
+    ("Search", "mysql", """
+        SELECT 'Note' AS kind, n.note_id AS id, n.entity_id, n.body AS text,
+               MATCH(n.body) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM Notes n
+        WHERE MATCH(n.body) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY score DESC
+        LIMIT 50
+    """, lambda v, r: ("+privacy +lea*",) * 2),
+    ("Search (FTS5)", "sqlite", sqlite_backend.SEARCH_QUERY, lambda v, r: ('"privacy" "lea"*', 50)),
+    ("Concept_Summary view", "query", "SELECT * FROM Concept_Summary", None),
+    ("DaysRemaining", "query", "SELECT DaysRemaining(%s) AS days_left", lambda v, r: (r.randint(1, v["Tasks"]),)),
+    ("GetConceptDetails", "proc", "GetConceptDetails", lambda v, r: (r.randint(1, v["Concepts"]),)),
+    ("GetLinkedConcepts", "proc", "GetLinkedConcepts", lambda v, r: (r.randint(1, v["Concepts"]),)),
+]
+
+
+def table_sizes(cursor):
+    sizes = {}
+    for table in ["Concepts", "Notes", "Tasks", "Links", "Tags", "Concept_Tags", "Collaborators", "Attachments"]:
+        cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        sizes[table] = cursor.fetchone()["n"]
+    return sizes
+
+
+def run_once(cursor, kind, statement, params):
+    """
+    Runs one benchmark iteration and returns (seconds, rows fetched).
+    """
+    start = time.perf_counter()
+    if kind == "proc":
+        cursor.callproc(statement, params)
+        rows = sum(len(result.fetchall()) for result in cursor.stored_results())
+    else:
+        cursor.execute(statement, params)
+        rows = len(cursor.fetchall())
+    return time.perf_counter() - start, rows
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_benchmarks(conn, repeat, warmup, seed, only=None):
+    cursor = conn.cursor(dictionary=True)
+    sizes = table_sizes(cursor)
+    rng = random.Random(seed)
+    results = []
+    for name, kind, statement, make_params in BENCHMARKS:
+        if only and only.lower() not in name.lower():
+            continue
+        if kind in ("mysql", "sqlite"):
+            if kind != db.BACKEND:
+                continue
+            kind = "query"
+        timings, rows = [], 0
+        for i in range(warmup + repeat):
+            params = make_params(sizes, rng) if make_params else ()
+            seconds, fetched = run_once(cursor, kind, statement, params)
+            if i >= warmup:
+                timings.append(seconds)
+                rows += fetched
+        total = sum(timings)
+        results.append({
+            "name": name,
+            "runs": repeat,
+            "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+            "mean_ms": round(statistics.mean(timings) * 1000, 3),
+            "rows_per_run": rows / repeat,
+            "rows_per_sec": round(rows / total, 1) if total else None,
+        })
+        print(f"{name:<34} p50 {results[-1]['p50_ms']:>10.2f} ms   p95 {results[-1]['p95_ms']:>10.2f} ms   "
+              f"{results[-1]['rows_per_run']:>10.0f} rows", file=sys.stderr)
+    cursor.execute("SELECT VERSION() AS version")
+    version = cursor.fetchone()["version"]
+    cursor.close()
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": db.BACKEND,
+        "database": db.database_name(),
+        "server_version": version,
+        "table_rows": sizes,
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Returns the benchmarks whose p95 grew by more than `threshold` (0.2 = 20%).
+    """
+    before = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        old = before.get(r["name"])
+        if old and old["p95_ms"] > 0 and r["p95_ms"] > old["p95_ms"] * (1 + threshold):
+            regressions.append((r["name"], old["p95_ms"], r["p95_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's queries against the configured database.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 slowdown (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        report = run_benchmarks(conn, args.repeat, args.warmup, args.seed, args.only)
+    finally:
+        conn.close()
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for name, old, new in regressions:
+            print(f"REGRESSION  {name}: p95 {old:.2f} ms -> {new:.2f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Content-addressed attachment storage. Each file is stored once, under its
+SHA-256 digest, in sharded directories (blobs/ab/cd/abcd...). The store
+stays outside static/, which Streamlit serves to anyone by URL.
+
+    python blobstore.py relocate    # moves attachments still under static/ into the store
+"""
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+
+BLOB_ROOT = os.environ.get("VAULT_BLOB_DIR", "blobs")
+PUBLIC_DIR = "static"
+CHUNK_SIZE = 1 << 20
+
+
+def blob_path(digest, root=BLOB_ROOT):
+    return os.path.join(root, digest[:2], digest[2:4], digest)
+
+
+def stage(fileobj, root=BLOB_ROOT):
+    """
+    Streams a file object in chunks into a temporary file in the store
+    while hashing it and returns (digest, temporary path, size). place()
+    then moves it to its digest path.
+    """
+    os.makedirs(root, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        discard(tmp_path)
+        raise
+    return sha.hexdigest(), tmp_path, size
+
+
+def place(digest, tmp_path, root=BLOB_ROOT):
+    """
+    Moves a staged file to its digest path and returns that path. Content
+    that is already stored is not written twice. Attachments call it while
+    their row is inserted but not committed, so it cannot interleave with
+    a delete removing the same blob.
+    """
+    path = blob_path(digest, root)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return path
+
+
+def discard(tmp_path):
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def store(fileobj, root=BLOB_ROOT):
+    """
+    stage() and place() in one step; returns (digest, path, size).
+    """
+    digest, tmp_path, size = stage(fileobj, root)
+    try:
+        return digest, place(digest, tmp_path, root), size
+    finally:
+        discard(tmp_path)
+
+
+def read_blob(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def preview(path, limit=4096):
+    """
+    Returns the first `limit` bytes through a read-only memory map, so only
+    the pages that are sliced get read from disk.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return m[:limit]
+
+
+def format_size(size):
+    if size is None:
+        return "unknown size"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def relocate(conn, root=BLOB_ROOT):
+    """
+    Moves attachments stored under static/ (uploads from before the blob
+    store, and blobs from when it lived there) into the store at `root`,
+    repoints their rows and drops the thumbnails that were kept there.
+    Returns the number of files moved.
+    """
+    from db import bump_versions
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT DISTINCT file_path FROM Attachments WHERE file_path LIKE %s", (PUBLIC_DIR + "/%",))
+    moved = 0
+    for row in cursor.fetchall():
+        old_path = row['file_path']
+        if not os.path.exists(old_path):
+            continue  # the attachment sweep removes the record
+        with open(old_path, "rb") as f:
+            digest, tmp_path, _ = stage(f, root)
+        try:
+            new_path = blob_path(digest, root)
+            cursor.execute("UPDATE Attachments SET file_path = %s WHERE file_path = %s", (new_path, old_path))
+            place(digest, tmp_path, root)  # under the row locks, like an upload
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            discard(tmp_path)
+        os.remove(old_path)  # only once no row points at it
+        moved += 1
+    if moved:
+        bump_versions(cursor, {"Attachments"})  # running app servers reload the list
+        conn.commit()
+    cursor.close()
+    shutil.rmtree(os.path.join(PUBLIC_DIR, "blobs", "thumbs"), ignore_errors=True)
+    return moved
+
+
+if __name__ == "__main__":
+    import sys
+    from db import get_db_connection
+
+    if sys.argv[1:] != ["relocate"]:
+        sys.exit(__doc__)
+    conn = get_db_connection()
+    try:
+        print(f"moved {relocate(conn)} attachments from {PUBLIC_DIR}/ to {BLOB_ROOT}")
+    finally:
+        conn.close()
@@ -0,0 +1,180 @@
+"""
+EXPLAIN-based regression check for the app's queries.
+
+    python check_indexes.py                    # check the current database
+    python check_indexes.py --populate 1000000 # first add ~1M synthetic rows per table
+
+Each query below is one the app or a stored procedure runs. The check fails
+when a table that should be reached through an index is scanned in full
+(EXPLAIN type ALL or no key). Run --populate only against a scratch
+database: it inserts synthetic concepts, notes, tasks, tags and links.
+The check reads MySQL's EXPLAIN output, so it needs VAULT_BACKEND=mysql.
+"""
+import argparse
+import sys
+
+import db
+from db import get_db_connection
+
+# (name, query, aliases that must be read through an index)
+CHECKS = [
+    ("Notes per concept (Analytics)", """
+        SELECT c.title, SUM(s.note_count) AS note_count
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        GROUP BY c.title
+    """, ["s"]),
+    ("Pending tasks by concept (Analytics)", """
+        SELECT c.title, SUM(s.pending_count) AS pending_tasks
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        WHERE s.pending_count > 0
+        GROUP BY c.title
+    """, ["s"]),
+    ("Average tasks per concept (Showcase)", """
+        SELECT c.title, AVG(s.task_count) AS avg_tasks
+        FROM Concepts c
+        JOIN Concept_Stats s ON c.entity_id = s.entity_id
+        GROUP BY c.title
+    """, ["s"]),
+    ("Tasks with concept and user (Showcase)", """
+        SELECT t.description, t.status, c.title AS concept, u.name AS owner
+        FROM Tasks t
+        JOIN Concepts c ON t.entity_id = c.entity_id
+        JOIN Users u ON c.user_id = u.user_id
+    """, ["c", "u"]),
+    ("Existing links", """
+        SELECT l.link_id, c1.title AS source, c2.title AS destination, l.relation_type
+        FROM Links l
+        JOIN Concepts c1 ON l.src_concept_id = c1.entity_id
+        JOIN Concepts c2 ON l.dst_concept_id = c2.entity_id
+    """, ["c1", "c2"]),
+    ("Tagged concepts", """
+        SELECT c.title AS concept, t.tag
+        FROM Concept_Tags ct
+        JOIN Concepts c ON ct.entity_id = c.entity_id
+        JOIN Tags t ON ct.tag_id = t.tag_id
+    """, ["c", "t"]),
+    ("Tag already assigned?", """
+        SELECT id FROM Concept_Tags WHERE entity_id = 1 AND tag_id = 1
+    """, ["Concept_Tags"]),
+    ("GetConceptDetails: notes", """
+        SELECT note_id, body, created_on FROM Notes WHERE entity_id = 1 ORDER BY created_on DESC
+    """, ["Notes"]),
+    ("GetConceptDetails: tasks", """
+        SELECT task_id, description, due_on, status, remind_on FROM Tasks WHERE entity_id = 1 ORDER BY due_on DESC
+    """, ["Tasks"]),
+    ("GetConceptDetails: tags", """
+        SELECT t.tag_id, t.tag, t.role
+        FROM Concept_Tags ct
+        JOIN Tags t ON ct.tag_id = t.tag_id
+        WHERE ct.entity_id = 1
+    """, ["ct", "t"]),
+    ("GetLinkedConcepts (outgoing)", """
+        SELECT l.link_id, c2.entity_id, c2.title, l.relation_type
+        FROM Links l
+        JOIN Concepts c2 ON l.dst_concept_id = c2.entity_id
+        WHERE l.src_concept_id = 1
+    """, ["l", "c2"]),
+    ("Incoming links (reverse traversal)", """
+        SELECT l.link_id, c1.entity_id, c1.title, l.relation_type
+        FROM Links l
+        JOIN Concepts c1 ON l.src_concept_id = c1.entity_id
+        WHERE l.dst_concept_id = 1
+    """, ["l", "c1"]),
+    ("Tasks due this week", """
+        SELECT task_id, description, due_on FROM Tasks
+        WHERE due_on BETWEEN CURDATE() AND CURDATE() + INTERVAL 7 DAY
+    """, ["Tasks"]),
+    ("Concept_Summary counts", """
+        SELECT c.entity_id, s.note_count, s.task_count
+        FROM Concepts c
+        LEFT JOIN Concept_Stats s ON c.entity_id = s.entity_id
+    """, ["s"]),
+    ("Keyset page of notes", """
+        SELECT * FROM Notes WHERE note_id > 500000 ORDER BY note_id LIMIT 26
+    """, ["Notes"]),
+]
+
+
+def populate(cursor, n):
+    """
+    Adds about n concepts, notes, tasks, links and tag assignments with
+    server-side INSERT ... SELECT over a recursive sequence.
+    """
+    cursor.execute("SET SESSION cte_max_recursion_depth = %s", (n + 1,))
+    seq = "WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+    cursor.execute("SELECT COALESCE(MAX(entity_id), 0) FROM Concepts")
+    base = cursor.fetchone()[0]
+    cursor.execute("SELECT MIN(user_id) FROM Users")
+    user_id = cursor.fetchone()[0]
+    cursor.execute(
+        "INSERT INTO Concepts (type, title, created_on, user_id) " + seq +
+        "SELECT 'Idea', CONCAT('Concept ', n), CURDATE() - INTERVAL MOD(n, 365) DAY, %s FROM seq",
+        (n, user_id)
+    )
+    cursor.execute(
+        "INSERT INTO Notes (entity_id, body, created_on) " + seq +
+        "SELECT %s + 1 + FLOOR(RAND(n) * %s), CONCAT('Synthetic note ', n), CURDATE() - INTERVAL MOD(n, 365) DAY FROM seq",
+        (n, base, n)
+    )
+    cursor.execute(
+        "INSERT INTO Tasks (entity_id, description, due_on, status) " + seq +
+        "SELECT %s + 1 + FLOOR(RAND(n) * %s), CONCAT('Synthetic task ', n), "
+        "CURDATE() + INTERVAL MOD(n, 120) - 60 DAY, ELT(1 + MOD(n, 3), 'Pending', 'In Progress', 'Completed') FROM seq",
+        (n, base, n)
+    )
+    cursor.execute(
+        "INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) " + seq +
+        "SELECT %s + 1 + FLOOR(RAND(n) * %s), %s + 1 + FLOOR(RAND(n + 7) * %s), 'related to' FROM seq",
+        (n, base, n, base, n)
+    )
+    cursor.execute(
+        "INSERT IGNORE INTO Concept_Tags (entity_id, tag_id) " + seq +
+        "SELECT %s + n, t.tag_id FROM seq JOIN (SELECT MIN(tag_id) AS tag_id FROM Tags) t",
+        (n, base)
+    )
+    for table in ["Concepts", "Notes", "Tasks", "Links", "Concept_Tags", "Concept_Stats"]:
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+
+
+def explain(cursor, query):
+    cursor.execute("EXPLAIN " + query)
+    return cursor.fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the app's queries are served by indexes.")
+    parser.add_argument("--populate", type=int, metavar="N", help="insert about N synthetic rows per table first")
+    args = parser.parse_args(argv)
+    if db.BACKEND != "mysql":
+        sys.exit("check_indexes.py reads MySQL EXPLAIN output; run it with VAULT_BACKEND=mysql")
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    if args.populate:
+        populate(conn.cursor(), args.populate)
+        conn.commit()
+    failures = 0
+    for name, query, aliases in CHECKS:
+        plan = explain(cursor, query)
+        problems = [
+            f"{row['table']} scanned without an index ({row['type']}, {row['rows']} rows)"
+            for row in plan
+            if row['table'] in aliases and (row['type'] == "ALL" or row['key'] is None)
+        ]
+        used = ", ".join(f"{row['table']}:{row['key']}" for row in plan if row['key'])
+        if problems:
+            failures += 1
+            print(f"FAIL  {name}\n      " + "\n      ".join(problems))
+        else:
+            print(f"ok    {name}  [{used}]")
+    cursor.close()
+    conn.close()
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} queries use their indexes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+Database settings and pooled query helpers shared by the Streamlit app,
+the JSON API (api.py) and the command-line tools.
+
+VAULT_BACKEND picks the storage engine: "mysql" (default, for shared
+installs) or "sqlite" (one embedded file at VAULT_SQLITE_PATH, no server).
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import sqlite_backend
+
+log = logging.getLogger(__name__)
+
+BACKEND = os.environ.get("VAULT_BACKEND", "mysql").lower()
+SQLITE_PATH = os.environ.get("VAULT_SQLITE_PATH", "vault.db")
+# "buffered": triggers queue audit rows in Trigger_Log_Buffer and
+# FlushTriggerLog() writes them to Trigger_Log in batches (MySQL only; SQLite
+# has one writer at a time, so there is nothing to batch)
+AUDIT_BUFFERED = (BACKEND == "mysql"
+                  and os.environ.get("VAULT_AUDIT_MODE", "direct").lower() == "buffered")
+
+DB_CONFIG = {
+    "host": os.environ.get("VAULT_DB_HOST", "localhost"),
+    "user": os.environ.get("VAULT_DB_USER", "root"),
+    "password": os.environ.get("VAULT_DB_PASSWORD", ""),
+    "database": os.environ.get("VAULT_DB_NAME", "KnowledgeVault1"),
+}
+
+# errors callers handle the same way on either backend; mysql_connector()
+# adds the MySQL ones when it loads the driver
+PoolError = (sqlite_backend.PoolError,)
+IntegrityError = (sqlite3.IntegrityError,)
+
+def mysql_connector():
+    """
+    Imports mysql-connector on first use, so the SQLite backend and the
+    tests run without it installed.
+    """
+    global PoolError, IntegrityError
+    import mysql.connector
+    import mysql.connector.pooling
+
+    errors = mysql.connector.errors
+    if errors.PoolError not in PoolError:
+        PoolError += (errors.PoolError,)
+        IntegrityError += (errors.IntegrityError,)
+    return mysql.connector
+
+def get_db_connection():
+    if BACKEND == "sqlite":
+        conn = sqlite_backend.connect(SQLITE_PATH)
+    else:
+        conn = mysql_connector().connect(**DB_CONFIG)
+    start_session(conn)
+    return conn
+
+def start_session(conn):
+    """
+    Applies the per-session settings; pooled connections lose them when
+    they are returned, so this runs on every borrow.
+    """
+    if not AUDIT_BUFFERED:
+        return
+    cursor = conn.cursor()
+    cursor.execute("SET @vault_audit_buffered = 1")
+    cursor.close()
+
+def flush_audit_log(conn):
+    """
+    Writes buffered audit rows to Trigger_Log (a no-op in direct mode).
+    """
+    if not AUDIT_BUFFERED:
+        return
+    cursor = conn.cursor()
+    cursor.callproc("FlushTriggerLog", ())
+    for result in cursor.stored_results():
+        result.fetchall()
+    cursor.close()
+    conn.commit()
+
+MYSQL_MAX_POOL_SIZE = 32  # mysql-connector's CNX_POOL_MAXSIZE; larger pools fail to start
+
+def pool_size(variable, default):
+    """
+    Reads a pool size from the environment. Values above what
+    mysql-connector accepts are capped with a warning.
+    """
+    value = os.environ.get(variable, str(default))
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError(f"{variable} must be a whole number, got {value!r}") from None
+    if size < 1:
+        raise ValueError(f"{variable} must be at least 1, got {size}")
+    if BACKEND != "sqlite" and size > MYSQL_MAX_POOL_SIZE:
+        log.warning("%s=%s is above the MySQL connector's limit; using %s", variable, size, MYSQL_MAX_POOL_SIZE)
+        return MYSQL_MAX_POOL_SIZE
+    return size
+
+def create_pool(size):
+    """
+    Returns a pool for the configured backend; both raise PoolError when
+    every connection is in use.
+    """
+    if BACKEND == "sqlite":
+        return sqlite_backend.ConnectionPool(SQLITE_PATH, size)
+    return mysql_connector().pooling.MySQLConnectionPool(
+        pool_name="vault_pool",
+        pool_size=size,
+        pool_reset_session=True,
+        **DB_CONFIG
+    )
+
+def database_name():
+    return SQLITE_PATH if BACKEND == "sqlite" else DB_CONFIG["database"]
+
+# Which tables a statement touches, for cache invalidation
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+`?(\w+)`?", re.IGNORECASE)
+WRITE_PATTERN = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+VIEW_TABLES = {
+    "Concept_Summary": {"Concepts", "Categories", "Users", "Concept_Stats"},
+    "Concept_Stats_Recount": {"Concepts", "Notes", "Tasks"},
+    "Search_Index": {"Concepts", "Notes", "Tasks", "Tags"},
+}
+
+PROCEDURE_WRITES = {
+    "MarkTaskCompleted": {"Tasks"},
+    "MarkTasksCompleted": {"Tasks"},
+    "MarkStatusCompleted": {"Tasks"},
+    "RebuildConceptStats": {"Concept_Stats"},
+    "RotateTriggerLog": {"Trigger_Log"},
+    "FlushTriggerLog": {"Trigger_Log"},
+}
+
+def tables_in(query):
+    """
+    Returns the tables a statement reads or writes, with views expanded to
+    their base tables.
+    """
+    tables = set()
+    for name in TABLE_PATTERN.findall(query):
+        tables |= VIEW_TABLES.get(name, {name})
+    return tables
+
+# Change counters shared between processes (Table_Versions): every write
+# bumps the counters of the tables it changes once it has committed
+VERSIONED_TABLES = frozenset({"Users", "Categories", "Concepts", "Notes", "Tasks", "Tags",
+                              "Concept_Tags", "Attachments", "Collaborators", "Links"})
+WRITTEN_TABLE = re.compile(r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?",
+                           re.IGNORECASE)
+
+def written_tables(query):
+    """
+    The table a write statement changes; falls back to every table it
+    names when the statement has an unusual shape.
+    """
+    match = WRITTEN_TABLE.match(query)
+    return {match.group(1)} if match else tables_in(query)
+
+def bump_versions(cursor, tables):
+    """
+    Counts one change to each of `tables` in Table_Versions and returns
+    {table: new version}. Callers run it after their write has committed,
+    in a short transaction of its own, so the counter rows are locked for
+    one UPDATE rather than for the whole write.
+    """
+    tables = sorted(set(tables) & VERSIONED_TABLES)
+    if not tables:
+        return {}
+    placeholders = ", ".join(["%s"] * len(tables))
+    cursor.execute(f"UPDATE Table_Versions SET version = version + 1 WHERE table_name IN ({placeholders})", tables)
+    cursor.execute(f"SELECT table_name, version FROM Table_Versions WHERE table_name IN ({placeholders})", tables)
+    return dict(tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall())
+
+@contextmanager
+def pooled_connection(pool, timeout):
+    """
+    Borrows a connection from the pool, waiting up to `timeout` seconds
+    for a free one and reconnecting it if the server dropped it while idle.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    try:
+        conn.ping(reconnect=True, attempts=3, delay=1)
+        start_session(conn)
+        yield conn
+    finally:
+        conn.close()  # returns the connection to the pool
+
+BULK_CHUNK = 1000
+
+class Store:
+    """
+    Query helpers over a connection pool, one short transaction per call.
+    `on_query(query, params, started, rows, rowcount)` is called after every
+    statement (the app's profiler) and `on_write(tables)` after every
+    committed write (the app's result cache). Writes bump Table_Versions,
+    and changed_elsewhere() reports the bumps other processes made.
+    """
+    def __init__(self, pool, timeout=10.0, on_query=None, on_write=None):
+        self.pool = pool
+        self.timeout = timeout
+        self.on_query = on_query
+        self.on_write = on_write
+        self._versions_lock = threading.Lock()
+        self._synced = {}               # table -> Table_Versions value at the last check
+        self._own = defaultdict(set)    # table -> versions this store's writes produced since
+
+    def connection(self):
+        return pooled_connection(self.pool, self.timeout)
+
+    def _recorded(self, query, params, started, rows=None, rowcount=0):
+        if self.on_query is not None:
+            self.on_query(query, params, started, rows, rowcount)
+
+    def _publish(self, conn, cursor, tables):
+        """
+        Bumps the counters of a committed write and commits them. A failure
+        is logged rather than raised, since the write itself has succeeded;
+        other processes then see it at their next cache expiry.
+        """
+        started = time.perf_counter()
+        try:
+            versions = bump_versions(cursor, tables)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            log.exception("Could not bump Table_Versions for %s", ", ".join(sorted(tables)))
+            return {}
+        if versions:
+            self._recorded("UPDATE Table_Versions SET version = version + 1", tuple(versions), started,
+                           rowcount=len(versions))
+        return versions
+
+    def _written(self, tables, versions=None):
+        if versions:
+            with self._versions_lock:
+                for table, version in versions.items():
+                    self._own[table].add(version)
+        if self.on_write is not None and tables:
+            self.on_write(tables)
+
+    def changed_elsewhere(self):
+        """
+        Returns the tables other processes (the API, imports, another app
+        server) wrote since the last call: those whose Table_Versions
+        counter moved by more than this store's own writes account for.
+        The first call only records the current counters.
+        """
+        rows = self.query("SELECT table_name, version FROM Table_Versions", fetch=True)
+        changed = set()
+        with self._versions_lock:
+            for row in rows:
+                table, version = row['table_name'], row['version']
+                last = self._synced.get(table)
+                own = self._own.pop(table, set())
+                if last is not None and version - last > sum(1 for v in own if last < v <= version):
+                    changed.add(table)
+                self._own[table] = {v for v in own if v > version}  # committed after this read
+                self._synced[table] = version
+        return changed
+
+    def query(self, query, params=None, fetch=False):
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                started = time.perf_counter()
+                cursor.execute(query, params or ())
+                data = None
+                if fetch:
+                    data = cursor.fetchall()
+                self._recorded(query, params, started, data, cursor.rowcount)
+                write = WRITE_PATTERN.match(query)
+                conn.commit()
+                versions = self._publish(conn, cursor, written_tables(query)) if write else None
+            finally:
+                cursor.close()
+        if write:
+            self._written(tables_in(query), versions)
+        return data
+
+    def insert(self, query, params):
+        """
+        Runs one INSERT and returns the AUTO_INCREMENT id of the new row.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                started = time.perf_counter()
+                cursor.execute(query, params)
+                self._recorded(query, params, started, rowcount=cursor.rowcount)
+                new_id = cursor.lastrowid
+                conn.commit()
+                versions = self._publish(conn, cursor, written_tables(query))
+            finally:
+                cursor.close()
+        self._written(tables_in(query), versions)
+        return new_id
+
+    def insert_rows(self, query, rows):
+        """
+        Inserts several rows in one transaction and returns their ids in
+        order; all or none are written.
+        """
+        ids = []
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for params in rows:
+                    started = time.perf_counter()
+                    cursor.execute(query, params)
+                    self._recorded(query, params, started, rowcount=cursor.rowcount)
+                    ids.append(cursor.lastrowid)
+                conn.commit()
+                versions = self._publish(conn, cursor, written_tables(query))
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._written(tables_in(query), versions)
+        return ids
+
+    def bulk(self, query, ids, params=()):
+        """
+        Runs a set-based statement over a list of ids in one transaction. The
+        `{ids}` in `query` becomes an IN list of up to BULK_CHUNK placeholders,
+        after `params`; 5,000 ids take five statements instead of 5,000.
+        Returns the number of rows changed.
+        """
+        ids = list(ids)
+        changed = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for i in range(0, len(ids), BULK_CHUNK):
+                    chunk = ids[i:i + BULK_CHUNK]
+                    statement = query.format(ids=", ".join(["%s"] * len(chunk)))
+                    started = time.perf_counter()
+                    cursor.execute(statement, tuple(params) + tuple(chunk))
+                    self._recorded(statement, tuple(params) + tuple(chunk), started, rowcount=cursor.rowcount)
+                    changed += cursor.rowcount
+                conn.commit()
+                versions = self._publish(conn, cursor, written_tables(query))
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._written(tables_in(query), versions)
+        return changed
+
+    def many(self, query, rows):
+        """
+        Runs one executemany for all rows in a single transaction and returns
+        the number of rows changed.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                started = time.perf_counter()
+                cursor.executemany(query, rows)
+                changed = cursor.rowcount
+                self._recorded(query, (), started, rowcount=changed)
+                conn.commit()
+                versions = self._publish(conn, cursor, written_tables(query))
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._written(tables_in(query), versions)
+        return changed
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs several statements in one transaction, for work that has to
+        hold its row locks while it does something else (like removing a
+        blob file only while no row refers to it). Yields
+        run(query, params=None, fetch=False); the block's writes are
+        committed when it exits and rolled back if it raises.
+        """
+        writes = []
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            def run(query, params=None, fetch=False):
+                started = time.perf_counter()
+                cursor.execute(query, params or ())
+                data = cursor.fetchall() if fetch else None
+                self._recorded(query, params, started, data, cursor.rowcount)
+                if WRITE_PATTERN.match(query):
+                    writes.append(query)
+                return data
+
+            try:
+                yield run
+                conn.commit()
+                versions = self._publish(conn, cursor, set().union(*map(written_tables, writes)))
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        if writes:
+            self._written(set().union(*map(tables_in, writes)), versions)
+
+    def call(self, name, args, commit=False):
+        """
+        Calls a stored procedure and returns its result sets.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                started = time.perf_counter()
+                cursor.callproc(name, args)
+                results = [result.fetchall() for result in cursor.stored_results()]
+                self._recorded(f"CALL {name}({', '.join(['%s'] * len(args))})", args, started,
+                               [row for result in results for row in result])
+                if commit:
+                    conn.commit()
+                    versions = self._publish(conn, cursor, PROCEDURE_WRITES.get(name, set()))
+            finally:
+                cursor.close()
+        if commit:
+            self._written(PROCEDURE_WRITES.get(name, set()), versions)
+        return results
@@ -0,0 +1,173 @@
+"""
+Seeded synthetic vault generator for benchmarks.
+
+    python generate_vault.py --concepts 100000              # load into the database
+    python generate_vault.py --concepts 10k --out vault.jsonl  # or write a JSONL dump
+
+The same seed and size always give the same vault. Rows follow the schema
+in KnowledgeVault.sql. Link in-degrees follow a power law, so a few hub
+concepts collect most links, as in real note graphs. Load into an empty
+database: rows are inserted with their ids through vault_io.
+"""
+import argparse
+import io
+import json
+import random
+import sys
+from datetime import date, timedelta
+
+import blobstore
+from db import flush_audit_log, get_db_connection
+from vault_io import import_rows
+
+WORDS = (
+    "federated learning privacy attack model data graph network neural inference "
+    "membership anonymization medical security encryption query index database "
+    "transaction storage cache latency vector embedding retrieval search ranking "
+    "paper project idea experiment survey benchmark dataset protocol theory proof"
+).split()
+TYPES = ["Idea", "Paper", "Project", "Note", "Reference"]
+STATUSES = ["Pending", "In Progress", "Completed"]
+RELATIONS = ["related to", "builds on", "cites", "contradicts", "part of"]
+ROLES = ["Owner", "Contributor", "Editor", "Viewer"]
+START = date(2024, 1, 1)
+SAMPLE_ATTACHMENT = b"Synthetic attachment generated by generate_vault.py\n"
+
+# rows per concept (or absolute counts for the small lookup tables)
+RATIOS = {"notes": 3, "tasks": 1, "tags_per_concept": 2, "links": 3, "collaborators": 0.5, "attachments": 0.2}
+USERS = 100
+CATEGORIES = 20
+TAGS = 200
+
+
+def parse_size(text):
+    text = text.lower().replace("_", "")
+    for suffix, factor in (("k", 1000), ("m", 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def phrase(rng, low=2, high=5):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def day(rng, span=730):
+    return START + timedelta(days=rng.randrange(span))
+
+
+def hub(rng, n, skew=0.9):
+    """
+    Draws a concept id by Zipf rank: rank r is picked with probability
+    ~ r^-skew (inverse-CDF sampling), which gives a power-law degree
+    distribution with exponent about 1 + 1/skew. A fixed bijection spreads
+    the ranks over the id range, so the hubs are not all at the lowest ids.
+    """
+    span = n ** (1.0 - skew) - 1.0
+    rank = min(int((1.0 + rng.random() * span) ** (1.0 / (1.0 - skew))), n)
+    return (rank * 7919) % n + 1 if n % 7919 else rank
+
+
+def generate(n, seed=0, attachment_path=None):
+    """
+    Yields (table, row) records for a vault with n concepts, in foreign-key
+    order. Each table has its own random stream, so they stay reproducible.
+    """
+    def rng_for(table):
+        return random.Random(f"{seed}-{table}")
+
+    rng = rng_for("Users")
+    for i in range(1, USERS + 1):
+        yield "Users", {"user_id": i, "name": f"User {i}", "role": rng.choice(["Student", "Researcher", "Professor"])}
+    rng = rng_for("Categories")
+    for i in range(1, CATEGORIES + 1):
+        yield "Categories", {"category_id": i, "name": f"Category {i}", "description": phrase(rng)}
+
+    rng = rng_for("Concepts")
+    for i in range(1, n + 1):
+        yield "Concepts", {
+            "entity_id": i, "type": rng.choice(TYPES), "title": f"{phrase(rng)} {i}",
+            "created_on": day(rng), "category_id": rng.randint(1, CATEGORIES), "user_id": rng.randint(1, USERS),
+        }
+
+    rng = rng_for("Notes")
+    for i in range(1, int(n * RATIOS["notes"]) + 1):
+        yield "Notes", {
+            "note_id": i, "entity_id": hub(rng, n, 0.7),
+            "body": " ".join(phrase(rng, 5, 12) + "." for _ in range(rng.randint(1, 6))),
+            "created_on": day(rng),
+        }
+
+    rng = rng_for("Tasks")
+    for i in range(1, int(n * RATIOS["tasks"]) + 1):
+        due = day(rng, 900)
+        yield "Tasks", {
+            "task_id": i, "entity_id": rng.randint(1, n), "description": phrase(rng, 3, 8),
+            "due_on": due, "status": rng.choice(STATUSES), "remind_on": due - timedelta(days=rng.randint(0, 7)),
+        }
+
+    rng = rng_for("Tags")
+    for i in range(1, TAGS + 1):
+        yield "Tags", {"tag_id": i, "tag": f"{rng.choice(WORDS)}-{i}", "role": rng.choice(["Primary", "Topic"])}
+    row_id = 0
+    for entity_id in range(1, n + 1):
+        for tag_id in sorted({hub(rng, TAGS) for _ in range(rng.randint(0, 2 * RATIOS["tags_per_concept"]))}):
+            row_id += 1
+            yield "Concept_Tags", {"id": row_id, "entity_id": entity_id, "tag_id": tag_id}
+
+    rng = rng_for("Links")
+    for i in range(1, int(n * RATIOS["links"]) + 1):
+        src = rng.randint(1, n)
+        dst = hub(rng, n)
+        if dst == src:
+            dst = dst % n + 1
+        yield "Links", {"link_id": i, "src_concept_id": src, "dst_concept_id": dst, "relation_type": rng.choice(RELATIONS)}
+
+    rng = rng_for("Collaborators")
+    for i in range(1, int(n * RATIOS["collaborators"]) + 1):
+        yield "Collaborators", {
+            "collab_id": i, "user_id": rng.randint(1, USERS), "concept_id": rng.randint(1, n), "role": rng.choice(ROLES),
+        }
+
+    if attachment_path:
+        rng = rng_for("Attachments")
+        for i in range(1, int(n * RATIOS["attachments"]) + 1):
+            yield "Attachments", {
+                "attachment_id": i, "entity_id": rng.randint(1, n), "file_path": attachment_path,
+                "file_name": f"attachment-{i}.txt", "file_type": "text/plain", "file_size": len(SAMPLE_ATTACHMENT),
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic vault.")
+    parser.add_argument("--concepts", default="10k", help="number of concepts, e.g. 10k, 100k, 1m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write a JSONL dump (vault_io format) instead of loading the database")
+    args = parser.parse_args(argv)
+    n = parse_size(args.concepts)
+
+    # every synthetic attachment points at one real, deduplicated blob
+    _, attachment_path, _ = blobstore.store(io.BytesIO(SAMPLE_ATTACHMENT))
+    records = generate(n, args.seed, attachment_path)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for table, row in records:
+                f.write(json.dumps({"table": table, "row": row}, default=str) + "\n")
+        print(f"wrote {args.out}", file=sys.stderr)
+        return
+    conn = get_db_connection()
+    try:
+        conn.start_transaction()
+        count = import_rows(conn, records)
+        conn.commit()
+        flush_audit_log(conn)
+        print(f"generated {count} rows for {n} concepts", file=sys.stderr)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+In-memory adjacency index over the Links table for multi-hop graph queries.
+"""
+from array import array
+from collections import defaultdict, deque
+from itertools import count
+import threading
+
+
+class ConceptGraph:
+    """
+    Directed multigraph of concepts kept as CSR arrays (forward and reverse),
+    plus per-node lists for links added since the last rebuild.
+    Relation types are interned to small integers.
+    """
+    REBUILD_THRESHOLD = 10000
+    _serials = count(1)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._index = {}                # entity_id -> node index
+        self._ids = array("i")          # node index -> entity_id
+        self._relations = {}            # relation_type -> relation id
+        self._removed = set()           # node indexes of deleted concepts
+        self._src = array("i")          # edge list, the source of truth for rebuilds
+        self._dst = array("i")
+        self._rel = array("i")
+        self._pending_out = defaultdict(list)  # node -> [(node, relation id)] not yet in CSR
+        self._pending_in = defaultdict(list)
+        self.serial = next(self._serials)  # tells a rebuilt graph from the one it replaced
+        self.version = 0                # bumped on every change; cache key for layouts
+        self._build()
+
+    @classmethod
+    def from_rows(cls, concept_ids, links):
+        """
+        Builds the graph from concept ids and (src, dst, relation_type) tuples.
+        """
+        graph = cls()
+        with graph._lock:
+            for entity_id in concept_ids:
+                graph._node(entity_id)
+            for src, dst, relation_type in links:
+                graph._append_edge(graph._node(src), graph._node(dst), graph._relation(relation_type))
+            graph._build()
+        return graph
+
+    # Internal helpers
+    def _node(self, entity_id):
+        node = self._index.get(entity_id)
+        if node is None:
+            node = self._index[entity_id] = len(self._ids)
+            self._ids.append(entity_id)
+        return node
+
+    def _relation(self, relation_type):
+        relation_type = relation_type or ""
+        if relation_type not in self._relations:
+            self._relations[relation_type] = len(self._relations)
+        return self._relations[relation_type]
+
+    def _append_edge(self, u, v, r):
+        self._src.append(u)
+        self._dst.append(v)
+        self._rel.append(r)
+
+    def _build(self):
+        """
+        Rebuilds both CSR arrays from the edge list (counting sort), dropping
+        edges of deleted concepts.
+        """
+        if self._removed:
+            keep = [i for i in range(len(self._src))
+                    if self._src[i] not in self._removed and self._dst[i] not in self._removed]
+            self._src = array("i", (self._src[i] for i in keep))
+            self._dst = array("i", (self._dst[i] for i in keep))
+            self._rel = array("i", (self._rel[i] for i in keep))
+        n = len(self._ids)
+        self._out = self._csr(n, self._src, self._dst)
+        self._in = self._csr(n, self._dst, self._src)
+        self._pending_out.clear()
+        self._pending_in.clear()
+        self._pending = 0
+
+    def _csr(self, n, keys, values):
+        offsets = array("i", bytes(4 * (n + 1)))
+        for k in keys:
+            offsets[k + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        cursor = array("i", offsets[:n])
+        targets = array("i", bytes(4 * len(keys)))
+        rels = array("i", bytes(4 * len(keys)))
+        for i, k in enumerate(keys):
+            pos = cursor[k]
+            targets[pos] = values[i]
+            rels[pos] = self._rel[i]
+            cursor[k] = pos + 1
+        return offsets, targets, rels
+
+    def _scan(self, csr, pending, node, relations):
+        offsets, targets, rels = csr
+        if node + 1 < len(offsets):
+            for i in range(offsets[node], offsets[node + 1]):
+                if relations is None or rels[i] in relations:
+                    yield targets[i]
+        for v, r in pending.get(node, ()):
+            if relations is None or r in relations:
+                yield v
+
+    def _adjacent(self, node, direction, relations):
+        if direction in ("out", "both"):
+            yield from self._scan(self._out, self._pending_out, node, relations)
+        if direction in ("in", "both"):
+            yield from self._scan(self._in, self._pending_in, node, relations)
+
+    def _relation_ids(self, relation_types):
+        if not relation_types:
+            return None
+        return {self._relations[r] for r in relation_types if r in self._relations}
+
+    def _live(self, entity_id):
+        node = self._index.get(entity_id)
+        if node is None or node in self._removed:
+            return None
+        return node
+
+    # Incremental updates
+    def add_link(self, src, dst, relation_type):
+        with self._lock:
+            u, v, r = self._node(src), self._node(dst), self._relation(relation_type)
+            self._append_edge(u, v, r)
+            self._pending_out[u].append((v, r))
+            self._pending_in[v].append((u, r))
+            self._pending += 1
+            self.version += 1
+            if self._pending >= self.REBUILD_THRESHOLD:
+                self._build()
+
+    def remove_concept(self, entity_id):
+        """
+        Drops a concept and, like the ON DELETE CASCADE on Links, its links.
+        """
+        self.remove_concepts([entity_id])
+
+    def remove_concepts(self, entity_ids):
+        """
+        Drops several concepts under one lock and one version bump.
+        """
+        with self._lock:
+            nodes = [self._index[e] for e in entity_ids if e in self._index]
+            if nodes:
+                self._removed.update(nodes)
+                self._pending += len(nodes)
+                self.version += 1
+                if self._pending >= self.REBUILD_THRESHOLD:
+                    self._build()
+
+    # Queries
+    def relation_types(self):
+        with self._lock:
+            return sorted(self._relations)
+
+    def edge_list(self):
+        """
+        Returns the live links as parallel (src entity ids, dst entity ids) lists.
+        """
+        with self._lock:
+            src, dst = [], []
+            for u, v in zip(self._src, self._dst):
+                if u not in self._removed and v not in self._removed:
+                    src.append(self._ids[u])
+                    dst.append(self._ids[v])
+            return src, dst
+
+    def k_hop(self, entity_id, hops, relation_types=None, direction="out"):
+        """
+        Returns {entity_id: distance} for every concept within `hops` links
+        of the given one (breadth-first), excluding the concept itself.
+        """
+        with self._lock:
+            start = self._live(entity_id)
+            if start is None:
+                return {}
+            relations = self._relation_ids(relation_types)
+            dist = {start: 0}
+            queue = deque([start])
+            while queue:
+                u = queue.popleft()
+                if dist[u] == hops:
+                    continue
+                for v in self._adjacent(u, direction, relations):
+                    if v not in dist and v not in self._removed:
+                        dist[v] = dist[u] + 1
+                        queue.append(v)
+            del dist[start]
+            return {self._ids[v]: d for v, d in dist.items()}
+
+    def shortest_path(self, src, dst, relation_types=None, directed=True):
+        """
+        Returns the entity ids on a shortest path from src to dst using a
+        bidirectional breadth-first search, or None if they are not connected.
+        """
+        with self._lock:
+            s, t = self._live(src), self._live(dst)
+            if s is None or t is None:
+                return None
+            if s == t:
+                return [src]
+            relations = self._relation_ids(relation_types)
+            forward_dir, backward_dir = ("out", "in") if directed else ("both", "both")
+            parents = {s: None}
+            children = {t: None}
+            forward, backward = [s], [t]
+            while forward and backward:
+                # expand the smaller frontier by one level
+                if len(forward) <= len(backward):
+                    forward, meet = self._expand(forward, parents, children, forward_dir, relations)
+                else:
+                    backward, meet = self._expand(backward, children, parents, backward_dir, relations)
+                if meet is not None:
+                    return self._join_path(meet, parents, children)
+            return None
+
+    def _expand(self, frontier, seen, other, direction, relations):
+        next_frontier = []
+        for u in frontier:
+            for v in self._adjacent(u, direction, relations):
+                if v in seen or v in self._removed:
+                    continue
+                seen[v] = u
+                if v in other:
+                    return next_frontier, v
+                next_frontier.append(v)
+        return next_frontier, None
+
+    def _join_path(self, meet, parents, children):
+        path = []
+        node = meet
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        node = children[meet]
+        while node is not None:
+            path.append(node)
+            node = children[node]
+        return [self._ids[v] for v in path]
+
+    def components(self, relation_types=None):
+        """
+        Returns the weakly connected components as lists of entity ids,
+        largest first.
+        """
+        with self._lock:
+            relations = self._relation_ids(relation_types)
+            seen = set(self._removed)
+            result = []
+            for start in range(len(self._ids)):
+                if start in seen:
+                    continue
+                seen.add(start)
+                component = [start]
+                queue = deque([start])
+                while queue:
+                    u = queue.popleft()
+                    for v in self._adjacent(u, "both", relations):
+                        if v not in seen:
+                            seen.add(v)
+                            component.append(v)
+                            queue.append(v)
+                result.append([self._ids[v] for v in component])
+            result.sort(key=len, reverse=True)
+            return result
+
+    def component_of(self, entity_id, relation_types=None):
+        """
+        Returns the entity ids in the same weakly connected component.
+        """
+        if self._live(entity_id) is None:
+            return []
+        return [entity_id] + sorted(self.k_hop(entity_id, len(self._ids), relation_types, "both"))
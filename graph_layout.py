@@ -0,0 +1,113 @@
+"""
+Server-side layout and level-of-detail helpers for the concept graph view.
+"""
+import numpy as np
+
+
+def force_layout(n, src, dst, iterations=50, grid=32, initial=None, temperature=0.1, seed=0):
+    """
+    Fruchterman-Reingold style force-directed layout, vectorized with NumPy.
+    Repulsion uses a particle-mesh approximation: nodes are binned into a
+    grid x grid mesh, cell-to-cell forces act on a node through its cell's
+    centroid, and only a node's own cell is treated exactly. One iteration
+    costs O(n + grid^4 + edges). Returns an (n, 2) array in the unit square.
+    Pass a previous layout as `initial` with a low starting `temperature`
+    to refine it instead of starting over.
+    """
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2)) if initial is None else np.array(initial, dtype=float)
+    if n < 2:
+        return pos
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    k2 = 1.0 / n                      # squared ideal edge length
+    soften = (0.5 / grid) ** 2        # keeps a node's own cell from blowing up
+    cells = grid * grid
+    start_temperature = temperature
+    for step in range(iterations):
+        cell = np.clip((pos * grid).astype(np.int64), 0, grid - 1)
+        cell_id = cell[:, 0] * grid + cell[:, 1]
+        mass = np.bincount(cell_id, minlength=cells).astype(float)
+        occupied = mass > 0
+        centers = np.zeros((cells, 2))
+        centers[:, 0] = np.bincount(cell_id, pos[:, 0], cells)
+        centers[:, 1] = np.bincount(cell_id, pos[:, 1], cells)
+        centers[occupied] /= mass[occupied, None]
+        # far field: every occupied cell pushes on every other occupied cell
+        occ = np.flatnonzero(occupied)
+        delta = centers[occ, None, :] - centers[None, occ, :]
+        dist2 = (delta ** 2).sum(axis=2) + soften
+        np.fill_diagonal(dist2, np.inf)
+        field = np.zeros((cells, 2))
+        field[occ] = (delta * (mass[occ] * k2 / dist2)[:, :, None]).sum(axis=1)
+        # near field: the rest of the node's own cell, seen as its centroid
+        delta = pos - centers[cell_id]
+        own = (mass[cell_id] - 1) * k2 / ((delta ** 2).sum(axis=1) + soften)
+        disp = field[cell_id] + delta * own[:, None]
+        if len(src):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+            pull = delta * (dist / np.sqrt(k2))[:, None]
+            np.add.at(disp, src, -pull)
+            np.add.at(disp, dst, pull)
+        length = np.sqrt((disp ** 2).sum(axis=1)) + 1e-9
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        pos = _normalize(pos)
+        temperature = start_temperature * (1 - (step + 1) / iterations) + 0.005
+    return pos
+
+
+def _normalize(pos):
+    """
+    Rescales to the unit square, clipping the outermost 0.5% on each side so
+    a few far-flung nodes cannot squeeze everything else into the middle.
+    """
+    low = np.percentile(pos, 0.5, axis=0)
+    span = np.percentile(pos, 99.5, axis=0) - low
+    span[span == 0] = 1.0
+    return np.clip((pos - low) / span, 0.0, 1.0)
+
+
+def viewport_mask(pos, center, zoom):
+    """
+    Selects the nodes inside the square window of side 1/zoom around center.
+    """
+    half = 0.5 / zoom
+    return ((np.abs(pos[:, 0] - center[0]) <= half) &
+            (np.abs(pos[:, 1] - center[1]) <= half))
+
+
+def collapse_clusters(pos, groups, visible, src, dst):
+    """
+    Collapses the visible nodes into one point per group (category or tag).
+    Returns (group ids, centroids, sizes) for the clusters and
+    (group_a, group_b, link count) for the links between them.
+    """
+    idx = np.flatnonzero(visible)
+    group_ids, inverse, sizes = np.unique(groups[idx], return_inverse=True, return_counts=True)
+    centroids = np.stack([
+        np.bincount(inverse, pos[idx, 0]),
+        np.bincount(inverse, pos[idx, 1]),
+    ], axis=1) / sizes[:, None]
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    keep = visible[src] & visible[dst] & (groups[src] != groups[dst])
+    if not keep.any():
+        empty = np.zeros(0, dtype=np.int64)
+        return group_ids, centroids, sizes, (empty, empty, empty)
+    slot = np.searchsorted(group_ids, groups)
+    pairs = np.stack([slot[src[keep]], slot[dst[keep]]], axis=1)
+    pairs.sort(axis=1)
+    unique_pairs, counts = np.unique(pairs, axis=0, return_counts=True)
+    return group_ids, centroids, sizes, (unique_pairs[:, 0], unique_pairs[:, 1], counts)
+
+
+def top_nodes(visible, degree, limit):
+    """
+    Returns the indexes of the visible nodes, keeping at most `limit` of the
+    highest-degree ones.
+    """
+    idx = np.flatnonzero(visible)
+    if len(idx) > limit:
+        idx = idx[np.argsort(-degree[idx], kind="stable")[:limit]]
+    return idx
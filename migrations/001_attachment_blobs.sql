@@ -0,0 +1,10 @@
+-- Content-addressed attachments: uploads are stored under their SHA-256
+-- digest, so the original file name and size move into their own columns.
+-- Several rows may now share one file_path; the index keeps the
+-- "is this blob still referenced" check cheap.
+USE KnowledgeVault1;
+
+ALTER TABLE Attachments
+    ADD COLUMN file_name VARCHAR(255) AFTER file_path,
+    ADD COLUMN file_size BIGINT AFTER file_type,
+    ADD INDEX idx_attachments_file_path (file_path);
@@ -0,0 +1,28 @@
+-- Composite and covering indexes for the queries app.py and the stored
+-- procedures actually run. Verify with: python check_indexes.py
+USE KnowledgeVault1;
+
+-- Concept_Tags(entity_id, tag_id) becomes unique; drop existing duplicates first
+DELETE ct1 FROM Concept_Tags ct1
+JOIN Concept_Tags ct2
+  ON ct1.entity_id = ct2.entity_id AND ct1.tag_id = ct2.tag_id AND ct1.id > ct2.id;
+
+ALTER TABLE Concept_Tags
+    ADD UNIQUE INDEX uq_concept_tags_entity_tag (entity_id, tag_id);
+
+-- "Pending Tasks by Concept": filter on status, join on entity_id from the index alone
+ALTER TABLE Tasks
+    ADD INDEX idx_tasks_status_entity (status, entity_id),
+    ADD INDEX idx_tasks_due_on (due_on);
+
+-- reverse traversal (who links to this concept?)
+ALTER TABLE Links
+    ADD INDEX idx_links_dst_src (dst_concept_id, src_concept_id);
+
+-- GetConceptDetails: notes of one concept, newest first
+ALTER TABLE Notes
+    ADD INDEX idx_notes_entity_created (entity_id, created_on);
+
+-- analytics panels GROUP BY c.title
+ALTER TABLE Concepts
+    ADD INDEX idx_concepts_title (title);
@@ -0,0 +1,165 @@
+-- Concept_Stats: trigger-maintained per-concept note/task counters that the
+-- Analytics, Queries Showcase and Concept_Summary panels read instead of
+-- regrouping Notes and Tasks. Counts existing rows once at the end.
+USE KnowledgeVault1;
+
+-- Per-concept note and task counters, kept current by the Notes/Tasks triggers
+-- (same idea as Categories.concept_count) so dashboards never regroup the fact tables
+CREATE TABLE Concept_Stats (
+    entity_id INT PRIMARY KEY,
+    note_count INT NOT NULL DEFAULT 0,
+    task_count INT NOT NULL DEFAULT 0,
+    pending_count INT NOT NULL DEFAULT 0,
+    in_progress_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0,
+    INDEX idx_concept_stats_note_count (note_count),
+    FOREIGN KEY (entity_id) REFERENCES Concepts(entity_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Concept_Stats maintenance. Deleting a concept removes its row through the
+-- foreign key; the cascaded Notes/Tasks deletes do not need to touch it.
+DROP TRIGGER IF EXISTS trg_concept_stats_insert;
+CREATE TRIGGER trg_concept_stats_insert
+AFTER INSERT ON Concepts
+FOR EACH ROW
+    INSERT IGNORE INTO Concept_Stats (entity_id) VALUES (NEW.entity_id);
+
+DROP TRIGGER IF EXISTS trg_note_stats_insert;
+CREATE TRIGGER trg_note_stats_insert
+AFTER INSERT ON Notes
+FOR EACH ROW
+    UPDATE Concept_Stats SET note_count = note_count + 1 WHERE entity_id = NEW.entity_id;
+
+DROP TRIGGER IF EXISTS trg_note_stats_delete;
+CREATE TRIGGER trg_note_stats_delete
+AFTER DELETE ON Notes
+FOR EACH ROW
+    UPDATE Concept_Stats SET note_count = note_count - 1 WHERE entity_id = OLD.entity_id;
+
+DROP TRIGGER IF EXISTS trg_note_stats_update;
+DELIMITER $$
+CREATE TRIGGER trg_note_stats_update
+AFTER UPDATE ON Notes
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.entity_id <=> OLD.entity_id) THEN
+        UPDATE Concept_Stats SET note_count = note_count - 1 WHERE entity_id = OLD.entity_id;
+        UPDATE Concept_Stats SET note_count = note_count + 1 WHERE entity_id = NEW.entity_id;
+    END IF;
+END $$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_task_stats_insert;
+CREATE TRIGGER trg_task_stats_insert
+AFTER INSERT ON Tasks
+FOR EACH ROW
+    UPDATE Concept_Stats
+    SET task_count = task_count + 1,
+        pending_count = pending_count + IFNULL(NEW.status = 'Pending', 0),
+        in_progress_count = in_progress_count + IFNULL(NEW.status = 'In Progress', 0),
+        completed_count = completed_count + IFNULL(NEW.status = 'Completed', 0)
+    WHERE entity_id = NEW.entity_id;
+
+DROP TRIGGER IF EXISTS trg_task_stats_delete;
+CREATE TRIGGER trg_task_stats_delete
+AFTER DELETE ON Tasks
+FOR EACH ROW
+    UPDATE Concept_Stats
+    SET task_count = task_count - 1,
+        pending_count = pending_count - IFNULL(OLD.status = 'Pending', 0),
+        in_progress_count = in_progress_count - IFNULL(OLD.status = 'In Progress', 0),
+        completed_count = completed_count - IFNULL(OLD.status = 'Completed', 0)
+    WHERE entity_id = OLD.entity_id;
+
+DROP TRIGGER IF EXISTS trg_task_stats_update;
+DELIMITER $$
+CREATE TRIGGER trg_task_stats_update
+AFTER UPDATE ON Tasks
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.entity_id <=> OLD.entity_id AND NEW.status <=> OLD.status) THEN
+        UPDATE Concept_Stats
+        SET task_count = task_count - 1,
+            pending_count = pending_count - IFNULL(OLD.status = 'Pending', 0),
+            in_progress_count = in_progress_count - IFNULL(OLD.status = 'In Progress', 0),
+            completed_count = completed_count - IFNULL(OLD.status = 'Completed', 0)
+        WHERE entity_id = OLD.entity_id;
+        UPDATE Concept_Stats
+        SET task_count = task_count + 1,
+            pending_count = pending_count + IFNULL(NEW.status = 'Pending', 0),
+            in_progress_count = in_progress_count + IFNULL(NEW.status = 'In Progress', 0),
+            completed_count = completed_count + IFNULL(NEW.status = 'Completed', 0)
+        WHERE entity_id = NEW.entity_id;
+    END IF;
+END $$
+DELIMITER ;
+
+-- View summarizing concept counts for GUI (counts come from Concept_Stats)
+CREATE OR REPLACE VIEW Concept_Summary AS
+SELECT
+  c.entity_id,
+  c.title,
+  c.type,
+  c.created_on,
+  cat.name AS category,
+  u.name AS owner,
+  COALESCE(s.note_count,0) AS notes_count,
+  COALESCE(s.task_count,0) AS tasks_count
+FROM Concepts c
+LEFT JOIN Categories cat ON c.category_id = cat.category_id
+LEFT JOIN Users u ON c.user_id = u.user_id
+LEFT JOIN Concept_Stats s ON c.entity_id = s.entity_id;
+
+-- What Concept_Stats should hold, counted from the fact tables
+CREATE OR REPLACE VIEW Concept_Stats_Recount AS
+SELECT
+  c.entity_id,
+  COALESCE(n.note_count,0) AS note_count,
+  COALESCE(t.task_count,0) AS task_count,
+  COALESCE(t.pending_count,0) AS pending_count,
+  COALESCE(t.in_progress_count,0) AS in_progress_count,
+  COALESCE(t.completed_count,0) AS completed_count
+FROM Concepts c
+LEFT JOIN ( SELECT entity_id, COUNT(*) AS note_count FROM Notes GROUP BY entity_id ) n ON c.entity_id = n.entity_id
+LEFT JOIN (
+  SELECT entity_id,
+         COUNT(*) AS task_count,
+         SUM(status = 'Pending') AS pending_count,
+         SUM(status = 'In Progress') AS in_progress_count,
+         SUM(status = 'Completed') AS completed_count
+  FROM Tasks GROUP BY entity_id
+) t ON c.entity_id = t.entity_id;
+
+DROP PROCEDURE IF EXISTS RebuildConceptStats;
+DELIMITER $$
+CREATE PROCEDURE RebuildConceptStats()
+BEGIN
+    DELETE FROM Concept_Stats;
+    INSERT INTO Concept_Stats (entity_id, note_count, task_count, pending_count, in_progress_count, completed_count)
+    SELECT entity_id, note_count, task_count, pending_count, in_progress_count, completed_count
+    FROM Concept_Stats_Recount;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS VerifyConceptStats;
+DELIMITER $$
+CREATE PROCEDURE VerifyConceptStats()
+BEGIN
+    SELECT r.entity_id,
+           s.note_count, r.note_count AS expected_note_count,
+           s.task_count, r.task_count AS expected_task_count,
+           s.pending_count, r.pending_count AS expected_pending_count,
+           s.in_progress_count, r.in_progress_count AS expected_in_progress_count,
+           s.completed_count, r.completed_count AS expected_completed_count
+    FROM Concept_Stats_Recount r
+    LEFT JOIN Concept_Stats s ON s.entity_id = r.entity_id
+    WHERE s.entity_id IS NULL
+       OR s.note_count <> r.note_count
+       OR s.task_count <> r.task_count
+       OR s.pending_count <> r.pending_count
+       OR s.in_progress_count <> r.in_progress_count
+       OR s.completed_count <> r.completed_count;
+END $$
+DELIMITER ;
+
+CALL RebuildConceptStats();
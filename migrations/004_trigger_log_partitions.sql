@@ -0,0 +1,147 @@
+-- Bounded Trigger_Log: monthly partitions with retention, a created_at index
+-- for the log viewer, and the buffered audit mode (VAULT_AUDIT_MODE=buffered).
+-- Rows older than the 6-month retention window are deleted first, so the
+-- repartitioning only copies what will be kept.
+USE KnowledgeVault1;
+
+DELETE FROM Trigger_Log WHERE created_at < CURDATE() - INTERVAL 6 MONTH;
+UPDATE Trigger_Log SET created_at = NOW() WHERE created_at IS NULL;
+
+ALTER TABLE Trigger_Log
+    MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (log_id, created_at),
+    ADD INDEX idx_trigger_log_created (created_at, log_id);
+
+ALTER TABLE Trigger_Log
+PARTITION BY RANGE COLUMNS (created_at) (
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Audit rows wait here instead of Trigger_Log while a session runs with
+-- @vault_audit_buffered = 1 (VAULT_AUDIT_MODE=buffered); FlushTriggerLog()
+-- moves them over in one batch. MEMORY keeps them off disk until then, so
+-- buffered rows are lost if the server restarts and survive a rollback.
+CREATE TABLE Trigger_Log_Buffer (
+    buffer_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    log_table VARCHAR(64),
+    log_action VARCHAR(64),
+    log_info VARCHAR(255),
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=MEMORY;
+
+DROP PROCEDURE IF EXISTS LogTrigger;
+DELIMITER $$
+CREATE PROCEDURE LogTrigger(IN in_table VARCHAR(64), IN in_action VARCHAR(64), IN in_info VARCHAR(255))
+BEGIN
+    IF @vault_audit_buffered = 1 THEN
+        INSERT INTO Trigger_Log_Buffer (log_table, log_action, log_info) VALUES (in_table, in_action, in_info);
+    ELSE
+        INSERT INTO Trigger_Log (log_table, log_action, log_info) VALUES (in_table, in_action, in_info);
+    END IF;
+END $$
+DELIMITER ;
+
+-- the logging triggers now write through LogTrigger()
+DROP TRIGGER IF EXISTS trg_after_task_update;
+DELIMITER $$
+CREATE TRIGGER trg_after_task_update
+AFTER UPDATE ON Tasks
+FOR EACH ROW
+BEGIN
+    -- log every task update
+    CALL LogTrigger('Tasks', CONCAT('UPDATE status=', NEW.status), CONCAT('task_id=', NEW.task_id));
+
+    -- if moved to Completed, create a note (automation) and log it
+    IF NEW.status = 'Completed' AND OLD.status <> 'Completed' THEN
+        INSERT INTO Notes (entity_id, body, created_on)
+        VALUES (NEW.entity_id,
+                CONCAT('Task \"', NEW.description, '\" completed on ', DATE_FORMAT(CURDATE(), '%Y-%m-%d')),
+                CURDATE());
+        CALL LogTrigger('Notes', 'AUTO_INSERT_FROM_TASK', CONCAT('task_id=', NEW.task_id, ';entity_id=', NEW.entity_id));
+    END IF;
+END $$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_after_concept_insert;
+DELIMITER $$
+CREATE TRIGGER trg_after_concept_insert
+AFTER INSERT ON Concepts
+FOR EACH ROW
+BEGIN
+    IF NEW.category_id IS NOT NULL THEN
+        UPDATE Categories SET concept_count = IFNULL(concept_count,0) + 1 WHERE category_id = NEW.category_id;
+        CALL LogTrigger('Categories','INCREMENT_CONCEPT_COUNT', CONCAT('category_id=', NEW.category_id));
+    END IF;
+END $$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_after_concept_delete;
+DELIMITER $$
+CREATE TRIGGER trg_after_concept_delete
+AFTER DELETE ON Concepts
+FOR EACH ROW
+BEGIN
+    IF OLD.category_id IS NOT NULL THEN
+        UPDATE Categories SET concept_count = GREATEST(IFNULL(concept_count,0)-1,0) WHERE category_id = OLD.category_id;
+        CALL LogTrigger('Categories','DECREMENT_CONCEPT_COUNT', CONCAT('category_id=', OLD.category_id));
+    END IF;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS RotateTriggerLog;
+DELIMITER $$
+CREATE PROCEDURE RotateTriggerLog(IN keep_months INT)
+BEGIN
+    DECLARE month_start DATE DEFAULT DATE_FORMAT(CURDATE(), '%Y-%m-01');
+    DECLARE expired TEXT;
+    -- make sure this month and next have their own partitions
+    WHILE month_start <= DATE_FORMAT(CURDATE() + INTERVAL 1 MONTH, '%Y-%m-01') DO
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Trigger_Log'
+              AND PARTITION_NAME = DATE_FORMAT(month_start, 'p%Y%m')
+        ) THEN
+            SET @ddl = CONCAT(
+                'ALTER TABLE Trigger_Log REORGANIZE PARTITION p_future INTO (',
+                'PARTITION ', DATE_FORMAT(month_start, 'p%Y%m'),
+                ' VALUES LESS THAN (''', month_start + INTERVAL 1 MONTH, '''), ',
+                'PARTITION p_future VALUES LESS THAN (MAXVALUE))'
+            );
+            PREPARE stmt FROM @ddl;
+            EXECUTE stmt;
+            DEALLOCATE PREPARE stmt;
+        END IF;
+        SET month_start = month_start + INTERVAL 1 MONTH;
+    END WHILE;
+    -- drop whole months that fell out of the retention window
+    SELECT GROUP_CONCAT(PARTITION_NAME) INTO expired
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Trigger_Log'
+      AND PARTITION_NAME REGEXP '^p[0-9]{6}$'
+      AND PARTITION_NAME < DATE_FORMAT(CURDATE() - INTERVAL keep_months MONTH, 'p%Y%m');
+    IF expired IS NOT NULL THEN
+        SET @ddl = CONCAT('ALTER TABLE Trigger_Log DROP PARTITION ', expired);
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END IF;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS FlushTriggerLog;
+DELIMITER $$
+CREATE PROCEDURE FlushTriggerLog()
+BEGIN
+    DECLARE last_id BIGINT;
+    SELECT MAX(buffer_id) INTO last_id FROM Trigger_Log_Buffer;
+    IF last_id IS NOT NULL THEN
+        INSERT INTO Trigger_Log (log_table, log_action, log_info, created_at)
+        SELECT log_table, log_action, log_info, created_at
+        FROM Trigger_Log_Buffer WHERE buffer_id <= last_id ORDER BY buffer_id;
+        DELETE FROM Trigger_Log_Buffer WHERE buffer_id <= last_id;
+    END IF;
+END $$
+DELIMITER ;
+
+CALL RotateTriggerLog(6);
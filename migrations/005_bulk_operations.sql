@@ -0,0 +1,31 @@
+-- Bulk operations: MarkTasksCompleted for a list of tasks, and a trigger that
+-- keeps Categories.concept_count right when concepts change category
+-- (the app's bulk "Move to category" action).
+USE KnowledgeVault1;
+
+DROP TRIGGER IF EXISTS trg_after_concept_update;
+DELIMITER $$
+CREATE TRIGGER trg_after_concept_update
+AFTER UPDATE ON Concepts
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.category_id <=> OLD.category_id) THEN
+        UPDATE Categories SET concept_count = GREATEST(IFNULL(concept_count,0)-1,0) WHERE category_id = OLD.category_id;
+        UPDATE Categories SET concept_count = IFNULL(concept_count,0) + 1 WHERE category_id = NEW.category_id;
+        CALL LogTrigger('Categories','MOVE_CONCEPT',
+                        CONCAT('entity_id=', NEW.entity_id, ';category_id=', IFNULL(OLD.category_id, 'NULL'), '->', IFNULL(NEW.category_id, 'NULL')));
+    END IF;
+END $$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS MarkTasksCompleted;
+DELIMITER $$
+CREATE PROCEDURE MarkTasksCompleted(IN in_task_ids JSON)
+BEGIN
+    -- set-based counterpart of MarkTaskCompleted, e.g. CALL MarkTasksCompleted('[1, 2, 3]')
+    UPDATE Tasks t
+    JOIN JSON_TABLE(in_task_ids, '$[*]' COLUMNS (task_id INT PATH '$')) ids ON ids.task_id = t.task_id
+    SET t.status = 'Completed'
+    WHERE NOT (t.status <=> 'Completed');
+END $$
+DELIMITER ;
@@ -0,0 +1,16 @@
+-- Table_Versions: per-table change counters bumped by every write made through
+-- db.Store (the app and the JSON API) and vault_io, so each process notices
+-- writes made by the others and refreshes its caches.
+USE KnowledgeVault1;
+
+-- One change counter per table, bumped in the same transaction as every write
+-- made through db.Store or vault_io, so the app, the API and other servers can
+-- tell which of their cached data another process changed
+CREATE TABLE Table_Versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT INTO Table_Versions (table_name) VALUES
+('Users'), ('Categories'), ('Concepts'), ('Notes'), ('Tasks'), ('Tags'),
+('Concept_Tags'), ('Attachments'), ('Collaborators'), ('Links');
@@ -0,0 +1,35 @@
+-- Transactional audit buffer: Trigger_Log_Buffer moves from MEMORY to InnoDB,
+-- so rolled-back writes no longer leave audit rows behind, and FlushTriggerLog
+-- takes a named lock so that the app and the API never copy the same rows twice.
+-- Rows already queued are kept by the ALTER.
+USE KnowledgeVault1;
+
+ALTER TABLE Trigger_Log_Buffer ENGINE=InnoDB;
+
+DROP PROCEDURE IF EXISTS FlushTriggerLog;
+DELIMITER $$
+CREATE PROCEDURE FlushTriggerLog()
+BEGIN
+    DECLARE last_id BIGINT;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        DO RELEASE_LOCK('vault_flush_trigger_log');
+        RESIGNAL;
+    END;
+    -- one flush at a time across the app and API processes; a second caller
+    -- returns at once and leaves the rows to the running one
+    IF GET_LOCK('vault_flush_trigger_log', 0) = 1 THEN
+        START TRANSACTION;
+        SELECT MAX(buffer_id) INTO last_id FROM Trigger_Log_Buffer;
+        IF last_id IS NOT NULL THEN
+            INSERT INTO Trigger_Log (log_table, log_action, log_info, created_at)
+            SELECT log_table, log_action, log_info, created_at
+            FROM Trigger_Log_Buffer WHERE buffer_id <= last_id ORDER BY buffer_id;
+            DELETE FROM Trigger_Log_Buffer WHERE buffer_id <= last_id;
+        END IF;
+        COMMIT;
+        DO RELEASE_LOCK('vault_flush_trigger_log');
+    END IF;
+END $$
+DELIMITER ;
@@ -0,0 +1,16 @@
+-- MarkStatusCompleted: completes every task with a given status in one
+-- server-side statement (View Tasks' "Every task with a status" scope),
+-- instead of the app collecting their ids first.
+USE KnowledgeVault1;
+
+DROP PROCEDURE IF EXISTS MarkStatusCompleted;
+DELIMITER $$
+CREATE PROCEDURE MarkStatusCompleted(IN in_status VARCHAR(20))
+BEGIN
+    -- every task with a status, completed in one statement on the server,
+    -- e.g. CALL MarkStatusCompleted('In Progress'); returns the number changed
+    UPDATE Tasks SET status = 'Completed'
+    WHERE status = in_status AND status <> 'Completed';
+    SELECT ROW_COUNT() AS completed;
+END $$
+DELIMITER ;
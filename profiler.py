@@ -0,0 +1,342 @@
+"""
+Query profiler for the Streamlit app.
+
+Every query run through app.py is recorded with its SQL fingerprint, wall
+time, rows, payload bytes and the page section that issued it. Records are
+grouped per script rerun (for the developer panel), kept per session, and
+aggregated per process for Prometheus:
+
+    VAULT_METRICS_FILE=/var/lib/node_exporter/vault.prom   # textfile collector
+    VAULT_METRICS_PORT=9464                                 # or scrape http://host:9464/metrics
+"""
+import contextvars
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque, namedtuple
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+N_PLUS_ONE_THRESHOLD = 5  # same statement from the same line this often in one rerun
+SESSION_HISTORY = 200     # render times kept per session
+
+QueryRecord = namedtuple("QueryRecord", "fingerprint params section seconds rows bytes cached")
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%s|\?")
+IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+HEADING = re.compile(r"""st\.(?:header|subheader)\(\s*f?["']([^"']+)|st\.write\(\s*["']#+\s*([^"']+)""")
+PAGE = re.compile(r"""^(?:el)?if menu == ["']([^"']+)""")
+
+_current_rerun = contextvars.ContextVar("current_rerun", default=None)
+_current_section = contextvars.ContextVar("current_section", default=None)
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    Normalizes a statement so that runs differing only in literals, IN-list
+    length or whitespace share one fingerprint.
+    """
+    sql = " ".join(sql.split()).rstrip(";")
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = PLACEHOLDER.sub("?", sql)
+    return IN_LIST.sub("(?+)", sql)
+
+def payload_size(rows):
+    """
+    Rough size of a result set in bytes: text and blobs by length, anything
+    else as 8 bytes.
+    """
+    size = 0
+    for row in rows or ():
+        for value in (row.values() if isinstance(row, dict) else row):
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    return size
+
+@lru_cache(maxsize=8)
+def _section_labels(path):
+    """
+    Maps each line of the page script to the page and the st.header /
+    st.subheader / "### ..." heading it sits under.
+    """
+    labels, page, heading = [""], None, None
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return labels
+    for line in lines:
+        match = PAGE.match(line)
+        if match:
+            page, heading = match.group(1), None
+        match = HEADING.search(line)
+        if match:
+            heading = (match.group(1) or match.group(2)).strip()
+        labels.append(heading or page or "")
+    return labels
+
+def calling_section():
+    """
+    Names the part of the page script that issued the current query: the
+    nearest heading above the script line on the call stack.
+    """
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_name != "<module>":
+        frame = frame.f_back
+    if frame is None:
+        return "background"
+    path, line = frame.f_code.co_filename, frame.f_lineno
+    labels = _section_labels(path)
+    label = labels[line] if line < len(labels) else ""
+    return f"{label or 'top level'} ({os.path.basename(path)}:{line})"
+
+def in_caller_context(fn, *args):
+    """
+    Wraps fn(*args) to run on a worker thread in a copy of the caller's
+    context, so its queries count towards the caller's rerun and section.
+    """
+    context = contextvars.copy_context()
+    section = calling_section() if _current_rerun.get() else None
+
+    def run():
+        _current_section.set(section)
+        return fn(*args)
+    return functools.partial(context.run, run)
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        total, counts = 0, []
+        for n in self.buckets:
+            total += n
+            counts.append(total)
+        return counts
+
+class Rerun:
+    """
+    The queries of one script run of one session.
+    """
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.finished = None
+        self.queries = []
+
+    @property
+    def seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def db_queries(self):
+        return [q for q in self.queries if not q.cached]
+
+    def db_seconds(self):
+        return sum(q.seconds for q in self.queries if not q.cached)
+
+    def slowest_sections(self):
+        totals = defaultdict(lambda: [0, 0.0, 0])
+        for q in self.db_queries():
+            entry = totals[q.section]
+            entry[0] += 1
+            entry[1] += q.seconds
+            entry[2] += q.rows
+        return sorted(
+            ({"section": s, "queries": n, "ms": round(t * 1000, 2), "rows": r} for s, (n, t, r) in totals.items()),
+            key=lambda row: -row["ms"]
+        )
+
+    def n_plus_one(self):
+        """
+        Statements issued N_PLUS_ONE_THRESHOLD+ times from the same line,
+        typically a query inside a loop over rows.
+        """
+        counts = Counter((q.section, q.fingerprint) for q in self.db_queries())
+        return [
+            {"section": section, "statement": fp, "times": n}
+            for (section, fp), n in counts.most_common() if n >= N_PLUS_ONE_THRESHOLD
+        ]
+
+    def duplicates(self):
+        """
+        Identical statements with identical parameters run more than once,
+        including repeats answered by the result cache.
+        """
+        counts = Counter((q.fingerprint, q.params) for q in self.queries)
+        hits = Counter((q.fingerprint, q.params) for q in self.queries if q.cached)
+        return [
+            {"statement": fp, "params": params, "times": n, "from_cache": hits[(fp, params)]}
+            for (fp, params), n in counts.most_common() if n > 1
+        ]
+
+class SessionStats:
+    """
+    Per-session totals, kept in st.session_state.
+    """
+    def __init__(self):
+        self.reruns = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = deque(maxlen=SESSION_HISTORY)
+
+    def add(self, rerun):
+        self.reruns += 1
+        self.queries += len(rerun.db_queries())
+        self.db_seconds += rerun.db_seconds()
+        self.render_seconds.append(rerun.seconds)
+
+    def percentile(self, q):
+        values = sorted(self.render_seconds)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+class Profiler:
+    """
+    Process-wide query and render metrics, shared by all sessions.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.query_seconds = defaultdict(Histogram)   # fingerprint -> latency
+        self.query_rows = Counter()
+        self.query_bytes = Counter()
+        self.section_seconds = Counter()
+        self.cache_hits = Counter()
+        self.render_seconds = defaultdict(Histogram)  # page -> rerun latency
+
+    def record(self, sql, params, seconds, rows=None, rowcount=0, cached=False):
+        """
+        Records one statement. `rows` is the fetched result (if any);
+        `rowcount` is used for writes. Cache hits only count towards the
+        current rerun and vault_query_cache_hits_total.
+        """
+        rerun = _current_rerun.get()
+        record = QueryRecord(
+            fingerprint(sql),
+            repr(tuple(params or ()))[:200],
+            (_current_section.get() or calling_section()) if rerun else "background",
+            seconds,
+            len(rows) if rows is not None else max(rowcount, 0),
+            0 if cached else payload_size(rows),
+            cached,
+        )
+        with self._lock:
+            if cached:
+                self.cache_hits[record.fingerprint] += 1
+            else:
+                self.query_seconds[record.fingerprint].observe(seconds)
+                self.query_rows[record.fingerprint] += record.rows
+                self.query_bytes[record.fingerprint] += record.bytes
+                self.section_seconds[record.section] += seconds
+        if rerun is not None:
+            rerun.queries.append(record)
+        return record
+
+    def start_rerun(self, page):
+        rerun = Rerun(page)
+        _current_rerun.set(rerun)
+        return rerun
+
+    def finish_rerun(self, rerun):
+        if rerun.finished is not None:
+            return
+        rerun.finished = time.perf_counter()
+        with self._lock:
+            self.render_seconds[rerun.page].observe(rerun.seconds)
+
+    def top_statements(self, limit=10):
+        with self._lock:
+            rows = [
+                {"statement": fp, "calls": h.count, "total_ms": round(h.sum * 1000, 1),
+                 "mean_ms": round(h.sum / h.count * 1000, 2), "rows": self.query_rows[fp],
+                 "bytes": self.query_bytes[fp]}
+                for fp, h in self.query_seconds.items() if h.count
+            ]
+        return sorted(rows, key=lambda row: -row["total_ms"])[:limit]
+
+    def to_prometheus(self):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def histogram(name, help_text, label, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for value, h in sorted(series.items()):
+                tag = f'{label}="{_escape(value)}"'
+                for bound, count in zip(BUCKETS, h.cumulative()):
+                    lines.append(f'{name}_bucket{{{tag},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{tag},le="+Inf"}} {h.count}')
+                lines.append(f"{name}_sum{{{tag}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{tag}}} {h.count}")
+
+        def counter(name, help_text, label, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for value, total in sorted(series.items()):
+                lines.append(f'{name}{{{label}="{_escape(value)}"}} {total}')
+
+        with self._lock:
+            histogram("vault_render_seconds", "Wall time of one Streamlit rerun.", "page", self.render_seconds)
+            histogram("vault_query_seconds", "Wall time of one query.", "statement", self.query_seconds)
+            counter("vault_query_rows_total", "Rows returned or changed.", "statement", self.query_rows)
+            counter("vault_query_bytes_total", "Approximate bytes returned.", "statement", self.query_bytes)
+            counter("vault_query_cache_hits_total", "Reads answered by the result cache.", "statement",
+                    self.cache_hits)
+            counter("vault_section_query_seconds_total", "Query time per page section.", "section",
+                    self.section_seconds)
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """
+        Writes the metrics atomically, for node_exporter's textfile collector.
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves /metrics on a daemon thread and returns the server.
+        """
+        profiler = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = profiler.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")[:300]
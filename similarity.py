@@ -0,0 +1,225 @@
+"""
+Offline TF-IDF index over concepts for "suggested links" and "find similar".
+"""
+from collections import Counter
+import re
+import threading
+
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9]{2,}")
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have in into is it its of on or that the this to was were
+    will with not no can we you they he she our your their about also more than then there these those
+    which who what when where how all any each other some such only own same so very just should would could
+""".split())
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class SimilarityIndex:
+    """
+    Sparse TF-IDF vectors per concept (title, notes and tags), kept as an
+    inverted index in CSR arrays: term -> (concept rows, log-scaled counts).
+    A query vector is scored against every concept with one gather and one
+    bincount over its terms' postings, so cost follows the postings touched
+    rather than the number of concepts. Concepts changed since the last
+    rebuild are held in `_pending` and scored directly.
+    """
+    REBUILD_THRESHOLD = 2000
+    MAX_DF = 0.5  # query terms in more than half the concepts carry no signal
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._index = {}                 # entity_id -> row
+        self._ids = []                   # row -> entity_id
+        self._vocab = {}                 # term -> term id
+        self._counts = []                # row -> Counter(term id -> weighted count)
+        self._removed = set()            # rows of deleted concepts
+        self._pending = set()            # rows changed since the last rebuild
+        self._df = np.zeros(0, dtype=np.int64)
+        self._build()
+
+    @classmethod
+    def from_rows(cls, documents):
+        """
+        Builds the index from (entity_id, text, weight) tuples; a concept's
+        title, notes and tags are separate tuples with their own weights.
+        """
+        index = cls()
+        with index._lock:
+            for entity_id, text, weight in documents:
+                index._add(index._row(entity_id), text, weight)
+            index._build()
+        return index
+
+    # Internal helpers
+    def _row(self, entity_id):
+        row = self._index.get(entity_id)
+        if row is None:
+            row = self._index[entity_id] = len(self._ids)
+            self._ids.append(entity_id)
+            self._counts.append(Counter())
+        return row
+
+    def _term(self, term):
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._vocab)
+        return term_id
+
+    def _add(self, row, text, weight):
+        counts = self._counts[row]
+        for term, n in Counter(tokenize(text)).items():
+            term_id = self._term(term)
+            counts[term_id] += n * weight
+            if counts[term_id] <= 0:
+                del counts[term_id]
+
+    def _vector(self, counts, idf):
+        """
+        (term ids, weights) of a term-count mapping: (1 + log tf) * idf.
+        """
+        terms = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        return terms, (1 + np.log(tf)) * idf[terms]
+
+    def _idf(self):
+        n = max(len(self._ids) - len(self._removed), 1)
+        df = np.zeros(len(self._vocab), dtype=np.int64)
+        df[:len(self._df)] = self._df
+        return np.log((1 + n) / (1 + df)) + 1, df, n
+
+    def _build(self):
+        """
+        Rebuilds the inverted index and the per-concept norms from the
+        term counts, dropping deleted concepts.
+        """
+        rows, terms, tf = [], [], []
+        for row, counts in enumerate(self._counts):
+            if row in self._removed or not counts:
+                continue
+            rows.append(np.full(len(counts), row, dtype=np.int32))
+            terms.append(np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)))
+            tf.append(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        terms = np.concatenate(terms) if terms else np.zeros(0, dtype=np.int64)
+        tf = 1 + np.log(np.concatenate(tf)) if tf else np.zeros(0)
+        order = np.argsort(terms, kind="stable")
+        self._df = np.bincount(terms, minlength=len(self._vocab))
+        self._offsets = np.concatenate(([0], np.cumsum(self._df)))
+        self._post_rows = rows[order]
+        self._post_tf = tf[order].astype(np.float32)
+        idf, _, _ = self._idf()
+        norms = np.bincount(rows, weights=(tf * idf[terms]) ** 2, minlength=len(self._ids))
+        self._norms = np.sqrt(norms)
+        self._built_rows = len(self._ids)
+        self._pending = set()
+
+    def _scores(self, counts):
+        """
+        Cosine similarity of a term-count mapping against every concept.
+        """
+        idf, df, n = self._idf()
+        counts = {t: c for t, c in counts.items() if df[t] <= self.MAX_DF * n or n < 10}
+        scores = np.zeros(len(self._ids))
+        if not counts:
+            return scores
+        terms, weights = self._vector(counts, idf)
+        query_norm = np.sqrt((weights ** 2).sum())
+        in_index = terms < len(self._offsets) - 1  # terms first seen after the last rebuild have no postings
+        built, factors = terms[in_index], weights[in_index] * idf[terms[in_index]]
+        starts, ends = self._offsets[built], self._offsets[built + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total:
+            # positions of every posting of every query term, in one array
+            positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(total)
+            scores[:self._built_rows] = np.bincount(
+                self._post_rows[positions], weights=self._post_tf[positions] * np.repeat(factors, lengths),
+                minlength=self._built_rows
+            )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores[:self._built_rows] /= self._norms * query_norm
+        scores[:self._built_rows][self._norms == 0] = 0
+        query = dict(zip(terms.tolist(), weights.tolist()))
+        for row in self._pending | set(range(self._built_rows, len(self._ids))):
+            if not self._counts[row]:
+                scores[row] = 0.0
+                continue
+            doc_terms, doc_weights = self._vector(self._counts[row], idf)
+            dot = sum(query.get(t, 0.0) * w for t, w in zip(doc_terms.tolist(), doc_weights.tolist()))
+            scores[row] = dot / (np.sqrt((doc_weights ** 2).sum()) * query_norm)
+        if self._removed:
+            scores[list(self._removed)] = 0
+        return scores
+
+    def _top(self, scores, k, exclude=()):
+        for entity_id in exclude:
+            row = self._index.get(entity_id)
+            if row is not None:
+                scores[row] = 0
+        k = min(k, int((scores > 0).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[row], float(scores[row])) for row in top]
+
+    # Incremental updates
+    def add_text(self, entity_id, text, weight=1):
+        """
+        Adds text to a concept's vector (a new note, title or tag).
+        """
+        with self._lock:
+            row = self._row(entity_id)
+            self._removed.discard(row)
+            self._add(row, text, weight)
+            self._changed(row)
+
+    def remove_text(self, entity_id, text, weight=1):
+        """
+        Takes text back out of a concept's vector (a removed tag).
+        """
+        with self._lock:
+            row = self._index.get(entity_id)
+            if row is not None:
+                self._add(row, text, -weight)
+                self._changed(row)
+
+    def remove_concepts(self, entity_ids):
+        with self._lock:
+            rows = [self._index[e] for e in entity_ids if e in self._index]
+            self._removed.update(rows)
+            for row in rows:
+                self._changed(row)
+
+    def _changed(self, row):
+        if row < self._built_rows:
+            self._pending.add(row)
+        if len(self._pending) + len(self._ids) - self._built_rows >= self.REBUILD_THRESHOLD:
+            self._build()
+
+    # Queries
+    def similar(self, entity_id, k=10, exclude=()):
+        """
+        Top-k (entity_id, score) of the concepts most similar to one concept.
+        """
+        with self._lock:
+            row = self._index.get(entity_id)
+            if row is None or row in self._removed:
+                return []
+            return self._top(self._scores(self._counts[row]), k, {entity_id, *exclude})
+
+    def search(self, text, k=10):
+        """
+        Top-k (entity_id, score) of the concepts most similar to free text.
+        """
+        with self._lock:
+            counts = Counter(self._vocab[t] for t in tokenize(text) if t in self._vocab)
+            return self._top(self._scores(counts), k)
+
+    def __len__(self):
+        return len(self._ids) - len(self._removed)
@@ -0,0 +1,418 @@
+"""
+Embedded SQLite backend for single-user installs (VAULT_BACKEND=sqlite).
+
+Wraps sqlite3 in the small part of the mysql-connector API the app and the
+command-line tools use (dictionary cursors, callproc/stored_results, a
+connection pool), so the same SQL runs on either backend. A new database
+file is created from KnowledgeVault.sqlite.sql on first connect, without
+the sample rows when VAULT_SQLITE_SAMPLE_DATA=0. The stored
+procedures and the DaysRemaining function are defined here.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "KnowledgeVault.sqlite.sql")
+SAMPLE_DATA = os.environ.get("VAULT_SQLITE_SAMPLE_DATA", "1") != "0"
+SAMPLE_DATA_MARKER = "-- SAMPLE DATA"
+BUSY_TIMEOUT = 10.0
+MMAP_SIZE = 256 * 1024 * 1024
+
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+]
+
+# Tables added after the first release, created in older files when they are opened
+UPGRADES = {
+    "Table_Versions": """
+        CREATE TABLE Table_Versions (
+            table_name VARCHAR(64) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO Table_Versions (table_name) VALUES
+        ('Users'), ('Categories'), ('Concepts'), ('Notes'), ('Tasks'), ('Tags'),
+        ('Concept_Tags'), ('Attachments'), ('Collaborators'), ('Links');
+    """,
+}
+
+# Schema changes to existing tables, run in order on files whose user_version
+# is older; new files start at the last one (set in the schema script)
+MIGRATIONS = {
+    # Search_Index rows keyed by rowid (see the trg_search_* triggers)
+    1: """
+        DROP TRIGGER trg_search_concept_insert;
+        DROP TRIGGER trg_search_concept_update;
+        DROP TRIGGER trg_search_concept_delete;
+        DROP TRIGGER trg_search_note_insert;
+        DROP TRIGGER trg_search_note_update;
+        DROP TRIGGER trg_search_note_delete;
+        DROP TRIGGER trg_search_task_insert;
+        DROP TRIGGER trg_search_task_update;
+        DROP TRIGGER trg_search_task_delete;
+        DROP TRIGGER trg_search_tag_insert;
+        DROP TRIGGER trg_search_tag_update;
+        DROP TRIGGER trg_search_tag_delete;
+        DELETE FROM Search_Index;
+        INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+        SELECT entity_id * 4, 'Concept', entity_id, entity_id, title FROM Concepts;
+        INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+        SELECT note_id * 4 + 1, 'Note', note_id, entity_id, body FROM Notes;
+        INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+        SELECT task_id * 4 + 2, 'Task', task_id, entity_id, description FROM Tasks;
+        INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+        SELECT tag_id * 4 + 3, 'Tag', tag_id, NULL, tag FROM Tags;
+        CREATE TRIGGER trg_search_concept_insert AFTER INSERT ON Concepts BEGIN
+            INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+            VALUES (NEW.entity_id * 4, 'Concept', NEW.entity_id, NEW.entity_id, NEW.title);
+        END;
+        CREATE TRIGGER trg_search_concept_update AFTER UPDATE OF title ON Concepts BEGIN
+            UPDATE Search_Index SET text = NEW.title WHERE rowid = NEW.entity_id * 4;
+        END;
+        CREATE TRIGGER trg_search_concept_delete AFTER DELETE ON Concepts BEGIN
+            DELETE FROM Search_Index WHERE rowid = OLD.entity_id * 4;
+        END;
+        CREATE TRIGGER trg_search_note_insert AFTER INSERT ON Notes BEGIN
+            INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+            VALUES (NEW.note_id * 4 + 1, 'Note', NEW.note_id, NEW.entity_id, NEW.body);
+        END;
+        CREATE TRIGGER trg_search_note_update AFTER UPDATE OF body ON Notes BEGIN
+            UPDATE Search_Index SET text = NEW.body WHERE rowid = NEW.note_id * 4 + 1;
+        END;
+        CREATE TRIGGER trg_search_note_delete AFTER DELETE ON Notes BEGIN
+            DELETE FROM Search_Index WHERE rowid = OLD.note_id * 4 + 1;
+        END;
+        CREATE TRIGGER trg_search_task_insert AFTER INSERT ON Tasks BEGIN
+            INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+            VALUES (NEW.task_id * 4 + 2, 'Task', NEW.task_id, NEW.entity_id, NEW.description);
+        END;
+        CREATE TRIGGER trg_search_task_update AFTER UPDATE OF description ON Tasks BEGIN
+            UPDATE Search_Index SET text = NEW.description WHERE rowid = NEW.task_id * 4 + 2;
+        END;
+        CREATE TRIGGER trg_search_task_delete AFTER DELETE ON Tasks BEGIN
+            DELETE FROM Search_Index WHERE rowid = OLD.task_id * 4 + 2;
+        END;
+        CREATE TRIGGER trg_search_tag_insert AFTER INSERT ON Tags BEGIN
+            INSERT INTO Search_Index (rowid, kind, item_id, entity_id, text)
+            VALUES (NEW.tag_id * 4 + 3, 'Tag', NEW.tag_id, NULL, NEW.tag);
+        END;
+        CREATE TRIGGER trg_search_tag_update AFTER UPDATE OF tag ON Tags BEGIN
+            UPDATE Search_Index SET text = NEW.tag WHERE rowid = NEW.tag_id * 4 + 3;
+        END;
+        CREATE TRIGGER trg_search_tag_delete AFTER DELETE ON Tags BEGIN
+            DELETE FROM Search_Index WHERE rowid = OLD.tag_id * 4 + 3;
+        END;
+    """,
+}
+
+# Tables dropped since, removed from older files when they are opened. Buffered
+# audit mode is MySQL-only: here the log rows already commit with their write.
+RETIRED = {
+    "Trigger_Log_Buffer": """
+        INSERT INTO Trigger_Log (log_table, log_action, log_info, created_at)
+        SELECT log_table, log_action, log_info, created_at FROM Trigger_Log_Buffer ORDER BY buffer_id;
+        DROP TABLE Trigger_Log_Buffer;
+        DROP TRIGGER trg_audit_log_insert;
+        CREATE TRIGGER trg_audit_log_insert
+        INSTEAD OF INSERT ON Audit_Log
+        BEGIN
+            INSERT INTO Trigger_Log (log_table, log_action, log_info)
+            VALUES (NEW.log_table, NEW.log_action, NEW.log_info);
+        END;
+    """,
+}
+
+# MySQL spellings used by the app, rewritten for SQLite
+TRANSLATIONS = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"%%"), "%"),
+    (re.compile(r"\bCURDATE\(\)", re.IGNORECASE), "date('now', 'localtime')"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE), "INSERT OR IGNORE"),
+    (re.compile(r"\bDROP\s+TEMPORARY\s+TABLE\b", re.IGNORECASE), "DROP TABLE"),
+    # writers are serialized by the database lock, which the transaction's first write takes
+    (re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE), ""),
+]
+
+# Stored procedures: each statement runs with as many of the call's arguments
+# as it has placeholders, and every statement that returns rows becomes one
+# result set.
+PROCEDURES = {
+    "GetConceptDetails": [
+        "SELECT note_id, body, created_on FROM Notes WHERE entity_id = ? ORDER BY created_on DESC",
+        "SELECT task_id, description, due_on, status, remind_on FROM Tasks WHERE entity_id = ? ORDER BY due_on DESC",
+        """SELECT t.tag_id, t.tag, t.role
+           FROM Concept_Tags ct
+           JOIN Tags t ON ct.tag_id = t.tag_id
+           WHERE ct.entity_id = ?""",
+    ],
+    "GetLinkedConcepts": [
+        """SELECT l.link_id, c2.entity_id AS related_entity_id, c2.title AS related_title, l.relation_type
+           FROM Links l
+           JOIN Concepts c2 ON l.dst_concept_id = c2.entity_id
+           WHERE l.src_concept_id = ?""",
+    ],
+    "MarkTaskCompleted": [
+        "UPDATE Tasks SET status = 'Completed' WHERE task_id = ?",  # trigger adds the note and log rows
+    ],
+    "MarkTasksCompleted": [
+        """UPDATE Tasks SET status = 'Completed'
+           WHERE task_id IN (SELECT value FROM json_each(?)) AND status IS NOT 'Completed'""",
+    ],
+    "MarkStatusCompleted": [
+        "UPDATE Tasks SET status = 'Completed' WHERE status = ? AND status <> 'Completed'",
+        "SELECT changes() AS completed",
+    ],
+    "CountNotesPerConcept": [
+        """SELECT c.entity_id, c.title, COUNT(n.note_id) AS note_count
+           FROM Concepts c
+           LEFT JOIN Notes n ON c.entity_id = n.entity_id
+           GROUP BY c.entity_id, c.title
+           ORDER BY note_count DESC""",
+    ],
+    # no partitions here: expired rows are deleted through the created_at index
+    "RotateTriggerLog": [
+        "DELETE FROM Trigger_Log WHERE created_at < datetime('now', 'start of month', '-' || ? || ' months')",
+    ],
+    "RebuildConceptStats": [
+        "DELETE FROM Concept_Stats",
+        """INSERT INTO Concept_Stats (entity_id, note_count, task_count, pending_count, in_progress_count, completed_count)
+           SELECT entity_id, note_count, task_count, pending_count, in_progress_count, completed_count
+           FROM Concept_Stats_Recount""",
+    ],
+    "VerifyConceptStats": [
+        """SELECT r.entity_id,
+                  s.note_count, r.note_count AS expected_note_count,
+                  s.task_count, r.task_count AS expected_task_count,
+                  s.pending_count, r.pending_count AS expected_pending_count,
+                  s.in_progress_count, r.in_progress_count AS expected_in_progress_count,
+                  s.completed_count, r.completed_count AS expected_completed_count
+           FROM Concept_Stats_Recount r
+           LEFT JOIN Concept_Stats s ON s.entity_id = r.entity_id
+           WHERE s.entity_id IS NULL
+              OR s.note_count <> r.note_count
+              OR s.task_count <> r.task_count
+              OR s.pending_count <> r.pending_count
+              OR s.in_progress_count <> r.in_progress_count
+              OR s.completed_count <> r.completed_count""",
+    ],
+}
+
+# FTS5 counterpart of app.SEARCH_QUERY; tag hits fan out to their concepts
+SEARCH_QUERY = """
+    SELECT s.kind, s.item_id AS id, c.entity_id, c.title AS concept, s.text,
+           -bm25(Search_Index) AS score
+    FROM Search_Index s
+    LEFT JOIN Concept_Tags ct ON s.kind = 'Tag' AND ct.tag_id = s.item_id
+    JOIN Concepts c ON c.entity_id = COALESCE(s.entity_id, ct.entity_id)
+    WHERE Search_Index MATCH ?
+    ORDER BY score DESC
+    LIMIT ?
+"""
+
+class PoolError(Exception):
+    pass
+
+def translate(sql):
+    for pattern, replacement in TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+def _convert_date(value):
+    try:
+        return date.fromisoformat(value.decode()[:10])
+    except ValueError:
+        return value.decode()
+
+def _convert_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.decode())
+    except ValueError:
+        return value.decode()
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+
+_schema_lock = threading.Lock()
+
+def _open(path):
+    """
+    Opens a raw sqlite3 connection with the app's pragmas and functions and
+    creates the schema if the file is new.
+    """
+    raw = sqlite3.connect(path, timeout=BUSY_TIMEOUT, detect_types=sqlite3.PARSE_DECLTYPES,
+                          check_same_thread=False)
+    for pragma in PRAGMAS:
+        raw.execute(pragma)
+
+    def days_remaining(task_id):
+        row = raw.execute(
+            "SELECT CAST(julianday(due_on) - julianday(date('now', 'localtime')) AS INTEGER) FROM Tasks WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    raw.create_function("DaysRemaining", 1, days_remaining)
+    raw.create_function("VERSION", 0, lambda: "SQLite " + sqlite3.sqlite_version, deterministic=True)
+    with _schema_lock:
+        if raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Concepts'").fetchone() is None:
+            with open(SCHEMA_PATH, encoding="utf-8") as f:
+                script = f.read()
+            if not SAMPLE_DATA:
+                script = script.split(SAMPLE_DATA_MARKER)[0]
+            raw.executescript(script)
+        for table, script in UPGRADES.items():
+            if raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is None:
+                raw.executescript(script)
+        for table, script in RETIRED.items():
+            if raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None:
+                raw.executescript(script)
+        version = raw.execute("PRAGMA user_version").fetchone()[0]
+        for target, script in sorted(MIGRATIONS.items()):
+            if version < target:
+                raw.executescript(f"BEGIN; {script} PRAGMA user_version = {target}; COMMIT;")
+    return raw
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+class Cursor:
+    """
+    sqlite3 cursor with mysql-connector's dictionary rows, %s placeholders
+    and callproc()/stored_results().
+    """
+    def __init__(self, raw, dictionary=False):
+        self._cursor = raw.cursor()
+        if dictionary:
+            self._cursor.row_factory = _dict_row
+        self._results = []
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate(query), tuple(params or ()))
+        return self
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(translate(query), seq_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def callproc(self, name, args=()):
+        if name not in PROCEDURES:
+            raise sqlite3.OperationalError(f"PROCEDURE {name} does not exist")
+        self._results = []
+        for statement in PROCEDURES[name]:
+            self._cursor.execute(statement, tuple(args)[:statement.count("?")])
+            if self._cursor.description is not None:
+                self._results.append(_Result(self._cursor.fetchall()))
+        return tuple(args)
+
+    def stored_results(self):
+        return iter(self._results)
+
+    def close(self):
+        self._cursor.close()
+
+class Connection:
+    """
+    A raw connection plus the mysql-connector methods the app calls. Closing
+    a pooled connection hands it back to its pool.
+    """
+    def __init__(self, raw, pool=None):
+        self._raw = raw
+        self._pool = pool
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self._raw, dictionary)
+
+    def start_transaction(self):
+        if not self._raw.in_transaction:
+            self._raw.execute("BEGIN")
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass  # nothing to reconnect to
+
+    def is_connected(self):
+        return self._raw is not None
+
+    def close(self):
+        if self._raw is None:
+            return
+        if self._pool is not None:
+            self._pool._release(self._raw)
+        else:
+            self._raw.close()
+        self._raw = None
+
+def connect(path):
+    return Connection(_open(path))
+
+class ConnectionPool:
+    """
+    Keeps up to `size` open connections to one database file and reuses the
+    most recently returned one first. Like MySQLConnectionPool it raises
+    PoolError instead of blocking when every connection is lent out.
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._idle = []
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        with self._lock:
+            if self._idle:
+                return Connection(self._idle.pop(), self)
+            if self._opened >= self.size:
+                raise PoolError("Failed getting connection; pool exhausted")
+            self._opened += 1
+        try:
+            return Connection(_open(self.path), self)
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _release(self, raw):
+        raw.rollback()  # drop anything the borrower left uncommitted
+        with self._lock:
+            self._idle.append(raw)
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    The db module pointed at a fresh SQLite vault without the sample rows.
+    """
+    import db
+    import sqlite_backend
+
+    monkeypatch.setattr(db, "BACKEND", "sqlite")
+    monkeypatch.setattr(db, "SQLITE_PATH", str(tmp_path / "vault.db"))
+    monkeypatch.setattr(db, "AUDIT_BUFFERED", False)
+    monkeypatch.setattr(sqlite_backend, "SAMPLE_DATA", False)
+    return db
+
+
+@pytest.fixture
+def store(db):
+    store = db.Store(db.create_pool(4))
+    user_id = store.insert("INSERT INTO Users (name, role) VALUES (%s, %s)", ("Ada", "Student"))
+    store.insert_rows(
+        "INSERT INTO Concepts (type, title, created_on, user_id) VALUES (%s, %s, CURDATE(), %s)",
+        [("Idea", f"Concept {i}", user_id) for i in range(1, 6)]
+    )
+    return store
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def api(db, store):
+    import api
+    return api.VaultApi(store, executor=None)
+
+
+def get(api, target):
+    response = api.handle("GET", target, None)
+    return response.status, response.payload
+
+
+def test_list_pages_with_a_cursor(api):
+    status, page = get(api, "/concepts?limit=2")
+    assert status == 200
+    assert [c["entity_id"] for c in page["items"]] == [1, 2]
+    assert page["next"] == "2"
+    seen = [c["entity_id"] for c in page["items"]]
+    while page["next"]:
+        status, page = get(api, f"/concepts?limit=2&after={page['next']}")
+        seen += [c["entity_id"] for c in page["items"]]
+    assert seen == [1, 2, 3, 4, 5]
+
+
+def test_list_filters(api):
+    api.handle("PATCH", "/concepts/3", {"type": "Paper"})
+    status, page = get(api, "/concepts?type=Paper")
+    assert [c["entity_id"] for c in page["items"]] == [3]
+    assert page["next"] is None
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "limit=x", "after=x", "colour=red"])
+def test_list_rejects_bad_parameters(api, query):
+    status, body = get(api, f"/concepts?{query}")
+    assert status == 400 and "error" in body
+
+
+def test_list_caps_the_limit(api, monkeypatch):
+    import api as api_module
+    monkeypatch.setattr(api_module, "MAX_LIMIT", 3)
+    status, page = get(api, "/concepts?limit=500")
+    assert len(page["items"]) == 3 and page["next"] == "3"
+
+
+def test_list_etag_changes_with_the_data(api):
+    first = api.handle("GET", "/concepts", None).headers["ETag"]
+    assert api.handle("GET", "/concepts", None).headers["ETag"] == first
+    api.handle("PATCH", "/concepts/1", {"title": "Renamed"})
+    assert api.handle("GET", "/concepts", None).headers["ETag"] != first
+
+
+def test_unknown_resource_and_method(api):
+    assert get(api, "/widgets")[0] == 404
+    assert api.handle("PUT", "/concepts", None).status == 405
+
+
+def test_batch_runs_each_request_on_its_own(api):
+    response = api.handle("POST", "/batch", {"requests": [
+        {"method": "POST", "path": "/tags", "body": {"tag": "AI", "role": "Topic"}},
+        {"method": "POST", "path": "/tags", "body": {"tag": "Privacy", "colour": "red"}},
+        {"path": "/tags"},
+        {"path": "/concepts/99"},
+        {"method": "POST", "path": "/batch", "body": {"requests": []}},
+    ]})
+    assert response.status == 200
+    statuses = [r["status"] for r in response.payload["responses"]]
+    assert statuses == [201, 400, 200, 404, 400]
+    assert [t["tag"] for t in response.payload["responses"][2]["body"]["items"]] == ["AI"]
+
+
+@pytest.mark.parametrize("payload", [None, {}, {"requests": "x"}, {"requests": [{"path": "/health"}] * 101}])
+def test_batch_rejects_bad_payloads(api, payload):
+    assert api.handle("POST", "/batch", payload).status == 400
+
+
+def test_create_list_in_one_transaction(api):
+    response = api.handle("POST", "/tags", [{"tag": "a", "role": "x"}, {"tag": "b", "role": "x"}])
+    assert response.status == 201 and len(response.payload["ids"]) == 2
+    response = api.handle("POST", "/links", [
+        {"src_concept_id": 1, "dst_concept_id": 2, "relation_type": "x"},
+        {"src_concept_id": 1, "dst_concept_id": 999, "relation_type": "x"},  # no such concept
+    ])
+    assert response.status == 409
+    assert get(api, "/links")[1]["items"] == []
+
+
+def exchange(api, request):
+    """
+    Sends raw bytes to serve_connection over a socket and returns what came
+    back before the server closed or reset the connection.
+    """
+    import api as api_module
+
+    async def run():
+        server = await asyncio.start_server(lambda r, w: api_module.serve_connection(api, r, w), "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(request)
+            received = b""
+            try:
+                while chunk := await reader.read(65536):
+                    received += chunk
+            except ConnectionResetError:
+                pass
+            writer.close()
+            return received
+    return asyncio.run(asyncio.wait_for(run(), 10))
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_bad_content_length_gets_a_400_and_closes(api, length):
+    response = exchange(api, f"POST /tags HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}".encode())
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in response and b"Content-Length must be" in response
+
+
+def test_export_streams_every_row(api, monkeypatch):
+    import api as api_module
+    monkeypatch.setattr(api_module, "EXPORT_BATCH", 2)
+    response = exchange(api, b"GET /export/concepts HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 200 ") and response.endswith(b"\r\n0\r\n\r\n")
+    assert response.count(b'"entity_id"') == 5
+
+
+def test_export_failures_are_never_a_clean_end(api, store, monkeypatch):
+    import api as api_module
+    monkeypatch.setattr(api_module, "EXPORT_BATCH", 2)
+    query = store.query
+    calls, failing = [], {2}
+
+    def failing_query(*args, **kwargs):
+        calls.append(args)
+        if len(calls) in failing:
+            raise RuntimeError("connection lost")
+        return query(*args, **kwargs)
+    monkeypatch.setattr(store, "query", failing_query)
+    request = b"GET /export/concepts HTTP/1.1\r\nConnection: close\r\n\r\n"
+    response = exchange(api, request)  # the second batch fails
+    assert response.startswith(b"HTTP/1.1 200 ") and response.count(b'"entity_id"') == 2
+    assert not response.endswith(b"0\r\n\r\n")  # reset, not ended
+    failing.add(len(calls) + 1)
+    response = exchange(api, request)  # the first batch fails
+    assert response.startswith(b"HTTP/1.1 500 ") and b"connection lost" in response
@@ -0,0 +1,135 @@
+import sys
+import threading
+
+import pytest
+
+
+def test_tables_in_expands_views(db):
+    assert db.tables_in("SELECT * FROM Concept_Summary s JOIN Tags t ON t.tag_id = s.tag_id") == {
+        "Concepts", "Categories", "Users", "Concept_Stats", "Tags"}
+    assert db.tables_in("INSERT INTO `Notes` (entity_id, body) VALUES (%s, %s)") == {"Notes"}
+    assert db.tables_in("SELECT 1") == set()
+
+
+def test_written_tables(db):
+    assert db.written_tables("UPDATE Tasks t JOIN Concepts c ON c.entity_id = t.entity_id SET t.status = %s") == {"Tasks"}
+    assert db.written_tables("INSERT IGNORE INTO Concept_Tags (entity_id, tag_id) SELECT %s, tag_id FROM Tags") == {
+        "Concept_Tags"}
+    assert db.written_tables("DELETE FROM Links WHERE src_concept_id IN (SELECT entity_id FROM Concepts)") == {"Links"}
+    # unusual shapes fall back to every table named
+    assert db.written_tables("DELETE ct FROM Concept_Tags ct JOIN Tags t ON t.tag_id = ct.tag_id") == {
+        "Concept_Tags", "Tags"}
+
+
+@pytest.mark.parametrize("backend, value, expected", [
+    ("mysql", "5", 5),
+    ("mysql", "100", 32),
+    ("sqlite", "100", 100),
+])
+def test_pool_size(db, monkeypatch, backend, value, expected):
+    monkeypatch.setattr(db, "BACKEND", backend)
+    monkeypatch.setenv("VAULT_POOL_SIZE", value)
+    assert db.pool_size("VAULT_POOL_SIZE", 5) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "many"])
+def test_pool_size_rejects_bad_values(db, monkeypatch, value):
+    monkeypatch.setenv("VAULT_POOL_SIZE", value)
+    with pytest.raises(ValueError, match="VAULT_POOL_SIZE"):
+        db.pool_size("VAULT_POOL_SIZE", 5)
+
+
+def test_bulk_runs_one_statement_per_chunk(db, store, monkeypatch):
+    monkeypatch.setattr(db, "BULK_CHUNK", 2)
+    statements, writes = [], []
+    store.on_query = lambda query, params, started, rows, rowcount: statements.append((query, params))
+    store.on_write = writes.append
+    changed = store.bulk("UPDATE Concepts SET type = %s WHERE entity_id IN ({ids})", [1, 2, 3, 4, 5], ("Paper",))
+    assert changed == 5
+    updates = [s for s in statements if s[0].startswith("UPDATE Concepts")]
+    assert [params for _, params in updates] == [("Paper", 1, 2), ("Paper", 3, 4), ("Paper", 5)]
+    assert writes == [{"Concepts"}]
+    rows = store.query("SELECT DISTINCT type FROM Concepts", fetch=True)
+    assert rows == [{"type": "Paper"}]
+
+
+def test_bulk_is_all_or_nothing(db, store, monkeypatch):
+    monkeypatch.setattr(db, "BULK_CHUNK", 2)
+    store.query("INSERT INTO Tags (tag, role) VALUES (%s, %s)", ("AI", "Topic"))
+    store.insert_rows("INSERT INTO Concept_Tags (entity_id, tag_id) VALUES (%s, %s)", [(5, 1)])
+    with pytest.raises(db.IntegrityError):
+        # the third chunk collides with the existing (5, 1) row
+        store.bulk("INSERT INTO Concept_Tags (entity_id, tag_id) SELECT entity_id, %s FROM Concepts WHERE entity_id IN ({ids})",
+                   [1, 2, 3, 4, 5], (1,))
+    assert store.query("SELECT COUNT(*) AS n FROM Concept_Tags", fetch=True) == [{"n": 1}]
+
+
+def test_insert_rows_returns_ids_in_order(store):
+    ids = store.insert_rows("INSERT INTO Tags (tag, role) VALUES (%s, %s)", [("a", "x"), ("b", "x"), ("c", "x")])
+    rows = store.query("SELECT tag_id, tag FROM Tags ORDER BY tag_id", fetch=True)
+    assert [(r['tag_id'], r['tag']) for r in rows] == list(zip(ids, "abc"))
+
+
+def test_changed_elsewhere_ignores_own_writes(db, store):
+    other = db.Store(db.create_pool(2))
+    assert store.changed_elsewhere() == set()  # records the starting counters
+    store.query("UPDATE Concepts SET title = %s WHERE entity_id = %s", ("Renamed", 1))
+    store.call("MarkTasksCompleted", ["[]"], commit=True)
+    assert store.changed_elsewhere() == set()
+    other.insert("INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES (%s, %s, %s)", (1, 2, "x"))
+    store.query("UPDATE Links SET relation_type = %s", ("y",))
+    assert store.changed_elsewhere() == {"Links"}
+    assert store.changed_elsewhere() == set()
+
+
+def test_rolled_back_writes_do_not_hide_other_changes(db, store):
+    other = db.Store(db.create_pool(2))
+    store.changed_elsewhere()
+    with pytest.raises(db.IntegrityError):
+        store.insert_rows("INSERT INTO Tags (tag_id, tag) VALUES (%s, %s)", [(1, "a"), (1, "b")])
+    other.query("INSERT INTO Tags (tag, role) VALUES (%s, %s)", ("c", "x"))
+    assert store.changed_elsewhere() == {"Tags"}
+
+
+def test_transaction_commits_its_writes_together(store):
+    writes = []
+    store.on_write = writes.append
+    with store.transaction() as run:
+        run("INSERT INTO Tags (tag, role) VALUES (%s, %s)", ("a", "x"))
+        rows = run("SELECT COUNT(*) AS n FROM Tags FOR UPDATE", fetch=True)
+        run("UPDATE Concepts SET type = %s WHERE entity_id = %s", ("Paper", 1))
+    assert rows == [{"n": 1}]
+    assert writes == [{"Tags", "Concepts"}]
+    with pytest.raises(ZeroDivisionError):
+        with store.transaction() as run:
+            run("INSERT INTO Tags (tag, role) VALUES (%s, %s)", ("b", "x"))
+            1 / 0
+    assert store.query("SELECT tag FROM Tags", fetch=True) == [{"tag": "a"}]
+    assert writes == [{"Tags", "Concepts"}]
+
+
+def test_transaction_holds_writers_off_until_it_ends(store):
+    # what keeps an upload from inserting a row for a blob that Delete is removing
+    inserted = threading.Event()
+    with store.transaction() as run:
+        run("DELETE FROM Concepts WHERE entity_id = %s", (5,))
+        writer = threading.Thread(target=lambda: (
+            store.query("INSERT INTO Tags (tag, role) VALUES (%s, %s)", ("a", "x")), inserted.set()))
+        writer.start()
+        assert not inserted.wait(0.3)
+    writer.join(5)
+    assert inserted.is_set()
+
+
+def test_writes_commit_before_their_version_bump(db, store):
+    writes = []
+    store.on_write = writes.append
+    store.query("DROP TABLE Table_Versions")
+    store.query("UPDATE Concepts SET title = %s WHERE entity_id = %s", ("Renamed", 1))  # the bump fails
+    assert store.query("SELECT title FROM Concepts WHERE entity_id = 1", fetch=True) == [{"title": "Renamed"}]
+    assert writes == [{"Concepts"}]
+
+
+def test_sqlite_backend_does_not_load_the_mysql_driver(db, store):
+    store.query("SELECT COUNT(*) FROM Concepts", fetch=True)
+    assert "mysql.connector" not in sys.modules
@@ -0,0 +1,106 @@
+import pytest
+
+from graph import ConceptGraph
+
+
+@pytest.fixture
+def graph():
+    # 1 -> 2 -> 3 -> 4, 1 -cites-> 5, 6 on its own
+    return ConceptGraph.from_rows(
+        range(1, 7),
+        [(1, 2, "related"), (2, 3, "related"), (3, 4, "related"), (1, 5, "cites")]
+    )
+
+
+def test_k_hop_distances(graph):
+    assert graph.k_hop(1, 1) == {2: 1, 5: 1}
+    assert graph.k_hop(1, 3) == {2: 1, 3: 2, 4: 3, 5: 1}
+    assert graph.k_hop(4, 2, direction="in") == {3: 1, 2: 2}
+    assert graph.k_hop(3, 1, direction="both") == {2: 1, 4: 1}
+
+
+def test_k_hop_filters_relations(graph):
+    assert graph.k_hop(1, 3, relation_types=["cites"]) == {5: 1}
+    assert graph.k_hop(1, 3, relation_types=["unknown"]) == {}
+
+
+def test_k_hop_of_unknown_concept(graph):
+    assert graph.k_hop(99, 2) == {}
+
+
+def test_shortest_path(graph):
+    assert graph.shortest_path(1, 4) == [1, 2, 3, 4]
+    assert graph.shortest_path(4, 1) is None
+    assert graph.shortest_path(4, 1, directed=False) == [4, 3, 2, 1]
+    assert graph.shortest_path(1, 1) == [1]
+    assert graph.shortest_path(1, 6) is None
+
+
+def test_components(graph):
+    assert [sorted(c) for c in graph.components()] == [[1, 2, 3, 4, 5], [6]]
+    assert graph.component_of(4) == [4, 1, 2, 3, 5]
+    assert graph.component_of(99) == []
+
+
+def test_added_links_are_found_before_and_after_a_rebuild(graph):
+    graph.add_link(4, 6, "related")
+    graph.add_link(7, 1, "new")  # a concept the graph has not seen yet
+    version = graph.version
+    before = (graph.k_hop(7, 5), graph.shortest_path(7, 6), graph.relation_types())
+    graph._build()
+    after = (graph.k_hop(7, 5), graph.shortest_path(7, 6), graph.relation_types())
+    assert before == after
+    assert before[0] == {1: 1, 2: 2, 5: 2, 3: 3, 4: 4, 6: 5}
+    assert before[1] == [7, 1, 2, 3, 4, 6]
+    assert graph.version == version  # a rebuild is not a change
+
+
+def test_removed_concepts_drop_their_links(graph):
+    graph.remove_concept(3)
+    assert graph.k_hop(1, 5) == {2: 1, 5: 1}
+    assert graph.shortest_path(1, 4) is None
+    assert graph.edge_list() == ([1, 1], [2, 5])
+    graph._build()
+    assert graph.edge_list() == ([1, 1], [2, 5])
+    assert graph.k_hop(3, 1) == {}
+
+
+def test_remove_concepts_is_one_change(graph):
+    version = graph.version
+    graph.remove_concepts([2, 5, 99])
+    assert graph.version == version + 1
+    assert graph.k_hop(1, 3) == {}
+
+
+def test_rebuild_threshold(monkeypatch):
+    monkeypatch.setattr(ConceptGraph, "REBUILD_THRESHOLD", 3)
+    graph = ConceptGraph.from_rows([1, 2], [])
+    for dst in (2, 3, 4):
+        graph.add_link(1, dst, "related")
+    assert graph._pending == 0  # the third link triggered a rebuild
+    assert graph.k_hop(1, 1) == {2: 1, 3: 1, 4: 1}
+
+
+def test_rebuilt_graphs_get_new_serials():
+    assert ConceptGraph().serial != ConceptGraph().serial
+
+
+def load_graph(store):
+    # what get_concept_graph builds whenever its cache entry expires
+    concepts = store.query("SELECT entity_id FROM Concepts", fetch=True)
+    links = store.query("SELECT src_concept_id, dst_concept_id, relation_type FROM Links", fetch=True)
+    return ConceptGraph.from_rows(
+        (c['entity_id'] for c in concepts),
+        ((l['src_concept_id'], l['dst_concept_id'], l['relation_type']) for l in links))
+
+
+def test_graph_fetched_before_a_write_gets_the_link_once(store):
+    # the cached graph has just expired, so the next fetch rebuilds it
+    before = load_graph(store)
+    store.query("INSERT INTO Links (src_concept_id, dst_concept_id, relation_type) VALUES (%s, %s, %s)",
+                (1, 2, "builds on"))
+    before.add_link(1, 2, "builds on")
+    after = load_graph(store)
+    assert before.edge_list() == after.edge_list() == ([1], [2])
+    after.add_link(1, 2, "builds on")  # fetching after the write added the link twice
+    assert after.edge_list() == ([1, 1], [2, 2])
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from similarity import SimilarityIndex, tokenize
+
+DOCUMENTS = [
+    (1, "Federated learning", 3),
+    (1, "training models across devices without sharing raw data", 1),
+    (2, "Membership inference attacks", 3),
+    (2, "attacks that tell whether a record was in the training data of models", 1),
+    (3, "Anonymization of medical data", 3),
+    (3, "removing identifiers from patient records", 1),
+    (4, "Gardening", 3),
+    (4, "tomatoes need sun and water", 1),
+]
+
+
+@pytest.fixture
+def index():
+    return SimilarityIndex.from_rows(DOCUMENTS)
+
+
+def test_tokenize_drops_stopwords_and_short_tokens():
+    assert tokenize("The Models of a GPU-based system, v2!") == ["models", "gpu", "based", "system", "v2"]
+    assert tokenize(None) == []
+
+
+def test_similar_ranks_related_concepts(index):
+    ranked = [entity_id for entity_id, _ in index.similar(1, k=3)]
+    assert ranked[0] == 2
+    assert 4 not in ranked
+    assert 1 not in ranked
+
+
+def test_similar_excludes_and_limits(index):
+    assert all(e != 2 for e, _ in index.similar(1, k=5, exclude={2}))
+    assert len(index.similar(1, k=1)) == 1
+    assert index.similar(99) == []
+
+
+def test_search_free_text(index):
+    assert index.search("tomatoes in the sun")[0][0] == 4
+    assert index.search("nothing matches") == []
+
+
+def test_pending_rows_score_like_indexed_rows(index):
+    query = index._counts[index._index[1]]
+    indexed = index._scores(query)
+    for row in range(len(index._ids)):
+        index._pending.add(row)  # scored from the term counts instead of the postings
+    np.testing.assert_allclose(index._scores(query), indexed)
+
+
+def test_added_text_is_found_before_a_rebuild(index):
+    index.add_text(5, "Tomatoes and gardening tips", 3)  # a new concept
+    index.add_text(3, "sun exposure of tomatoes", 1)    # more text for an indexed one
+    assert index._pending == {index._index[3]}
+    found = [e for e, _ in index.search("tomatoes gardening")]
+    assert set(found[:2]) == {4, 5} and 3 in found
+    assert index.similar(4, k=1)[0][0] == 5
+
+
+def test_removed_text_and_concepts_stop_matching(index):
+    index.add_text(1, "tomatoes", 2)
+    assert 1 in [e for e, _ in index.search("tomatoes")]
+    index.remove_text(1, "tomatoes", 2)
+    assert 1 not in [e for e, _ in index.search("tomatoes")]
+    index.remove_concepts([2])
+    assert 2 not in [e for e, _ in index.similar(1)]
+    assert index.similar(2) == []
+    assert len(index) == 3
+
+
+def test_rebuild_keeps_results(index):
+    index.add_text(5, "Tomatoes and gardening tips", 3)
+    index.remove_concepts([2])
+    index._build()
+    assert index._pending == set()
+    assert set(e for e, _ in index.search("tomatoes gardening")[:2]) == {4, 5}
+    assert 2 not in [e for e, _ in index.similar(1)]
+
+
+def test_rebuild_threshold(monkeypatch):
+    monkeypatch.setattr(SimilarityIndex, "REBUILD_THRESHOLD", 2)
+    index = SimilarityIndex.from_rows(DOCUMENTS)
+    index.add_text(5, "first")
+    assert index._built_rows == 4
+    index.add_text(6, "second")
+    assert index._built_rows == 6 and index._pending == set()
+
+
+def load_index(store):
+    # what get_similarity_index builds whenever its cache entry expires
+    titles = store.query("SELECT entity_id, title FROM Concepts", fetch=True)
+    notes = store.query("SELECT entity_id, body FROM Notes", fetch=True)
+    return SimilarityIndex.from_rows(
+        [(r['entity_id'], r['title'], 3) for r in titles] + [(r['entity_id'], r['body'], 1) for r in notes])
+
+
+def test_index_fetched_before_a_write_gets_the_row_once(store):
+    # the cached index has just expired, so the next fetch rebuilds it
+    before = load_index(store)
+    store.query("INSERT INTO Notes (entity_id, body, created_on) VALUES (%s, %s, CURDATE())",
+                (1, "tomatoes need sun"))
+    before.add_text(1, "tomatoes need sun")
+    after = load_index(store)
+    assert [e for e, _ in before.search("tomatoes sun")] == [1]
+    assert before._counts[before._index[1]] == after._counts[after._index[1]]
+    after.add_text(1, "tomatoes need sun")  # fetching after the write counted the note twice
+    assert after._counts[after._index[1]] != before._counts[before._index[1]]
@@ -0,0 +1,183 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import sqlite_backend
+from sqlite_backend import translate
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "SAMPLE_DATA", False)
+    conn = sqlite_backend.connect(str(tmp_path / "vault.db"))
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Users (name, role) VALUES (%s, %s)", ("Ada", "Student"))
+    cursor.execute("INSERT INTO Concepts (type, title, created_on, user_id) VALUES (%s, %s, %s, %s)",
+                   ("Idea", "Federated learning", date(2025, 9, 10), 1))
+    conn.commit()
+    cursor.close()
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("mysql, sqlite", [
+    ("SELECT * FROM Tasks WHERE task_id = %s AND status = %s", "SELECT * FROM Tasks WHERE task_id = ? AND status = ?"),
+    ("SELECT * FROM Tags WHERE tag LIKE 'a%%'", "SELECT * FROM Tags WHERE tag LIKE 'a%'"),
+    ("SELECT * FROM Tasks WHERE due_on < CURDATE()", "SELECT * FROM Tasks WHERE due_on < date('now', 'localtime')"),
+    ("insert ignore INTO Concept_Tags (entity_id, tag_id) VALUES (%s, %s)",
+     "INSERT OR IGNORE INTO Concept_Tags (entity_id, tag_id) VALUES (?, ?)"),
+    ("DROP TEMPORARY TABLE IF EXISTS ids", "DROP TABLE IF EXISTS ids"),
+    ("SELECT COUNT(*) FROM Attachments WHERE file_path = %s FOR UPDATE",
+     "SELECT COUNT(*) FROM Attachments WHERE file_path = ?"),
+])
+def test_translate(mysql, sqlite):
+    assert translate(mysql) == sqlite
+
+
+def test_new_file_gets_the_schema_without_sample_rows(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT COUNT(*) AS n FROM Concepts")
+    assert cursor.fetchall() == [{"n": 1}]
+    cursor.execute("SELECT COUNT(*) AS n FROM Table_Versions")
+    assert cursor.fetchone()["n"] == 10
+
+
+def test_upgrades_add_missing_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "SAMPLE_DATA", False)
+    path = str(tmp_path / "old.db")
+    conn = sqlite_backend.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE Table_Versions")
+    conn.commit()
+    conn.close()
+    conn = sqlite_backend.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM Table_Versions")
+    assert cursor.fetchone() == (10,)
+    conn.close()
+
+
+def test_retired_audit_buffer_is_flushed_and_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "SAMPLE_DATA", False)
+    path = str(tmp_path / "old.db")
+    sqlite_backend.connect(path).close()
+    raw = sqlite3.connect(path)
+    raw.executescript("""
+        CREATE TABLE Trigger_Log_Buffer (buffer_id INTEGER PRIMARY KEY AUTOINCREMENT, log_table VARCHAR(64),
+            log_action VARCHAR(64), log_info VARCHAR(255), created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO Trigger_Log_Buffer (log_table, log_action, log_info) VALUES ('Tasks', 'UPDATE', 'queued');
+        DROP TRIGGER trg_audit_log_insert;
+        CREATE TRIGGER trg_audit_log_insert INSTEAD OF INSERT ON Audit_Log BEGIN
+            INSERT INTO Trigger_Log_Buffer (log_table, log_action, log_info)
+            SELECT NEW.log_table, NEW.log_action, NEW.log_info WHERE audit_buffered();
+        END;
+    """)
+    raw.close()
+    conn = sqlite_backend.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Categories (name) VALUES ('Research')")
+    cursor.execute("INSERT INTO Concepts (type, title, category_id) VALUES ('Idea', 'New', 1)")
+    cursor.execute("SELECT log_info FROM Trigger_Log ORDER BY log_id")
+    assert [r[0] for r in cursor.fetchall()] == ["queued", "category_id=1"]
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'Trigger_Log_Buffer'")
+    assert cursor.fetchone() is None
+    conn.close()
+
+
+def test_search_rows_follow_their_items_by_rowid(conn):
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Notes (entity_id, body) VALUES (1, 'tomatoes need sun')")
+    cursor.execute("INSERT INTO Notes (entity_id, body) VALUES (1, 'tomatoes need water')")
+    cursor.execute("UPDATE Notes SET body = 'peppers need sun' WHERE note_id = 1")
+    cursor.execute("DELETE FROM Notes WHERE note_id = 2")
+    cursor.execute("SELECT rowid, kind, item_id, text FROM Search_Index WHERE kind = 'Note'")
+    assert cursor.fetchall() == [(5, "Note", 1, "peppers need sun")]
+    cursor.execute("PRAGMA user_version")
+    assert cursor.fetchone() == (max(sqlite_backend.MIGRATIONS),)
+
+
+def test_migrations_rekey_older_search_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "SAMPLE_DATA", False)
+    path = str(tmp_path / "old.db")
+    conn = sqlite_backend.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Concepts (type, title) VALUES ('Idea', 'Federated learning')")
+    cursor.execute("INSERT INTO Tags (tag, role) VALUES ('privacy', 'Topic')")
+    cursor.execute("UPDATE Search_Index SET rowid = rowid + 100")  # rowids as FTS5 assigned them before
+    cursor.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+    conn = sqlite_backend.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT rowid, kind, item_id FROM Search_Index ORDER BY rowid")
+    assert cursor.fetchall() == [(4, "Concept", 1), (7, "Tag", 1)]
+    cursor.execute("DELETE FROM Tags WHERE tag_id = 1")
+    cursor.execute("SELECT COUNT(*) FROM Search_Index")
+    assert cursor.fetchone() == (1,)
+    conn.close()
+
+
+def test_dates_and_dictionary_rows(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT entity_id, title, created_on FROM Concepts WHERE title = %s", ("Federated learning",))
+    assert cursor.fetchall() == [{"entity_id": 1, "title": "Federated learning", "created_on": date(2025, 9, 10)}]
+
+
+def test_procedures_return_result_sets(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("INSERT INTO Tasks (entity_id, description, due_on, status) VALUES (%s, %s, %s, %s)",
+                   (1, "Write report", date(2025, 9, 20), "Pending"))
+    conn.commit()
+    cursor.callproc("MarkTaskCompleted", [1])
+    conn.commit()
+    cursor.callproc("GetConceptDetails", [1])
+    notes, tasks, tags = [result.fetchall() for result in cursor.stored_results()]
+    assert tasks[0]["status"] == "Completed"
+    assert len(notes) == 1 and "Write report" in notes[0]["body"]  # added by the task trigger
+    assert tags == []
+    with pytest.raises(Exception, match="does not exist"):
+        cursor.callproc("NoSuchProcedure", [])
+
+
+def test_mark_status_completed_counts_the_tasks_it_changed(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.executemany("INSERT INTO Tasks (entity_id, description, due_on, status) VALUES (%s, %s, %s, %s)",
+                       [(1, f"Task {i}", date(2025, 9, 20), status)
+                        for i, status in enumerate(["Pending", "In Progress", "Pending"])])
+    conn.commit()
+    cursor.callproc("MarkStatusCompleted", ["Pending"])
+    conn.commit()
+    assert [r.fetchall() for r in cursor.stored_results()] == [[{"completed": 2}]]
+    cursor.execute("SELECT status, COUNT(*) AS n FROM Tasks GROUP BY status ORDER BY status")
+    assert cursor.fetchall() == [{"status": "Completed", "n": 2}, {"status": "In Progress", "n": 1}]
+    cursor.execute("SELECT COUNT(*) AS n FROM Notes")
+    assert cursor.fetchone() == {"n": 2}  # one per task, from the task trigger
+
+
+def test_days_remaining_function(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO Tasks (entity_id, description, due_on, status) VALUES (%s, %s, date('now', 'localtime', '+3 days'), %s)",
+        (1, "Soon", "Pending")
+    )
+    cursor.execute("SELECT DaysRemaining(%s)", (cursor.lastrowid,))
+    assert cursor.fetchone() == (3,)
+
+
+def test_pool_reuses_connections_and_raises_when_exhausted(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "SAMPLE_DATA", False)
+    pool = sqlite_backend.ConnectionPool(str(tmp_path / "vault.db"), 2)
+    first, second = pool.get_connection(), pool.get_connection()
+    with pytest.raises(sqlite_backend.PoolError):
+        pool.get_connection()
+    raw = first._raw
+    first.cursor().execute("INSERT INTO Users (name, role) VALUES (%s, %s)", ("Uncommitted", "x"))
+    first.close()
+    third = pool.get_connection()
+    assert third._raw is raw  # most recently returned first
+    cursor = third.cursor()
+    cursor.execute("SELECT COUNT(*) FROM Users")
+    assert cursor.fetchone() == (0,)  # the borrower's open transaction was rolled back
+    second.close()
+    third.close()
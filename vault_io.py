@@ -0,0 +1,323 @@
+"""
+Bulk import and export for the vault.
+
+    python vault_io.py import-markdown path/to/obsidian_vault [--category Projects]
+    python vault_io.py import vault.jsonl
+    python vault_io.py import vault_csv/ --format csv
+    python vault_io.py export vault.jsonl
+    python vault_io.py export vault_csv/ --format csv
+
+Rows are streamed through generators and written with executemany in
+batches, all inside one transaction per import, so memory stays flat and
+a failed import leaves the vault untouched. Imports assign primary keys
+themselves, so run them while the app is not adding rows.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from datetime import date
+from itertools import islice
+
+from db import VERSIONED_TABLES, bump_versions, flush_audit_log, get_db_connection
+
+BATCH_SIZE = 1000
+
+# Tables in foreign-key order with the columns that are exported and imported.
+# Categories.concept_count is left out: the concept insert trigger rebuilds it.
+TABLES = [
+    ("Users", ["user_id", "name", "role"]),
+    ("Categories", ["category_id", "name", "description"]),
+    ("Concepts", ["entity_id", "type", "title", "created_on", "category_id", "user_id"]),
+    ("Notes", ["note_id", "entity_id", "body", "created_on"]),
+    ("Tasks", ["task_id", "entity_id", "description", "due_on", "status", "remind_on"]),
+    ("Tags", ["tag_id", "tag", "role"]),
+    ("Concept_Tags", ["id", "entity_id", "tag_id"]),
+    ("Links", ["link_id", "src_concept_id", "dst_concept_id", "relation_type"]),
+    ("Collaborators", ["collab_id", "user_id", "concept_id", "role"]),
+    ("Attachments", ["attachment_id", "entity_id", "file_path", "file_name", "file_type", "file_size"]),
+]
+COLUMNS = dict(TABLES)
+
+WIKILINK_PATTERN = re.compile(r"\[\[([^\]|#]+)(?:#[^\]|]*)?(?:\|[^\]]*)?\]\]")
+TAG_PATTERN = re.compile(r"(?<![\w#/])#([A-Za-z][\w/-]*)")
+TASK_PATTERN = re.compile(r"^\s*[-*] \[( |x|X)\] (.+)$", re.MULTILINE)
+
+
+def batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_sql(table, columns):
+    return "INSERT INTO {} ({}) VALUES ({})".format(
+        table, ", ".join(columns), ", ".join(["%s"] * len(columns))
+    )
+
+
+def next_id(cursor, table, key):
+    cursor.execute(f"SELECT COALESCE(MAX({key}), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+# Markdown (Obsidian-style) import
+def read_markdown(folder):
+    """
+    Yields one page per .md file: title (file name), type, tags, wikilink
+    targets, tasks and the body with the front matter stripped.
+    """
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if not name.endswith(".md"):
+                continue
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                text = f.read()
+            meta, body = split_front_matter(text)
+            tags = set(TAG_PATTERN.findall(body))
+            tags.update(t.strip().lstrip("#") for t in re.split(r"[,\[\]]", meta.get("tags", "")) if t.strip())
+            yield {
+                "title": name[:-3][:150],
+                "type": meta.get("type", "Note")[:50],
+                "body": body.strip(),
+                "tags": sorted(tags),
+                "links": sorted({t.strip()[:150] for t in WIKILINK_PATTERN.findall(body)}),
+                "tasks": [("Pending" if mark == " " else "Completed", desc.strip())
+                          for mark, desc in TASK_PATTERN.findall(body)],
+            }
+
+
+def split_front_matter(text):
+    """
+    Splits a leading `---` block of `key: value` lines from the body.
+    """
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---", 4)
+    if end == -1:
+        return {}, text
+    meta = {}
+    for line in text[4:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            meta[key.strip().lower()] = value.strip()
+    return meta, text[end + 4:]
+
+
+def import_markdown(conn, folder, category=None, batch_size=BATCH_SIZE):
+    """
+    Imports a folder of Markdown pages: each page becomes a concept with one
+    note, its #tags become tags, `- [ ]` items become tasks and [[wikilinks]]
+    become 'links to' links. Link targets are resolved in one set-based
+    statement at the end through temporary staging tables.
+    """
+    cursor = conn.cursor()
+    category_id = None
+    if category:
+        cursor.execute("SELECT category_id FROM Categories WHERE name = %s", (category,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("INSERT INTO Categories (name, description) VALUES (%s, %s)", (category, "Imported"))
+            category_id = cursor.lastrowid
+        else:
+            category_id = row[0]
+    cursor.execute("SELECT tag, tag_id FROM Tags")
+    tag_ids = dict(cursor.fetchall())
+    cursor.execute("""
+        CREATE TEMPORARY TABLE Import_Titles (
+            title VARCHAR(150) PRIMARY KEY,
+            entity_id INT
+        )
+    """)
+    cursor.execute("""
+        CREATE TEMPORARY TABLE Import_Links (
+            src_concept_id INT,
+            dst_title VARCHAR(150)
+        )
+    """)
+    concept_id = next_id(cursor, "Concepts", "entity_id")
+    today = date.today()
+    count = 0
+    for pages in batched(read_markdown(folder), batch_size):
+        concepts, notes, tasks, titles, links, tagged = [], [], [], [], [], []
+        for page in pages:
+            concepts.append((concept_id, page["type"], page["title"], today, category_id))
+            titles.append((page["title"], concept_id))
+            if page["body"]:
+                notes.append((concept_id, page["body"], today))
+            tasks.extend((concept_id, desc, status) for status, desc in page["tasks"])
+            links.extend((concept_id, target) for target in page["links"])
+            for tag in page["tags"]:
+                if tag not in tag_ids:
+                    cursor.execute("INSERT INTO Tags (tag, role) VALUES (%s, %s)", (tag, "Imported"))
+                    tag_ids[tag] = cursor.lastrowid
+                tagged.append((concept_id, tag_ids[tag]))
+            concept_id += 1
+        cursor.executemany(
+            "INSERT INTO Concepts (entity_id, type, title, created_on, category_id) VALUES (%s, %s, %s, %s, %s)",
+            concepts
+        )
+        cursor.executemany("INSERT IGNORE INTO Import_Titles (title, entity_id) VALUES (%s, %s)", titles)
+        if notes:
+            cursor.executemany("INSERT INTO Notes (entity_id, body, created_on) VALUES (%s, %s, %s)", notes)
+        if tasks:
+            cursor.executemany("INSERT INTO Tasks (entity_id, description, status) VALUES (%s, %s, %s)", tasks)
+        if links:
+            cursor.executemany("INSERT INTO Import_Links (src_concept_id, dst_title) VALUES (%s, %s)", links)
+        if tagged:
+            cursor.executemany("INSERT INTO Concept_Tags (entity_id, tag_id) VALUES (%s, %s)", tagged)
+        count += len(pages)
+        print(f"imported {count} pages", file=sys.stderr)
+    # links to pages outside the folder resolve against existing concept titles
+    cursor.execute("""
+        INSERT INTO Links (src_concept_id, dst_concept_id, relation_type)
+        SELECT l.src_concept_id, COALESCE(t.entity_id, c.entity_id), 'links to'
+        FROM Import_Links l
+        LEFT JOIN Import_Titles t ON t.title = l.dst_title
+        LEFT JOIN Concepts c ON t.entity_id IS NULL AND c.title = l.dst_title
+        WHERE COALESCE(t.entity_id, c.entity_id) IS NOT NULL
+          AND COALESCE(t.entity_id, c.entity_id) <> l.src_concept_id
+    """)
+    print(f"created {cursor.rowcount} links", file=sys.stderr)
+    cursor.execute("DROP TEMPORARY TABLE Import_Titles")
+    cursor.execute("DROP TEMPORARY TABLE Import_Links")
+    cursor.close()
+    return count
+
+
+# JSONL / CSV import (restores rows with their primary keys)
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["table"], record["row"]
+
+
+def read_csv_dir(folder):
+    """
+    Reads <Table>.csv files in foreign-key order; empty cells become NULL.
+    """
+    for table, _ in TABLES:
+        path = os.path.join(folder, f"{table}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield table, {k: (v if v != "" else None) for k, v in row.items()}
+
+
+def import_rows(conn, records, batch_size=BATCH_SIZE):
+    """
+    Inserts (table, row) records in the order given, batching consecutive
+    rows of the same table into one executemany.
+    """
+    cursor = conn.cursor()
+    table, batch, count = None, [], 0
+
+    def flush():
+        if batch:
+            columns = COLUMNS[table]
+            cursor.executemany(insert_sql(table, columns), batch)
+
+    for record_table, row in records:
+        if record_table not in COLUMNS:
+            raise ValueError(f"Unknown table in import: {record_table}")
+        if record_table != table or len(batch) >= batch_size:
+            flush()
+            table, batch = record_table, []
+        batch.append(tuple(row.get(c) for c in COLUMNS[table]))
+        count += 1
+        if count % (batch_size * 10) == 0:
+            print(f"imported {count} rows", file=sys.stderr)
+    flush()
+    cursor.close()
+    return count
+
+
+# Export
+def stream_table(conn, table, batch_size=BATCH_SIZE):
+    cursor = conn.cursor(dictionary=True)
+    columns = COLUMNS[table]
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {columns[0]}")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+    cursor.close()
+
+
+def export_jsonl(conn, path):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for table, _ in TABLES:
+            for row in stream_table(conn, table):
+                f.write(json.dumps({"table": table, "row": row}, default=str) + "\n")
+                count += 1
+    return count
+
+
+def export_csv(conn, folder):
+    os.makedirs(folder, exist_ok=True)
+    count = 0
+    for table, columns in TABLES:
+        with open(os.path.join(folder, f"{table}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for row in stream_table(conn, table):
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export for the Knowledge Vault.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    md = commands.add_parser("import-markdown", help="import a folder of Markdown pages")
+    md.add_argument("folder")
+    md.add_argument("--category", help="category for the imported concepts (created if missing)")
+    md.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    imp = commands.add_parser("import", help="restore rows from a JSONL file or a folder of CSV files")
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    imp.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    exp = commands.add_parser("export", help="dump the whole vault to a JSONL file or a folder of CSV files")
+    exp.add_argument("path")
+    exp.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        if args.command == "export":
+            count = export_jsonl(conn, args.path) if args.format == "jsonl" else export_csv(conn, args.path)
+            print(f"exported {count} rows", file=sys.stderr)
+            return
+        conn.start_transaction()
+        if args.command == "import-markdown":
+            count = import_markdown(conn, args.folder, args.category, args.batch_size)
+        else:
+            records = read_jsonl(args.path) if args.format == "jsonl" else read_csv_dir(args.path)
+            count = import_rows(conn, records, args.batch_size)
+        conn.commit()
+        cursor = conn.cursor()
+        bump_versions(cursor, VERSIONED_TABLES)  # running app servers reload their caches
+        cursor.close()
+        conn.commit()
+        flush_audit_log(conn)
+        print(f"done: {count} records imported", file=sys.stderr)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()